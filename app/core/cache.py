@@ -0,0 +1,232 @@
+"""
+推理结果缓存
+进程内有界LRU（带TTL），配置 REDIS_URL 时同时写入Redis，使多个worker进程共享结果。
+Redis不可用时自动退化为仅使用本地缓存，不影响请求处理。
+"""
+
+import asyncio
+import json
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, List, Optional, Set
+
+from loguru import logger
+from sqlalchemy import event
+from sqlalchemy.orm import Session, object_session
+
+from app.core.config import settings
+from app.core.metrics import metrics
+
+try:
+    import redis.asyncio as aioredis
+except ImportError:  # redis 为可选依赖
+    aioredis = None
+
+
+class LRUCache:
+    """有界LRU缓存，条目超过TTL后视为未命中（线程安全）"""
+
+    def __init__(self, maxsize: int, ttl: Optional[float] = None):
+        self.maxsize = max(1, maxsize)
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._data: "OrderedDict[Hashable, tuple]" = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return default
+            value, expires_at = entry
+            if expires_at is not None and expires_at <= time.monotonic():
+                del self._data[key]
+                return default
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None):
+        ttl = self.ttl if ttl is None else ttl
+        expires_at = time.monotonic() + ttl if ttl else None
+        with self._lock:
+            self._data[key] = (value, expires_at)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def delete(self, key: Hashable):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+
+class ResultCache:
+    """两级结果缓存：本地LRU + 可选Redis（值需可JSON序列化）"""
+
+    def __init__(self, name: str, maxsize: int, ttl: float, redis_url: Optional[str] = None):
+        self.name = name
+        self.ttl = ttl
+        self._local = LRUCache(maxsize, ttl)
+        self._redis = None
+        if redis_url and aioredis is not None:
+            self._redis = aioredis.from_url(redis_url)
+        elif redis_url:
+            logger.warning(f"redis package not installed, {name} cache will be process-local")
+
+    def _redis_key(self, key: str) -> str:
+        return f"voiceprint:cache:{self.name}:{key}"
+
+    async def get(self, key: str) -> Optional[Dict[str, Any]]:
+        value = self._local.get(key)
+        if value is not None:
+            metrics.incr(f"cache.{self.name}.hit")
+            return value
+
+        if self._redis is not None:
+            try:
+                raw = await self._redis.get(self._redis_key(key))
+                if raw is not None:
+                    value = json.loads(raw)
+                    self._local.set(key, value)
+                    metrics.incr(f"cache.{self.name}.hit")
+                    metrics.incr(f"cache.{self.name}.redis_hit")
+                    return value
+            except Exception as e:
+                metrics.incr(f"cache.{self.name}.redis_error")
+                logger.warning(f"Redis cache get failed ({self.name}): {e}")
+
+        metrics.incr(f"cache.{self.name}.miss")
+        return None
+
+    async def get_many(self, keys: List[str]) -> Dict[str, Dict[str, Any]]:
+        """批量读取，本地未命中的键合并为一次Redis MGET；返回命中的 {key: value}"""
+        found: Dict[str, Dict[str, Any]] = {}
+        missing = []
+        for key in keys:
+            value = self._local.get(key)
+            if value is not None:
+                found[key] = value
+            else:
+                missing.append(key)
+
+        if missing and self._redis is not None:
+            try:
+                raws = await self._redis.mget([self._redis_key(key) for key in missing])
+                for key, raw in zip(missing, raws):
+                    if raw is not None:
+                        value = json.loads(raw)
+                        self._local.set(key, value)
+                        found[key] = value
+                        metrics.incr(f"cache.{self.name}.redis_hit")
+            except Exception as e:
+                metrics.incr(f"cache.{self.name}.redis_error")
+                logger.warning(f"Redis cache mget failed ({self.name}): {e}")
+
+        if found:
+            metrics.incr(f"cache.{self.name}.hit", len(found))
+        if len(found) < len(keys):
+            metrics.incr(f"cache.{self.name}.miss", len(keys) - len(found))
+        return found
+
+    async def set(self, key: str, value: Dict[str, Any]):
+        self._local.set(key, value)
+        if self._redis is not None:
+            try:
+                await self._redis.set(self._redis_key(key), json.dumps(value), ex=int(self.ttl))
+            except Exception as e:
+                metrics.incr(f"cache.{self.name}.redis_error")
+                logger.warning(f"Redis cache set failed ({self.name}): {e}")
+
+    async def set_many(self, values: Dict[str, Dict[str, Any]]):
+        """批量写入，Redis写入合并为一次pipeline往返"""
+        for key, value in values.items():
+            self._local.set(key, value)
+        if values and self._redis is not None:
+            try:
+                async with self._redis.pipeline(transaction=False) as pipe:
+                    for key, value in values.items():
+                        pipe.set(self._redis_key(key), json.dumps(value), ex=int(self.ttl))
+                    await pipe.execute()
+            except Exception as e:
+                metrics.incr(f"cache.{self.name}.redis_error")
+                logger.warning(f"Redis cache set failed ({self.name}): {e}")
+
+    async def delete(self, key: str):
+        self._local.delete(key)
+        if self._redis is not None:
+            try:
+                await self._redis.delete(self._redis_key(key))
+            except Exception as e:
+                metrics.incr(f"cache.{self.name}.redis_error")
+                logger.warning(f"Redis cache delete failed ({self.name}): {e}")
+
+    def delete_local(self, key: str):
+        """只删除本进程缓存（可在同步代码中调用）"""
+        self._local.delete(key)
+
+
+# 提交后异步删除Redis条目的任务，保留引用避免被垃圾回收
+_invalidation_tasks: Set[asyncio.Task] = set()
+
+
+def invalidate_on_commit(model, cache: Optional[ResultCache], key_func: Callable[[Any], Optional[str]]):
+    """ORM修改或删除 model 时失效缓存
+    flush时先删除本进程副本并把键记在会话上，事务提交后再删除一次（含Redis）：
+    提交前并发请求仍可能读到旧行并写回缓存，提交后的删除保证旧值不会保留到TTL过期"""
+    if cache is None:
+        return
+    pending_key = f"cache_invalidate:{cache.name}"
+
+    def on_change(mapper, connection, target):
+        key = key_func(target)
+        if not key:
+            return
+        cache.delete_local(key)
+        session = object_session(target)
+        if session is not None:
+            session.info.setdefault(pending_key, set()).add(key)
+
+    def after_commit(session):
+        keys = session.info.pop(pending_key, None)
+        if not keys:
+            return
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            loop = None
+        for key in keys:
+            cache.delete_local(key)
+            if loop is not None:
+                task = loop.create_task(cache.delete(key))
+                _invalidation_tasks.add(task)
+                task.add_done_callback(_invalidation_tasks.discard)
+
+    def after_rollback(session):
+        session.info.pop(pending_key, None)
+
+    event.listen(model, "after_update", on_change)
+    event.listen(model, "after_delete", on_change)
+    event.listen(Session, "after_commit", after_commit)
+    event.listen(Session, "after_rollback", after_rollback)
+
+
+def _build_cache(name: str) -> Optional[ResultCache]:
+    if not settings.RESULT_CACHE_ENABLED:
+        return None
+    return ResultCache(
+        name=name,
+        maxsize=settings.RESULT_CACHE_MAX_ENTRIES,
+        ttl=settings.RESULT_CACHE_TTL,
+        redis_url=settings.REDIS_URL
+    )
+
+
+# 全局结果缓存实例（禁用时为None）
+embedding_cache = _build_cache("embedding")
+emotion_cache = _build_cache("emotion")
@@ -0,0 +1,210 @@
+"""
+推理准入控制
+限制同时进行的模型推理数量，超出部分进入有界等待队列；
+队列已满时立即返回429，排队超时返回503，均携带Retry-After。
+
+请求分为两个优先级：
+- interactive: 小程序的实时识别/验证请求，优先调度
+- bulk: 批量检测和后台任务，在空闲时运行，并保证最低并发份额不被饿死
+"""
+
+import asyncio
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from typing import Any, Callable, Deque, Dict, Optional
+
+from app.core.config import settings
+from app.core.exceptions import RateLimitError, ServiceBusyError
+from app.core.metrics import metrics
+
+# 优先级类别
+PRIORITY_INTERACTIVE = "interactive"
+PRIORITY_BULK = "bulk"
+PRIORITIES = (PRIORITY_INTERACTIVE, PRIORITY_BULK)
+
+
+class AdmissionController:
+    """准入控制器：有界并发信号量 + 按优先级划分的有界FIFO等待队列"""
+
+    def __init__(
+        self,
+        name: str,
+        max_concurrency: int,
+        max_queue: Dict[str, int],
+        queue_timeout: Dict[str, float],
+        retry_after: int,
+        bulk_min_share: float = 0.0
+    ):
+        self.name = name
+        self.max_concurrency = max(1, max_concurrency)
+        self.max_queue = {p: max(0, max_queue[p]) for p in PRIORITIES}
+        self.queue_timeout = queue_timeout
+        self.retry_after = retry_after
+        # 有bulk请求等待时，bulk至少可占用的槽位数
+        self.bulk_min_slots = max(1, int(self.max_concurrency * bulk_min_share)) if bulk_min_share > 0 else 0
+        self._in_flight: Dict[str, int] = {p: 0 for p in PRIORITIES}
+        self._waiters: Dict[str, Deque[asyncio.Future]] = {p: deque() for p in PRIORITIES}
+
+    @property
+    def in_flight(self) -> int:
+        """正在执行的推理数量"""
+        return sum(self._in_flight.values())
+
+    @property
+    def queue_depth(self) -> int:
+        """等待中的请求数量"""
+        return sum(self.class_queue_depth(p) for p in PRIORITIES)
+
+    def class_queue_depth(self, priority: str) -> int:
+        return sum(1 for waiter in self._waiters[priority] if not waiter.done())
+
+    def status(self) -> dict:
+        return {
+            "name": self.name,
+            "in_flight": self.in_flight,
+            "queue_depth": self.queue_depth,
+            "max_concurrency": self.max_concurrency,
+            "bulk_min_slots": self.bulk_min_slots,
+            "classes": {
+                p: {
+                    "in_flight": self._in_flight[p],
+                    "queue_depth": self.class_queue_depth(p),
+                    "max_queue": self.max_queue[p],
+                    "queue_wait": metrics.latency(f"{self.name}.queue_wait.{p}"),
+                }
+                for p in PRIORITIES
+            },
+        }
+
+    def _can_admit_now(self, priority: str) -> bool:
+        if self.in_flight >= self.max_concurrency:
+            return False
+        if priority == PRIORITY_INTERACTIVE:
+            return not self._waiters[PRIORITY_INTERACTIVE]
+        return not self._waiters[PRIORITY_INTERACTIVE] and not self._waiters[PRIORITY_BULK]
+
+    async def acquire(self, priority: str = PRIORITY_INTERACTIVE, timeout: Optional[float] = None):
+        """获取推理槽位，必要时排队等待"""
+        if priority not in PRIORITIES:
+            raise ValueError(f"Unknown priority class: {priority}")
+
+        start = time.perf_counter()
+        if self._can_admit_now(priority):
+            self._in_flight[priority] += 1
+            metrics.incr(f"{self.name}.admitted.{priority}")
+            metrics.observe(f"{self.name}.queue_wait.{priority}", 0.0)
+            return
+
+        if self.class_queue_depth(priority) >= self.max_queue[priority]:
+            metrics.incr(f"{self.name}.rejected.{priority}")
+            raise RateLimitError(
+                message="服务繁忙，请稍后再试",
+                retry_after=self.retry_after
+            )
+
+        class_timeout = self.queue_timeout[priority]
+        wait_timeout = class_timeout if timeout is None else min(timeout, class_timeout)
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters[priority].append(waiter)
+
+        try:
+            await asyncio.wait_for(asyncio.shield(waiter), timeout=max(wait_timeout, 0))
+        except (asyncio.TimeoutError, asyncio.CancelledError) as e:
+            if waiter.done() and not waiter.cancelled():
+                # 槽位已移交但调用方放弃，归还给下一个等待者
+                self.release(priority)
+            else:
+                waiter.cancel()
+                self._remove_waiter(priority, waiter)
+            if isinstance(e, asyncio.TimeoutError):
+                metrics.incr(f"{self.name}.timeout.{priority}")
+                raise ServiceBusyError(
+                    message="推理队列等待超时，请稍后再试",
+                    retry_after=self.retry_after
+                )
+            raise
+        finally:
+            metrics.observe(f"{self.name}.queue_wait.{priority}", time.perf_counter() - start)
+
+        metrics.incr(f"{self.name}.admitted.{priority}")
+
+    def release(self, priority: str = PRIORITY_INTERACTIVE):
+        """释放槽位，按优先级直接移交给等待中的请求"""
+        self._in_flight[priority] = max(0, self._in_flight[priority] - 1)
+        while True:
+            next_priority = self._next_priority()
+            if next_priority is None:
+                return
+            waiter = self._waiters[next_priority].popleft()
+            if not waiter.done():
+                self._in_flight[next_priority] += 1
+                waiter.set_result(None)
+                return
+
+    def _next_priority(self) -> Optional[str]:
+        """选择下一个获得槽位的优先级类别"""
+        has_interactive = bool(self._waiters[PRIORITY_INTERACTIVE])
+        has_bulk = bool(self._waiters[PRIORITY_BULK])
+        if has_bulk and self._in_flight[PRIORITY_BULK] < self.bulk_min_slots:
+            return PRIORITY_BULK
+        if has_interactive:
+            return PRIORITY_INTERACTIVE
+        if has_bulk:
+            return PRIORITY_BULK
+        return None
+
+    def _remove_waiter(self, priority: str, waiter: asyncio.Future):
+        try:
+            self._waiters[priority].remove(waiter)
+        except ValueError:
+            pass
+
+    @asynccontextmanager
+    async def slot(self, priority: str = PRIORITY_INTERACTIVE, timeout: Optional[float] = None):
+        """推理槽位上下文"""
+        await self.acquire(priority, timeout)
+        try:
+            yield
+        finally:
+            self.release(priority)
+
+
+# 全局推理准入控制器（声纹与情绪识别共享CPU）
+inference_limiter = AdmissionController(
+    name="inference",
+    max_concurrency=settings.INFERENCE_MAX_CONCURRENCY,
+    max_queue={
+        PRIORITY_INTERACTIVE: settings.INFERENCE_MAX_QUEUE,
+        PRIORITY_BULK: settings.INFERENCE_BULK_MAX_QUEUE,
+    },
+    queue_timeout={
+        PRIORITY_INTERACTIVE: settings.INFERENCE_QUEUE_TIMEOUT,
+        PRIORITY_BULK: settings.INFERENCE_BULK_QUEUE_TIMEOUT,
+    },
+    retry_after=settings.INFERENCE_RETRY_AFTER,
+    bulk_min_share=settings.INFERENCE_BULK_MIN_SHARE
+)
+
+# 解码、特征提取和模型前向都是CPU密集的同步计算，放到与推理并发数同样大小的线程池中执行，
+# 持有槽位的请求不会阻塞事件循环，同时线程数不会超过准入控制允许的并发
+inference_executor = ThreadPoolExecutor(
+    max_workers=max(1, settings.INFERENCE_MAX_CONCURRENCY),
+    thread_name_prefix="inference"
+)
+
+
+async def run_inference(func: Callable[..., Any], *args) -> Any:
+    """在推理线程池中执行同步计算"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(inference_executor, func, *args)
+
+
+metrics.register_gauge("inference.queue_depth", lambda: inference_limiter.queue_depth)
+metrics.register_gauge("inference.in_flight", lambda: inference_limiter.in_flight)
+for _priority in PRIORITIES:
+    metrics.register_gauge(
+        f"inference.queue_depth.{_priority}",
+        lambda p=_priority: inference_limiter.class_queue_depth(p)
+    )
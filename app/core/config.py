@@ -49,10 +49,30 @@ class Settings(BaseSettings):
     MINIO_SECRET_KEY: str = "minioadmin"
     MINIO_BUCKET: str = "voiceprint-audio"
     MINIO_SECURE: bool = False
+    MINIO_POOL_MAXSIZE: int = 32  # 连接池大小（同时也是存储线程池大小）
+    MINIO_CONNECT_TIMEOUT: float = 5.0
+    MINIO_READ_TIMEOUT: float = 60.0
+    
+    # 对象存储后端: minio / local（本地文件系统，适合单机部署和测试）
+    STORAGE_BACKEND: str = "minio"
+    STORAGE_LOCAL_ROOT: str = "data/objects"
+    STORAGE_LOCAL_BASE_URL: str = "/api/upload/objects"  # 本地对象的访问URL前缀
+    STORAGE_LOCAL_WORKERS: int = 8
     
     # 声纹识别配置
     VOICEPRINT_MODEL: str = "speechbrain/spkrec-ecapa-voxceleb"
     VOICEPRINT_THRESHOLD: float = 0.75
+    VOICEPRINT_MAX_SAMPLES: int = 5  # 每名员工最多活跃样本数
+    VOICEPRINT_REQUIRED_SAMPLES: int = 3  # 达到该数量视为完成注册
+    VOICEPRINT_RECONCILE_INTERVAL: int = 3600  # 员工声纹计数校正间隔（秒），0为不定期校正
+    VOICEPRINT_TOP_K: int = 5  # 识别结果中返回的候选数量
+    
+    # 内存声纹库快照（工作进程启动时内存映射加载）
+    GALLERY_SNAPSHOT_DIR: str = "data/gallery"  # 同机工作进程共享
+    GALLERY_SNAPSHOT_INTERVAL: int = 300  # 快照写入间隔（秒），0为不写快照
+    GALLERY_SNAPSHOT_KEEP: int = 2  # 保留的快照版本数
+    GALLERY_SYNC_INTERVAL: float = 5.0  # 跨进程同步间隔（秒），即其他进程变更的最大可见延迟
+    GALLERY_SYNC_OVERLAP: float = 5.0  # 按 updated_at 同步时的回看时间（秒）
     AUDIO_QUALITY_THRESHOLD: float = 0.6
     MIN_AUDIO_DURATION: float = 3.0
     MAX_AUDIO_DURATION: float = 30.0
@@ -64,6 +84,86 @@ class Settings(BaseSettings):
     SUPPORTED_EMOTIONS: str = "neutral,happy,sad,angry,fear,disgust,surprise"
     EMOTION_ANALYSIS_ENABLED: bool = True
     
+    # 推理并发控制
+    INFERENCE_MAX_CONCURRENCY: int = 2  # 同时进行的推理数量
+    INFERENCE_MAX_QUEUE: int = 16  # 等待队列长度，超出返回429
+    INFERENCE_QUEUE_TIMEOUT: float = 10.0  # 排队超时（秒），超时返回503
+    INFERENCE_RETRY_AFTER: int = 2  # Retry-After响应头（秒）
+    INFERENCE_BULK_MAX_QUEUE: int = 64  # 批量任务等待队列长度
+    INFERENCE_BULK_QUEUE_TIMEOUT: float = 120.0  # 批量任务排队超时（秒）
+    INFERENCE_BULK_MIN_SHARE: float = 0.25  # 批量任务保证的最低并发份额
+    REQUEST_DEADLINE_SECONDS: float = 30.0  # 单个请求处理时限（秒）
+    REQUEST_DEADLINE_MIN_SECONDS: float = 1.0  # 客户端 X-Request-Timeout 可设置的最短时限（秒）
+    
+    # 推理结果缓存（按音频内容哈希）
+    RESULT_CACHE_ENABLED: bool = True
+    RESULT_CACHE_MAX_ENTRIES: int = 2048  # 本地LRU条目上限
+    RESULT_CACHE_TTL: int = 3600  # 缓存有效期（秒）
+    
+    # 认证用户缓存（按令牌subject缓存已解析的用户）
+    PRINCIPAL_CACHE_ENABLED: bool = True
+    PRINCIPAL_CACHE_MAX_ENTRIES: int = 10000
+    PRINCIPAL_CACHE_TTL: int = 60  # 其他worker中用户变更最迟在该时间后生效（秒）
+    
+    # 员工目录缓存（识别结果中的员工信息）
+    EMPLOYEE_CACHE_ENABLED: bool = True
+    EMPLOYEE_CACHE_MAX_ENTRIES: int = 10000
+    EMPLOYEE_CACHE_TTL: int = 300  # 其他worker中员工信息变更最迟在该时间后生效（秒）
+    
+    # 列表游标分页
+    PAGINATION_MAX_LIMIT: int = 100  # 单页最大条数
+    PAGINATION_COUNT_CACHE_TTL: int = 30  # 列表总数缓存时间（秒），0为不缓存
+    PAGINATION_COUNT_CACHE_MAX_ENTRIES: int = 2048
+    
+    # 对象存储异步写入
+    STORAGE_WRITER_MAX_QUEUE: int = 256  # 待上传队列长度，超出时落盘暂存
+    STORAGE_WRITER_CONCURRENCY: int = 4  # 并发上传数
+    STORAGE_WRITER_MAX_RETRIES: int = 3  # 单次上传重试次数
+    STORAGE_SPOOL_DIR: str = "temp/storage_spool"  # 上传失败暂存目录
+    STORAGE_RECONCILE_INTERVAL: float = 60.0  # 暂存条目对账间隔（秒）
+    ARCHIVE_CODEC_ENROLLMENT: str = "flac"  # 注册样本归档编码(wav/flac/opus)
+    ARCHIVE_CODEC_CLIPS: str = "opus"  # 识别/情绪片段归档编码(wav/flac/opus)
+    
+    # 音频存储策略（注册样本和开启录音的会议始终保存）
+    STORAGE_RECOGNITION_SAMPLE_RATE: float = 0.05  # 识别成功音频的随机保存比例
+    STORAGE_NEAR_THRESHOLD_MARGIN: float = 0.05  # 得分与阈值相差不超过该值时保存
+    STORAGE_EMOTION_SAMPLE_RATE: float = 0.05  # 情绪检测音频的随机保存比例
+    STORAGE_EMOTION_LOW_CONFIDENCE: float = 0.5  # 低于该置信度的情绪检测音频始终保存
+    STORAGE_POLICY_MEETING_CACHE_TTL: int = 60  # 会议录音开关缓存时间（秒）
+    AUDIO_RETENTION_DAYS: int = 90  # 识别/情绪音频和批量任务片段的保留天数，0表示永久保留
+    AUDIO_RETENTION_INTERVAL: float = 3600.0  # 过期音频清理间隔（秒）
+    AUDIO_RETENTION_BATCH_SIZE: int = 500  # 每批清理的记录数
+    
+    # 批量推理任务配置
+    JOB_WORKERS: int = 2  # 工作协程数量
+    JOB_BATCH_SIZE: int = 8  # 每次领取的条目数量
+    JOB_POLL_INTERVAL: float = 2.0  # 空闲轮询间隔（秒）
+    JOB_LEASE_SECONDS: int = 600  # 条目租约时长，超时后可被重新领取
+    JOB_MAX_ATTEMPTS: int = 3  # 条目最大处理次数
+    JOB_MAX_ITEMS: int = 500  # 单个任务最多音频片段数
+    
+    # 日志批量写入（识别日志、情绪检测记录）
+    LOG_WRITER_BATCH_SIZE: int = 200  # 攒够该行数立即写入
+    LOG_WRITER_FLUSH_INTERVAL: float = 0.2  # 最长攒批时间（秒）
+    LOG_WRITER_MAX_QUEUE: int = 10000  # 内存队列上限，超出时直接落盘
+    LOG_WRITER_SPOOL_DIR: str = "temp/log_spool"  # 数据库不可用时的暂存目录
+    LOG_WRITER_REPLAY_INTERVAL: float = 30.0  # 暂存文件重放间隔（秒）
+    LOG_WRITER_REPLAY_MAX_ATTEMPTS: int = 5  # 数据库可用时暂存文件仍重放失败的次数上限，超过后隔离为.failed
+    
+    # 持久化本地任务队列（响应后的收尾工作）
+    TASK_QUEUE_PATH: str = "data/task_queue.db"  # SQLite文件，同机工作进程共享
+    TASK_QUEUE_WORKERS: int = 2  # 工作协程数量
+    TASK_QUEUE_BATCH_SIZE: int = 50  # 同类型任务单次最多合并数量
+    TASK_QUEUE_POLL_INTERVAL: float = 1.0  # 空闲轮询间隔（秒）
+    TASK_QUEUE_MAX_ATTEMPTS: int = 5  # 最大尝试次数
+    TASK_QUEUE_LEASE_SECONDS: int = 300  # 领取租约，超时后可被重新领取
+    TASK_QUEUE_RETENTION_HOURS: int = 24  # 已完成任务保留时间（幂等键在此期间有效）
+    
+    # 情绪检测增量汇总（emotion_summaries）
+    EMOTION_ROLLUP_INTERVAL: float = 60.0  # 汇总间隔（秒）
+    EMOTION_ROLLUP_BATCH_SIZE: int = 5000  # 单批最多汇总的检测记录数
+    EMOTION_ROLLUP_SETTLE_SECONDS: float = 60.0  # 只汇总早于该时间的记录，避免跳过尚未提交的较小ID
+    
     # 微信配置
     WECHAT_APP_ID: Optional[str] = None
     WECHAT_APP_SECRET: Optional[str] = None
@@ -73,10 +173,26 @@ class Settings(BaseSettings):
     ALGORITHM: str = "HS256"
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 30 * 24 * 60  # 30天
     
+    # 密码哈希与登录并发
+    AUTH_HASH_WORKERS: int = 2  # bcrypt线程池大小
+    AUTH_LOGIN_MAX_CONCURRENCY: int = 2  # 同时进行密码验证的登录请求数
+    AUTH_LOGIN_MAX_QUEUE: int = 64  # 登录等待队列长度，超出返回429
+    AUTH_LOGIN_QUEUE_TIMEOUT: float = 10.0  # 登录排队超时（秒），超时返回503
+    AUTH_LOGIN_RETRY_AFTER: int = 1  # Retry-After响应头（秒）
+    
     # 文件上传配置
     UPLOAD_DIR: str = "uploads"
     TEMP_DIR: str = "temp"
     MAX_FILE_SIZE: int = 50 * 1024 * 1024  # 50MB
+    INGEST_MAX_DURATION: float = 300.0  # 单个上传音频最长时长（秒），按WAV头提前检查
+    BATCH_MAX_REQUEST_SIZE: int = 200 * 1024 * 1024  # 批量上传接口的请求体上限
+    
+    # 会议录音直传
+    RECORDING_MAX_SIZE: int = 2 * 1024 * 1024 * 1024  # 单个录音最大2GB
+    RECORDING_PART_SIZE: int = 16 * 1024 * 1024  # 分片大小，文件不超过该值时使用单次PUT
+    RECORDING_PRESIGN_EXPIRES: int = 3600  # 预签名地址有效期（秒）
+    RECORDING_SEGMENT_SECONDS: float = 10.0  # 录音分段识别的时长（秒）
+    RECORDING_FFMPEG_PATH: str = "ffmpeg"  # soundfile不支持的录音格式（aac/m4a）通过ffmpeg流式解码
     
     # Redis配置 (可选)
     REDIS_URL: Optional[str] = None
@@ -0,0 +1,81 @@
+"""
+请求截止时间与取消检查
+在音频处理流水线的各阶段之间检查请求是否超时或客户端是否已断开，
+以便尽早释放计算资源给仍在等待的请求
+"""
+
+import math
+import time
+from typing import Optional
+
+from fastapi import Request
+from loguru import logger
+
+from app.core.config import settings
+from app.core.exceptions import ClientDisconnectedError, RequestTimeoutError
+from app.core.metrics import metrics
+
+
+def clamp_timeout(client_timeout: Optional[str], max_timeout: float) -> float:
+    """解析客户端时限并限制在 [REQUEST_DEADLINE_MIN_SECONDS, max_timeout]，无法解析时使用max_timeout"""
+    if not client_timeout:
+        return max_timeout
+    try:
+        value = float(client_timeout)
+    except ValueError:
+        return max_timeout
+    if not math.isfinite(value):
+        return max_timeout
+    return max(min(value, max_timeout), min(settings.REQUEST_DEADLINE_MIN_SECONDS, max_timeout))
+
+
+class Deadline:
+    """请求截止时间"""
+
+    def __init__(
+        self,
+        timeout: Optional[float] = None,
+        request: Optional[Request] = None,
+        started_at: Optional[float] = None
+    ):
+        if timeout is not None:
+            self.expires_at = (started_at if started_at is not None else time.monotonic()) + timeout
+        else:
+            self.expires_at = None
+        self._request = request
+
+    @classmethod
+    def from_request(cls, request: Request, timeout: Optional[float] = None) -> "Deadline":
+        """根据请求创建截止时间，从请求到达时开始计时（包含读取上传体的时间）；
+        客户端可通过 X-Request-Timeout 头缩短时限，但不低于 REQUEST_DEADLINE_MIN_SECONDS"""
+        timeout = timeout if timeout is not None else settings.REQUEST_DEADLINE_SECONDS
+        timeout = clamp_timeout(request.headers.get("X-Request-Timeout"), timeout)
+        return cls(timeout=timeout, request=request, started_at=getattr(request.state, "received_at", None))
+
+    def remaining(self) -> Optional[float]:
+        """剩余时间（秒），无截止时间时返回None"""
+        if self.expires_at is None:
+            return None
+        return max(self.expires_at - time.monotonic(), 0.0)
+
+    @property
+    def expired(self) -> bool:
+        return self.expires_at is not None and time.monotonic() >= self.expires_at
+
+    async def checkpoint(self, stage: str):
+        """阶段检查点：超时或客户端断开时中止流水线"""
+        if self.expired:
+            metrics.incr(f"deadline.expired.{stage}")
+            logger.info(f"Request deadline exceeded before stage '{stage}'")
+            raise RequestTimeoutError(stage)
+
+        if self._request is not None and await self._request.is_disconnected():
+            metrics.incr(f"deadline.disconnected.{stage}")
+            logger.info(f"Client disconnected before stage '{stage}'")
+            raise ClientDisconnectedError(stage)
+
+
+async def checkpoint(deadline: Optional[Deadline], stage: str):
+    """可选截止时间的检查点"""
+    if deadline is not None:
+        await deadline.checkpoint(stage)
@@ -9,12 +9,14 @@ class VoiceprintException(Exception):
         message: str,
         status_code: int = 400,
         error_code: str = "VOICEPRINT_ERROR",
-        details: dict = None
+        details: dict = None,
+        headers: dict = None
     ):
         self.message = message
         self.status_code = status_code
         self.error_code = error_code
         self.details = details or {}
+        self.headers = headers
         super().__init__(self.message)
 
 
@@ -110,14 +112,81 @@ class ValidationError(VoiceprintException):
         )
 
 
+class SampleLimitExceededError(VoiceprintException):
+    """声纹样本数量超限异常"""
+    
+    def __init__(self, limit: int):
+        super().__init__(
+            message="已达到最大样本数量限制",
+            status_code=400,
+            error_code="SAMPLE_LIMIT_EXCEEDED",
+            details={"limit": limit}
+        )
+
+
+class PayloadTooLargeError(VoiceprintException):
+    """上传内容过大异常"""
+    
+    def __init__(self, limit: int):
+        super().__init__(
+            message=f"上传文件过大，最大{limit // (1024 * 1024)}MB",
+            status_code=413,
+            error_code="PAYLOAD_TOO_LARGE",
+            details={"limit": limit}
+        )
+
+
 class RateLimitError(VoiceprintException):
     """频率限制异常"""
     
-    def __init__(self, message: str = "请求过于频繁，请稍后再试"):
+    def __init__(self, message: str = "请求过于频繁，请稍后再试", retry_after: int = None):
         super().__init__(
             message=message,
             status_code=429,
-            error_code="RATE_LIMIT_EXCEEDED"
+            error_code="RATE_LIMIT_EXCEEDED",
+            details={"retry_after": retry_after} if retry_after else None,
+            headers={"Retry-After": str(retry_after)} if retry_after else None
+        )
+
+
+class ServiceBusyError(VoiceprintException):
+    """服务繁忙异常"""
+    
+    def __init__(self, message: str = "服务繁忙，请稍后再试", retry_after: int = None):
+        super().__init__(
+            message=message,
+            status_code=503,
+            error_code="SERVICE_BUSY",
+            details={"retry_after": retry_after} if retry_after else None,
+            headers={"Retry-After": str(retry_after)} if retry_after else None
+        )
+
+
+class RequestAbortedError(VoiceprintException):
+    """请求中止异常（超时或客户端断开）"""
+
+
+class RequestTimeoutError(RequestAbortedError):
+    """请求超时异常"""
+    
+    def __init__(self, stage: str = None):
+        super().__init__(
+            message="请求处理超时",
+            status_code=504,
+            error_code="REQUEST_DEADLINE_EXCEEDED",
+            details={"stage": stage} if stage else None
+        )
+
+
+class ClientDisconnectedError(RequestAbortedError):
+    """客户端已断开异常"""
+    
+    def __init__(self, stage: str = None):
+        super().__init__(
+            message="客户端已断开连接",
+            status_code=499,
+            error_code="CLIENT_CLOSED_REQUEST",
+            details={"stage": stage} if stage else None
         )
 
 
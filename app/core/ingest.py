@@ -0,0 +1,139 @@
+"""
+上传音频的流式接收
+- UploadLimitMiddleware: 在解析multipart之前按 Content-Length / 实际接收字节数拒绝超大请求，
+  不必先缓冲完整请求体
+- read_audio_upload: 分块读取UploadFile，首个分块即解析WAV头并检查时长，
+  累计大小超限时立即中止，只保留一份音频数据
+"""
+
+import struct
+from typing import Dict, Optional
+
+from fastapi import HTTPException, UploadFile
+from fastapi.responses import JSONResponse
+
+from app.core.config import settings
+from app.core.exceptions import AudioProcessingError, PayloadTooLargeError
+from app.core.metrics import metrics
+
+CHUNK_SIZE = 64 * 1024
+
+
+def _too_large_response(limit: int) -> JSONResponse:
+    return JSONResponse(
+        status_code=413,
+        content={
+            "success": False,
+            "message": f"请求体过大，最大{limit // (1024 * 1024)}MB",
+            "error_code": "PAYLOAD_TOO_LARGE",
+            "details": {"limit": limit}
+        }
+    )
+
+
+class UploadLimitMiddleware:
+    """请求体大小限制（纯ASGI中间件，支持按路径前缀设置不同上限）"""
+
+    def __init__(self, app, default_limit: int, overrides: Optional[Dict[str, int]] = None):
+        self.app = app
+        self.default_limit = default_limit
+        # 前缀越长越优先匹配
+        self.overrides = sorted((overrides or {}).items(), key=lambda item: len(item[0]), reverse=True)
+
+    def _limit_for(self, path: str) -> int:
+        for prefix, limit in self.overrides:
+            if path.startswith(prefix):
+                return limit
+        return self.default_limit
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] not in ("POST", "PUT", "PATCH"):
+            await self.app(scope, receive, send)
+            return
+
+        limit = self._limit_for(scope["path"])
+        headers = dict(scope.get("headers") or [])
+        content_length = headers.get(b"content-length")
+        if content_length is not None and content_length.isdigit() and int(content_length) > limit:
+            metrics.incr("ingest.rejected.content_length")
+            await _too_large_response(limit)(scope, receive, send)
+            return
+
+        # 分块传输（无Content-Length）时按实际接收字节数限制
+        received = 0
+
+        async def limited_receive():
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > limit:
+                    metrics.incr("ingest.rejected.streamed")
+                    raise HTTPException(status_code=413, detail=f"请求体过大，最大{limit // (1024 * 1024)}MB")
+            return message
+
+        await self.app(scope, limited_receive, send)
+
+
+def wav_duration_from_header(header: bytes, total_size: Optional[int] = None) -> Optional[float]:
+    """从WAV文件头估算时长（秒）；不是WAV或头信息不完整时返回None"""
+    if len(header) < 12 or header[:4] != b"RIFF" or header[8:12] != b"WAVE":
+        return None
+
+    byte_rate = None
+    offset = 12
+    while offset + 8 <= len(header):
+        chunk_id = header[offset:offset + 4]
+        chunk_size = struct.unpack("<I", header[offset + 4:offset + 8])[0]
+        body = offset + 8
+        if chunk_id == b"fmt " and body + 12 <= len(header):
+            byte_rate = struct.unpack("<I", header[body + 8:body + 12])[0]
+        elif chunk_id == b"data":
+            if not byte_rate:
+                return None
+            # 流式录制的WAV可能未回填data大小，此时用文件总大小估算
+            if chunk_size in (0, 0xFFFFFFFF) and total_size:
+                chunk_size = total_size - body
+            return chunk_size / byte_rate
+        offset = body + chunk_size + (chunk_size & 1)
+    return None
+
+
+async def read_audio_upload(
+    upload: UploadFile,
+    max_bytes: Optional[int] = None,
+    max_duration: Optional[float] = None
+) -> memoryview:
+    """分块读取上传的音频，尽早拒绝超大或超长的文件；返回接收缓冲区的只读视图，不再复制一份"""
+    max_bytes = max_bytes or settings.MAX_FILE_SIZE
+    max_duration = max_duration or settings.INGEST_MAX_DURATION
+
+    if upload.size is not None and upload.size > max_bytes:
+        metrics.incr("ingest.rejected.size")
+        raise PayloadTooLargeError(max_bytes)
+
+    buffer = bytearray()
+    first_chunk = True
+    while True:
+        chunk = await upload.read(CHUNK_SIZE)
+        if not chunk:
+            break
+        buffer += chunk
+        if len(buffer) > max_bytes:
+            metrics.incr("ingest.rejected.size")
+            raise PayloadTooLargeError(max_bytes)
+        if first_chunk:
+            first_chunk = False
+            duration = wav_duration_from_header(buffer, upload.size)
+            if duration is not None and duration > max_duration:
+                metrics.incr("ingest.rejected.duration")
+                raise AudioProcessingError(
+                    f"音频时长过长（{duration:.1f}秒），最长{max_duration:.0f}秒",
+                    details={"duration": duration, "max_duration": max_duration}
+                )
+
+    if not buffer:
+        raise AudioProcessingError("音频文件为空")
+
+    metrics.observe("ingest.upload_bytes", len(buffer))
+    return memoryview(buffer).toreadonly()
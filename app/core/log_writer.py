@@ -0,0 +1,281 @@
+"""
+日志记录批量写入（group commit）
+识别日志、情绪检测记录等只追加的行不再每行单独开会话提交：
+- 行先进入内存队列，每 LOG_WRITER_FLUSH_INTERVAL 秒或攒够 LOG_WRITER_BATCH_SIZE 行时
+  按表合并为多行INSERT，一次提交
+- 数据库不可用或队列已满时把行追加到本地暂存文件（JSON Lines），定期重放
+- 个别行违反约束（外键、字段长度等）时在保存点内按表、再按行重试，
+  只把失败的行隔离到 .failed 文件，其余行正常提交
+- 重放时反复失败的暂存文件改名为 .failed 隔离，不阻塞后续文件
+- 关闭时在时限内写完队列，剩余行落盘
+"""
+
+import asyncio
+import json
+import os
+import time
+import uuid
+from collections import defaultdict
+from typing import Dict, List, Tuple
+
+from loguru import logger
+from sqlalchemy import insert, text
+from sqlalchemy.exc import DataError, IntegrityError
+
+from app.core.config import settings
+from app.core.metrics import metrics
+from app.models.database import AsyncSessionLocal, Base
+
+
+class LogWriter:
+    """后台批量日志写入器"""
+
+    def __init__(
+        self,
+        batch_size: int,
+        flush_interval: float,
+        max_queue: int,
+        spool_dir: str,
+        replay_interval: float,
+        replay_max_attempts: int = 5
+    ):
+        self.batch_size = max(1, batch_size)
+        self.flush_interval = flush_interval
+        self.spool_dir = spool_dir
+        self.replay_interval = replay_interval
+        self.replay_max_attempts = max(1, replay_max_attempts)
+        self._replay_failures: Dict[str, int] = {}
+        self._queue: asyncio.Queue = asyncio.Queue(maxsize=max(1, max_queue))
+        self._tasks: List[asyncio.Task] = []
+        self._collecting: List[Tuple[str, Dict]] = []  # 已出队但尚未写入的行
+        metrics.register_gauge("log_writer.queue_depth", lambda: self._queue.qsize())
+
+    def submit(self, model, row: Dict):
+        """提交一行待写入的记录（model为ORM模型类，row为列名到值的映射）"""
+        item = (model.__tablename__, row)
+        try:
+            self._queue.put_nowait(item)
+            metrics.incr("log_writer.submitted")
+        except asyncio.QueueFull:
+            metrics.incr("log_writer.queue_full")
+            self._spill([item])
+
+    async def start(self):
+        if self._tasks:
+            return
+        os.makedirs(self.spool_dir, exist_ok=True)
+        self._tasks = [
+            asyncio.create_task(self._flush_loop(), name="log-writer"),
+            asyncio.create_task(self._replay_loop(), name="log-replay"),
+        ]
+        logger.info("Log writer started")
+
+    async def stop(self, drain_timeout: float = 10.0):
+        """停止写入器：尽量在时限内写完队列，剩余行落盘"""
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+        pending, self._collecting = self._collecting, []
+        try:
+            await asyncio.wait_for(self._drain(pending), timeout=drain_timeout)
+        except asyncio.TimeoutError:
+            logger.warning(f"Log writer drain timed out, spilling {self._queue.qsize()} pending rows")
+        remaining = pending
+        while not self._queue.empty():
+            remaining.append(self._queue.get_nowait())
+        if remaining:
+            self._spill(remaining)
+        logger.info("Log writer stopped")
+
+    async def _drain(self, pending: List[Tuple[str, Dict]]):
+        while pending or not self._queue.empty():
+            while not self._queue.empty() and len(pending) < self.batch_size:
+                pending.append(self._queue.get_nowait())
+            batch = pending[:self.batch_size]
+            del pending[:self.batch_size]
+            await self._flush(batch)
+
+    async def _collect(self):
+        """等待第一行，然后在flush_interval内最多再攒batch_size-1行"""
+        self._collecting.append(await self._queue.get())
+        deadline = time.monotonic() + self.flush_interval
+        while len(self._collecting) < self.batch_size:
+            timeout = deadline - time.monotonic()
+            if timeout <= 0:
+                break
+            try:
+                self._collecting.append(await asyncio.wait_for(self._queue.get(), timeout=timeout))
+            except asyncio.TimeoutError:
+                break
+
+    async def _flush_loop(self):
+        while True:
+            await self._collect()
+            batch, self._collecting = self._collecting, []
+            await self._flush(batch)
+
+    async def _flush(self, batch: List[Tuple[str, Dict]]):
+        """按表合并为多行INSERT并一次提交；只隔离违反约束的行，数据库不可用时整批落盘"""
+        if not batch:
+            return
+        try:
+            with metrics.timer("log_writer.flush"):
+                failed = await self._insert(batch)
+            metrics.incr("log_writer.written", len(batch) - len(failed))
+            metrics.observe("log_writer.batch_size", len(batch))
+            self._quarantine(failed)
+        except asyncio.CancelledError:
+            self._spill(batch)
+            raise
+        except Exception as e:
+            logger.error(f"Failed to flush {len(batch)} log rows, spilling to disk: {e}")
+            self._spill(batch)
+
+    async def _insert(self, batch: List[Tuple[str, Dict]]) -> List[Tuple[str, Dict, str]]:
+        """在一个事务中写入整批，返回因数据错误被跳过的行 [(表名, 行, 错误)]
+        
+        每张表先在保存点内整体插入，失败时再逐行在保存点内插入，只有出错的行被跳过；
+        连接中断等非数据错误直接抛出，由调用方整批落盘。
+        """
+        rows_by_table: Dict[str, List[Dict]] = defaultdict(list)
+        failed: List[Tuple[str, Dict, str]] = []
+        for table_name, row in batch:
+            if table_name in Base.metadata.tables:
+                rows_by_table[table_name].append(row)
+            else:
+                failed.append((table_name, row, "unknown table"))
+
+        async with AsyncSessionLocal() as db:
+            for table_name, rows in rows_by_table.items():
+                table = Base.metadata.tables[table_name]
+                try:
+                    async with db.begin_nested():
+                        await db.execute(insert(table), rows)
+                    continue
+                except (IntegrityError, DataError) as e:
+                    if len(rows) == 1:
+                        failed.append((table_name, rows[0], str(e.orig)))
+                        continue
+                    metrics.incr("log_writer.batch_retry_rows")
+                for row in rows:
+                    try:
+                        async with db.begin_nested():
+                            await db.execute(insert(table), [row])
+                    except (IntegrityError, DataError) as e:
+                        failed.append((table_name, row, str(e.orig)))
+            await db.commit()
+        return failed
+
+    def _quarantine(self, failed: List[Tuple[str, Dict, str]]):
+        """把无法写入的行写入 .failed 文件（不再重放），便于人工排查"""
+        if not failed:
+            return
+        metrics.incr("log_writer.quarantined", len(failed))
+        logger.warning(f"Quarantined {len(failed)} log rows that violate constraints: {failed[0][2]}")
+        self._spill([(table_name, row) for table_name, row, _ in failed], suffix=".failed",
+                    errors=[error for _, _, error in failed])
+
+    def _spill(self, batch: List[Tuple[str, Dict]], suffix: str = ".jsonl", errors: List[str] = None):
+        """把一批行追加写入暂存文件，文件写完后再改名，重放时不会读到半个文件"""
+        spool_id = f"{int(time.time() * 1000)}_{uuid.uuid4().hex[:8]}"
+        temp_path = os.path.join(self.spool_dir, f"{spool_id}.tmp")
+        try:
+            os.makedirs(self.spool_dir, exist_ok=True)
+            with open(temp_path, "w", encoding="utf-8") as f:
+                for index, (table_name, row) in enumerate(batch):
+                    entry = {"table": table_name, "row": row}
+                    if errors:
+                        entry["error"] = errors[index]
+                    f.write(json.dumps(entry, ensure_ascii=False, default=str))
+                    f.write("\n")
+            os.replace(temp_path, os.path.join(self.spool_dir, f"{spool_id}{suffix}"))
+            if suffix == ".jsonl":
+                metrics.incr("log_writer.spilled", len(batch))
+        except Exception as e:
+            metrics.incr("log_writer.lost", len(batch))
+            logger.error(f"Failed to spill {len(batch)} log rows, rows are lost: {e}")
+
+    async def _replay_loop(self):
+        while True:
+            await asyncio.sleep(self.replay_interval)
+            try:
+                await self.replay()
+            except Exception as e:
+                logger.warning(f"Log spool replay stopped: {e}")
+
+    async def replay(self) -> int:
+        """把暂存文件中的行写回数据库，返回写入行数；数据库仍不可用时抛出异常"""
+        replayed = 0
+        for name in await asyncio.to_thread(self._spool_files):
+            path = os.path.join(self.spool_dir, name)
+            try:
+                batch = await asyncio.to_thread(self._read_spool_file, path)
+            except (ValueError, KeyError) as e:
+                # 文件内容损坏，重放不会成功
+                self._quarantine_file(name, f"unreadable spool file: {e}")
+                continue
+            try:
+                # 整个文件在一个事务中写入，失败时下次重放不会产生重复行
+                failed = await self._insert(batch)
+            except Exception as e:
+                if not await self._database_available():
+                    raise
+                # 数据库可用但该文件仍然失败：计数，超过次数后隔离，继续重放其他文件
+                attempts = self._replay_failures.get(name, 0) + 1
+                self._replay_failures[name] = attempts
+                if attempts >= self.replay_max_attempts:
+                    self._quarantine_file(name, str(e))
+                else:
+                    logger.warning(f"Replay of {name} failed ({attempts}/{self.replay_max_attempts}): {e}")
+                continue
+
+            self._quarantine(failed)
+            os.unlink(path)
+            self._replay_failures.pop(name, None)
+            replayed += len(batch) - len(failed)
+        if replayed:
+            metrics.incr("log_writer.replayed", replayed)
+            logger.info(f"Replayed {replayed} spilled log rows")
+        return replayed
+
+    async def _database_available(self) -> bool:
+        try:
+            async with AsyncSessionLocal() as db:
+                await db.execute(text("SELECT 1"))
+            return True
+        except Exception:
+            return False
+
+    def _quarantine_file(self, name: str, reason: str):
+        path = os.path.join(self.spool_dir, name)
+        os.replace(path, path[:-len(".jsonl")] + ".failed")
+        self._replay_failures.pop(name, None)
+        metrics.incr("log_writer.quarantined_files")
+        logger.error(f"Quarantined log spool file {name}: {reason}")
+
+    def _spool_files(self) -> List[str]:
+        if not os.path.isdir(self.spool_dir):
+            return []
+        return sorted(name for name in os.listdir(self.spool_dir) if name.endswith(".jsonl"))
+
+    def _read_spool_file(self, path: str) -> List[Tuple[str, Dict]]:
+        batch = []
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    entry = json.loads(line)
+                    batch.append((entry["table"], entry["row"]))
+        return batch
+
+
+# 全局日志写入器
+log_writer = LogWriter(
+    batch_size=settings.LOG_WRITER_BATCH_SIZE,
+    flush_interval=settings.LOG_WRITER_FLUSH_INTERVAL,
+    max_queue=settings.LOG_WRITER_MAX_QUEUE,
+    spool_dir=settings.LOG_WRITER_SPOOL_DIR,
+    replay_interval=settings.LOG_WRITER_REPLAY_INTERVAL,
+    replay_max_attempts=settings.LOG_WRITER_REPLAY_MAX_ATTEMPTS
+)
@@ -0,0 +1,101 @@
+"""
+进程内轻量级指标收集
+计数器、滑动窗口延迟统计和按需计算的仪表值，供健康检查和系统管理接口导出
+"""
+
+import threading
+import time
+from collections import defaultdict, deque
+from contextlib import contextmanager
+from typing import Callable, Deque, Dict, Optional
+
+
+class LatencyWindow:
+    """滑动窗口延迟统计（保留最近N个样本用于计算分位数）"""
+
+    def __init__(self, size: int = 1024):
+        self._samples: Deque[float] = deque(maxlen=size)
+        self.count = 0
+        self.total = 0.0
+
+    def observe(self, value: float):
+        self._samples.append(value)
+        self.count += 1
+        self.total += value
+
+    def percentile(self, q: float) -> float:
+        """计算窗口内样本的分位数 (q: 0-100)"""
+        if not self._samples:
+            return 0.0
+        ordered = sorted(self._samples)
+        index = min(int(round(q / 100 * (len(ordered) - 1))), len(ordered) - 1)
+        return ordered[index]
+
+    def snapshot(self) -> Dict[str, float]:
+        return {
+            "count": self.count,
+            "avg": self.total / self.count if self.count else 0.0,
+            "p50": self.percentile(50),
+            "p95": self.percentile(95),
+            "p99": self.percentile(99),
+            "max": max(self._samples) if self._samples else 0.0,
+        }
+
+
+class MetricsRegistry:
+    """指标注册表（线程安全，可在线程池任务中调用）"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters: Dict[str, float] = defaultdict(float)
+        self._latencies: Dict[str, LatencyWindow] = defaultdict(LatencyWindow)
+        self._gauges: Dict[str, Callable[[], float]] = {}
+
+    def incr(self, name: str, value: float = 1):
+        """计数器累加"""
+        with self._lock:
+            self._counters[name] += value
+
+    def observe(self, name: str, value: float):
+        """记录一个延迟样本（秒）"""
+        with self._lock:
+            self._latencies[name].observe(value)
+
+    def register_gauge(self, name: str, func: Callable[[], float]):
+        """注册仪表值，导出时实时计算"""
+        self._gauges[name] = func
+
+    def counter(self, name: str) -> float:
+        with self._lock:
+            return self._counters.get(name, 0)
+
+    def latency(self, name: str) -> Optional[Dict[str, float]]:
+        with self._lock:
+            window = self._latencies.get(name)
+            return window.snapshot() if window else None
+
+    @contextmanager
+    def timer(self, name: str):
+        """计时上下文，退出时记录耗时"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start)
+
+    def snapshot(self) -> Dict[str, Dict]:
+        """导出全部指标"""
+        with self._lock:
+            counters = dict(self._counters)
+            latencies = {name: window.snapshot() for name, window in self._latencies.items()}
+        gauges = {}
+        for name, func in self._gauges.items():
+            try:
+                gauges[name] = func()
+            except Exception:
+                gauges[name] = None
+        return {"counters": counters, "gauges": gauges, "latencies": latencies}
+
+
+# 全局指标注册表
+metrics = MetricsRegistry()
@@ -1,3 +1,4 @@
+import urllib3
 from minio import Minio
 from minio.error import S3Error
 from app.core.config import settings
@@ -5,12 +6,22 @@ import logging
 
 logger = logging.getLogger(__name__)
 
-# 创建MinIO客户端实例
+# 连接池大小与存储线程池一致（默认的urllib3连接池只有10个连接，
+# 并发上传/下载超过时会频繁新建和丢弃连接）
+http_client = urllib3.PoolManager(
+    maxsize=settings.MINIO_POOL_MAXSIZE,
+    block=True,
+    timeout=urllib3.Timeout(connect=settings.MINIO_CONNECT_TIMEOUT, read=settings.MINIO_READ_TIMEOUT),
+    retries=urllib3.Retry(total=3, backoff_factor=0.2, status_forcelist=[500, 502, 503, 504])
+)
+
+# 创建MinIO客户端实例（异步调用请使用 app.core.storage.storage）
 minio_client = Minio(
     endpoint=settings.MINIO_ENDPOINT,
     access_key=settings.MINIO_ACCESS_KEY,
     secret_key=settings.MINIO_SECRET_KEY,
-    secure=settings.MINIO_SECURE
+    secure=settings.MINIO_SECURE,
+    http_client=http_client
 )
 
 def test_minio_connection():
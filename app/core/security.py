@@ -1,13 +1,18 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
-from typing import Optional, Union
+from typing import Any, Dict, Optional, Union
 from jose import JWTError, jwt
 from passlib.context import CryptContext
 from fastapi import HTTPException, status, Depends
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
-from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import DateTime, select
 
+from app.core.cache import ResultCache, invalidate_on_commit
+from app.core.concurrency import AdmissionController, PRIORITY_INTERACTIVE, PRIORITY_BULK
 from app.core.config import settings
-from app.models.database import get_db
+from app.core.metrics import metrics
+from app.models.database import AsyncSessionLocal
 from app.models.user import UserModel
 
 # 密码加密上下文
@@ -27,6 +32,36 @@ def get_password_hash(password: str) -> str:
     return pwd_context.hash(password)
 
 
+# bcrypt是纯CPU计算（单次数十到数百毫秒），放到有界线程池中执行，不阻塞事件循环
+password_executor = ThreadPoolExecutor(max_workers=max(1, settings.AUTH_HASH_WORKERS), thread_name_prefix="password")
+
+# 登录并发限制：上班高峰的登录请求排队，不挤占识别请求的CPU
+login_limiter = AdmissionController(
+    name="auth_login",
+    max_concurrency=settings.AUTH_LOGIN_MAX_CONCURRENCY,
+    max_queue={PRIORITY_INTERACTIVE: settings.AUTH_LOGIN_MAX_QUEUE, PRIORITY_BULK: 0},
+    queue_timeout={PRIORITY_INTERACTIVE: settings.AUTH_LOGIN_QUEUE_TIMEOUT, PRIORITY_BULK: 0},
+    retry_after=settings.AUTH_LOGIN_RETRY_AFTER
+)
+
+metrics.register_gauge("auth_login.in_flight", lambda: login_limiter.in_flight)
+metrics.register_gauge("auth_login.queue_depth", lambda: login_limiter.queue_depth)
+
+
+async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+    """在密码线程池中验证密码"""
+    loop = asyncio.get_running_loop()
+    with metrics.timer("auth.password_verify"):
+        return await loop.run_in_executor(password_executor, verify_password, plain_password, hashed_password)
+
+
+async def get_password_hash_async(password: str) -> str:
+    """在密码线程池中生成密码哈希"""
+    loop = asyncio.get_running_loop()
+    with metrics.timer("auth.password_hash"):
+        return await loop.run_in_executor(password_executor, get_password_hash, password)
+
+
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -> str:
     """创建访问令牌"""
     to_encode = data.copy()
@@ -60,18 +95,72 @@ def verify_token(token: str) -> dict:
         )
 
 
+# 已解析的用户缓存（按令牌subject即用户名），命中时认证不再查询数据库。
+# 配置REDIS_URL时多个worker共享；本进程副本最多保留 PRINCIPAL_CACHE_TTL 秒
+principal_cache = ResultCache(
+    name="principal",
+    maxsize=settings.PRINCIPAL_CACHE_MAX_ENTRIES,
+    ttl=settings.PRINCIPAL_CACHE_TTL,
+    redis_url=settings.REDIS_URL
+) if settings.PRINCIPAL_CACHE_ENABLED else None
+
+# 敏感字段不进入缓存
+_PRINCIPAL_EXCLUDED = {"hashed_password", "session_key"}
+
+
+def _principal_to_dict(user: UserModel) -> Dict[str, Any]:
+    data = {}
+    for column in UserModel.__table__.columns:
+        if column.key in _PRINCIPAL_EXCLUDED:
+            continue
+        value = getattr(user, column.key)
+        data[column.key] = value.isoformat() if isinstance(value, datetime) else value
+    return data
+
+
+def _principal_from_dict(data: Dict[str, Any]) -> UserModel:
+    """从缓存重建用户对象（未关联数据库会话，只用于读取属性）"""
+    values = dict(data)
+    for column in UserModel.__table__.columns:
+        if isinstance(column.type, DateTime) and values.get(column.key):
+            values[column.key] = datetime.fromisoformat(values[column.key])
+    return UserModel(**values)
+
+
+async def invalidate_principal(username: str):
+    """用户被修改或停用后清除缓存"""
+    if principal_cache is not None and username:
+        await principal_cache.delete(username)
+
+
+# ORM修改或停用用户时失效缓存，提交后再删除一次，避免并发认证把旧行写回缓存
+invalidate_on_commit(UserModel, principal_cache, lambda user: user.username)
+
+
+async def _load_principal(username: str) -> Optional[UserModel]:
+    if principal_cache is not None:
+        cached = await principal_cache.get(username)
+        if cached is not None:
+            return _principal_from_dict(cached)
+
+    async with AsyncSessionLocal() as db:
+        result = await db.execute(select(UserModel).where(UserModel.username == username))
+        user = result.scalar_one_or_none()
+
+    # 只缓存有效用户，停用用户每次都查库以便重新启用后立即生效
+    if user is not None and user.is_active and principal_cache is not None:
+        await principal_cache.set(username, _principal_to_dict(user))
+    return user
+
+
 async def get_current_user(
-    credentials: HTTPAuthorizationCredentials = Depends(security),
-    db: AsyncSession = Depends(get_db)
+    credentials: HTTPAuthorizationCredentials = Depends(security)
 ) -> UserModel:
     """获取当前用户"""
     token = credentials.credentials
     payload = verify_token(token)
     
-    from sqlalchemy import select
-    stmt = select(UserModel).where(UserModel.username == payload.get("sub"))
-    result = await db.execute(stmt)
-    user = result.scalar_one_or_none()
+    user = await _load_principal(payload.get("sub"))
     
     if user is None:
         raise HTTPException(
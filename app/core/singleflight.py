@@ -0,0 +1,84 @@
+"""
+并发请求合并（single-flight）
+同一内容哈希的请求同时到达时，只有第一个请求（leader）执行计算，
+其余请求（follower）等待leader的结果。leader因自身超时或客户端断开而中止时，
+follower不会继承该错误，而是重新竞选leader继续计算。
+"""
+
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from app.core.exceptions import RequestAbortedError, RequestTimeoutError
+from app.core.metrics import metrics
+
+
+class SingleFlight:
+    """按键合并进行中的异步调用"""
+
+    def __init__(self, name: str):
+        self.name = name
+        self._calls: Dict[str, asyncio.Future] = {}
+        metrics.register_gauge(f"singleflight.{name}.in_flight", lambda: len(self._calls))
+        metrics.register_gauge(f"singleflight.{name}.hit_rate", self.hit_rate)
+
+    def hit_rate(self) -> float:
+        """被合并的调用占全部调用的比例"""
+        leaders = metrics.counter(f"singleflight.{self.name}.leader")
+        coalesced = metrics.counter(f"singleflight.{self.name}.coalesced")
+        total = leaders + coalesced
+        return coalesced / total if total else 0.0
+
+    async def do(
+        self,
+        key: str,
+        func: Callable[[], Awaitable[Any]],
+        timeout: Optional[float] = None
+    ) -> Any:
+        """执行调用；相同键已有调用进行中时等待其结果（timeout为follower的等待上限）"""
+        while True:
+            future = self._calls.get(key)
+            if future is None:
+                return await self._lead(key, func)
+
+            metrics.incr(f"singleflight.{self.name}.coalesced")
+            try:
+                return await asyncio.wait_for(asyncio.shield(future), timeout=timeout)
+            except asyncio.TimeoutError:
+                raise RequestTimeoutError("coalesce")
+            except (RequestAbortedError, asyncio.CancelledError):
+                if not self._leader_aborted(future):
+                    raise
+                # leader被中止，结果与本请求无关，重新执行
+                metrics.incr(f"singleflight.{self.name}.retry")
+
+    async def _lead(self, key: str, func: Callable[[], Awaitable[Any]]) -> Any:
+        future = asyncio.get_running_loop().create_future()
+        self._calls[key] = future
+        metrics.incr(f"singleflight.{self.name}.leader")
+        try:
+            result = await func()
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except BaseException as e:
+            future.set_exception(e)
+            # 标记异常已读取，没有follower时不产生 "exception was never retrieved" 警告
+            future.exception()
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            if self._calls.get(key) is future:
+                del self._calls[key]
+
+    @staticmethod
+    def _leader_aborted(future: asyncio.Future) -> bool:
+        if not future.done():
+            return False
+        return future.cancelled() or isinstance(future.exception(), RequestAbortedError)
+
+
+# 全局请求合并实例
+embedding_flight = SingleFlight("embedding")
+emotion_flight = SingleFlight("emotion")
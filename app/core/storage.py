@@ -0,0 +1,376 @@
+"""
+异步对象存储客户端
+业务代码只依赖 StorageBackend 接口，具体后端由 STORAGE_BACKEND 选择：
+- minio: MinIO/S3，阻塞调用放到专用线程池执行，线程池大小与底层urllib3连接池一致
+- local: 本地文件系统，按对象名哈希分两级目录存放，写入采用临时文件+原子rename，
+  单机部署省去每个样本一次HTTP往返，也可作为基准测试/测试环境的MinIO替身
+每类操作记录耗时（storage.<op>）和失败次数（storage.<op>.error）。
+"""
+
+import asyncio
+import hashlib
+import io
+import os
+import shutil
+import tempfile
+import time
+from abc import ABC, abstractmethod
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from datetime import timedelta
+from typing import Dict, List, Optional
+
+from loguru import logger
+
+from app.core.config import settings
+from app.core.exceptions import StorageError
+from app.core.metrics import metrics
+
+STREAM_CHUNK_SIZE = 256 * 1024
+# 单次批量删除请求的对象数上限（S3协议限制）
+MAX_DELETE_BATCH = 1000
+
+
+@dataclass
+class ObjectStat:
+    """对象元信息"""
+    object_name: str
+    size: int
+
+
+class StorageBackend(ABC):
+    """对象存储后端接口（所有方法均为异步，未实现全部抽象方法的后端在构造时报错）"""
+
+    name = "base"
+
+    def __init__(self, base_url: str, max_workers: int):
+        self.base_url = base_url.rstrip("/")
+        self._executor = ThreadPoolExecutor(max_workers=max(1, max_workers), thread_name_prefix="storage")
+        metrics.register_gauge("storage.pool_size", lambda: max_workers)
+
+    async def _run(self, op: str, func, *args, **kwargs):
+        loop = asyncio.get_running_loop()
+        start = time.perf_counter()
+        try:
+            return await loop.run_in_executor(self._executor, lambda: func(*args, **kwargs))
+        except Exception:
+            metrics.incr(f"storage.{op}.error")
+            raise
+        finally:
+            metrics.observe(f"storage.{op}", time.perf_counter() - start)
+
+    def object_url(self, object_name: str) -> str:
+        """对象的访问URL"""
+        return f"{self.base_url}/{object_name}"
+
+    def object_name_from_url(self, url: str) -> Optional[str]:
+        """从对象URL解析对象名；不是本存储的URL时返回None"""
+        prefix = f"{self.base_url}/"
+        if url and url.startswith(prefix):
+            return url[len(prefix):]
+        return None
+
+    async def initialize(self):
+        """启动时准备存储（建桶/建目录）"""
+
+    async def ping(self):
+        """连通性检查（健康检查使用）"""
+
+    @abstractmethod
+    async def put(
+        self,
+        object_name: str,
+        data: bytes,
+        content_type: str = "audio/wav",
+        metadata: Optional[Dict[str, str]] = None
+    ):
+        """上传对象"""
+
+    @abstractmethod
+    async def get(self, object_name: str) -> bytes:
+        """读取整个对象"""
+
+    @abstractmethod
+    async def download(self, object_name: str, file_obj) -> int:
+        """按块把对象写入文件对象，返回字节数（内存占用与对象大小无关）"""
+
+    @abstractmethod
+    async def stat(self, object_name: str) -> ObjectStat:
+        """对象元信息"""
+
+    @abstractmethod
+    async def remove(self, object_name: str):
+        """删除对象（对象不存在时不报错）"""
+
+    @abstractmethod
+    async def remove_many(self, object_names: List[str]) -> List[str]:
+        """批量删除对象，返回删除失败的对象名"""
+
+    async def presigned_put_url(self, object_name: str, expires: int) -> str:
+        raise StorageError(f"{self.name}存储不支持客户端直传")
+
+    async def create_multipart_upload(self, object_name: str, content_type: str) -> str:
+        raise StorageError(f"{self.name}存储不支持分片直传")
+
+    async def presigned_part_url(self, object_name: str, upload_id: str, part_number: int, expires: int) -> str:
+        raise StorageError(f"{self.name}存储不支持分片直传")
+
+    async def complete_multipart_upload(self, object_name: str, upload_id: str, parts: List[Dict]):
+        raise StorageError(f"{self.name}存储不支持分片直传")
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False)
+
+
+class MinioStorage(StorageBackend):
+    """MinIO/S3 后端"""
+
+    name = "minio"
+
+    def __init__(self, bucket: str, max_workers: int):
+        # 延迟导入：使用本地后端时不创建MinIO客户端
+        from app.core.minio_client import minio_client
+        super().__init__(f"{settings.minio_url}/{bucket}", max_workers)
+        self.client = minio_client
+        self.bucket = bucket
+
+    def object_name_from_url(self, url: str) -> Optional[str]:
+        object_name = super().object_name_from_url(url)
+        if object_name is None and url:
+            # 兼容MINIO_ENDPOINT变更前保存的URL
+            marker = f"/{self.bucket}/"
+            if marker in url:
+                object_name = url.split(marker, 1)[1]
+        return object_name
+
+    async def initialize(self):
+        if not await self._run("bucket_exists", self.client.bucket_exists, self.bucket):
+            await self._run("make_bucket", self.client.make_bucket, self.bucket)
+            logger.info(f"MinIO bucket '{self.bucket}' created")
+        else:
+            logger.info(f"MinIO bucket '{self.bucket}' already exists")
+
+    async def ping(self):
+        await self._run("ping", self.client.bucket_exists, self.bucket)
+
+    async def put(
+        self,
+        object_name: str,
+        data: bytes,
+        content_type: str = "audio/wav",
+        metadata: Optional[Dict[str, str]] = None
+    ):
+        await self._run(
+            "put",
+            self.client.put_object,
+            bucket_name=self.bucket,
+            object_name=object_name,
+            data=io.BytesIO(data),
+            length=len(data),
+            content_type=content_type,
+            metadata=metadata or None
+        )
+        metrics.incr("storage.put_bytes", len(data))
+
+    def _get(self, object_name: str) -> bytes:
+        response = self.client.get_object(self.bucket, object_name)
+        try:
+            return response.read()
+        finally:
+            response.close()
+            response.release_conn()
+
+    async def get(self, object_name: str) -> bytes:
+        data = await self._run("get", self._get, object_name)
+        metrics.incr("storage.get_bytes", len(data))
+        return data
+
+    def _download(self, object_name: str, file_obj) -> int:
+        response = self.client.get_object(self.bucket, object_name)
+        size = 0
+        try:
+            for chunk in response.stream(STREAM_CHUNK_SIZE):
+                file_obj.write(chunk)
+                size += len(chunk)
+            return size
+        finally:
+            response.close()
+            response.release_conn()
+
+    async def download(self, object_name: str, file_obj) -> int:
+        size = await self._run("download", self._download, object_name, file_obj)
+        metrics.incr("storage.get_bytes", size)
+        return size
+
+    async def stat(self, object_name: str) -> ObjectStat:
+        info = await self._run("stat", self.client.stat_object, self.bucket, object_name)
+        return ObjectStat(object_name=object_name, size=info.size)
+
+    async def remove(self, object_name: str):
+        await self._run("remove", self.client.remove_object, self.bucket, object_name)
+
+    def _remove_many(self, object_names: List[str]) -> List[str]:
+        from minio.deleteobjects import DeleteObject
+        failed = []
+        for offset in range(0, len(object_names), MAX_DELETE_BATCH):
+            batch = [DeleteObject(name) for name in object_names[offset:offset + MAX_DELETE_BATCH]]
+            # remove_objects是惰性的，迭代时才真正发出请求
+            for error in self.client.remove_objects(self.bucket, batch):
+                logger.warning(f"Failed to remove object {error.name}: {error.message}")
+                failed.append(error.name)
+        return failed
+
+    async def remove_many(self, object_names: List[str]) -> List[str]:
+        if not object_names:
+            return []
+        failed = await self._run("remove_many", self._remove_many, list(object_names))
+        metrics.incr("storage.removed", len(object_names) - len(failed))
+        return failed
+
+    async def presigned_put_url(self, object_name: str, expires: int) -> str:
+        return await self._run(
+            "presign", self.client.presigned_put_object, self.bucket, object_name, timedelta(seconds=expires)
+        )
+
+    async def create_multipart_upload(self, object_name: str, content_type: str) -> str:
+        return await self._run(
+            "multipart_create",
+            self.client._create_multipart_upload,
+            self.bucket, object_name, {"Content-Type": content_type}
+        )
+
+    async def presigned_part_url(self, object_name: str, upload_id: str, part_number: int, expires: int) -> str:
+        return await self._run(
+            "presign",
+            self.client.get_presigned_url,
+            "PUT", self.bucket, object_name, timedelta(seconds=expires),
+            extra_query_params={"uploadId": upload_id, "partNumber": str(part_number)}
+        )
+
+    async def complete_multipart_upload(self, object_name: str, upload_id: str, parts: List[Dict]):
+        """合并分片；parts为 {"part_number", "etag"} 列表"""
+        from minio.datatypes import Part
+        ordered = sorted(parts, key=lambda part: part["part_number"])
+        await self._run(
+            "multipart_complete",
+            self.client._complete_multipart_upload,
+            self.bucket, object_name, upload_id,
+            [Part(part["part_number"], part["etag"]) for part in ordered]
+        )
+
+
+class LocalStorage(StorageBackend):
+    """本地文件系统后端"""
+
+    name = "local"
+
+    def __init__(self, root: str, base_url: str, max_workers: int):
+        super().__init__(base_url, max_workers)
+        self.root = os.path.abspath(root)
+
+    def path_for(self, object_name: str) -> str:
+        """对象在磁盘上的路径：<root>/<hash[0:2]>/<hash[2:4]>/<object_name>，
+        避免单个目录下文件过多"""
+        normalized = os.path.normpath(object_name).lstrip("/")
+        if normalized.startswith("..") or os.path.isabs(normalized):
+            raise StorageError(f"非法的对象名: {object_name}")
+        digest = hashlib.sha1(normalized.encode("utf-8")).hexdigest()
+        return os.path.join(self.root, digest[:2], digest[2:4], normalized)
+
+    async def initialize(self):
+        os.makedirs(self.root, exist_ok=True)
+        logger.info(f"Local object storage at {self.root}")
+
+    async def ping(self):
+        if not os.access(self.root, os.W_OK):
+            raise StorageError(f"本地存储目录不可写: {self.root}")
+
+    def _put(self, object_name: str, data: bytes):
+        path = self.path_for(object_name)
+        directory = os.path.dirname(path)
+        os.makedirs(directory, exist_ok=True)
+        # 同目录下写临时文件再rename，读者永远看不到写了一半的对象
+        fd, temp_path = tempfile.mkstemp(dir=directory, prefix=".tmp-")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(temp_path, path)
+        except Exception:
+            if os.path.exists(temp_path):
+                os.unlink(temp_path)
+            raise
+
+    async def put(
+        self,
+        object_name: str,
+        data: bytes,
+        content_type: str = "audio/wav",
+        metadata: Optional[Dict[str, str]] = None
+    ):
+        await self._run("put", self._put, object_name, data)
+        metrics.incr("storage.put_bytes", len(data))
+
+    def _get(self, object_name: str) -> bytes:
+        with open(self.path_for(object_name), "rb") as f:
+            return f.read()
+
+    async def get(self, object_name: str) -> bytes:
+        data = await self._run("get", self._get, object_name)
+        metrics.incr("storage.get_bytes", len(data))
+        return data
+
+    def _download(self, object_name: str, file_obj) -> int:
+        with open(self.path_for(object_name), "rb") as f:
+            shutil.copyfileobj(f, file_obj, STREAM_CHUNK_SIZE)
+            return f.tell()
+
+    async def download(self, object_name: str, file_obj) -> int:
+        size = await self._run("download", self._download, object_name, file_obj)
+        metrics.incr("storage.get_bytes", size)
+        return size
+
+    async def stat(self, object_name: str) -> ObjectStat:
+        size = await self._run("stat", os.path.getsize, self.path_for(object_name))
+        return ObjectStat(object_name=object_name, size=size)
+
+    def _remove(self, object_name: str) -> bool:
+        try:
+            os.unlink(self.path_for(object_name))
+        except FileNotFoundError:
+            pass
+        return True
+
+    async def remove(self, object_name: str):
+        await self._run("remove", self._remove, object_name)
+
+    def _remove_many(self, object_names: List[str]) -> List[str]:
+        failed = []
+        for object_name in object_names:
+            try:
+                self._remove(object_name)
+            except Exception as e:
+                logger.warning(f"Failed to remove object {object_name}: {e}")
+                failed.append(object_name)
+        return failed
+
+    async def remove_many(self, object_names: List[str]) -> List[str]:
+        if not object_names:
+            return []
+        failed = await self._run("remove_many", self._remove_many, list(object_names))
+        metrics.incr("storage.removed", len(object_names) - len(failed))
+        return failed
+
+
+def create_storage() -> StorageBackend:
+    """按配置创建存储后端"""
+    if settings.STORAGE_BACKEND == "local":
+        return LocalStorage(settings.STORAGE_LOCAL_ROOT, settings.STORAGE_LOCAL_BASE_URL, settings.STORAGE_LOCAL_WORKERS)
+    if settings.STORAGE_BACKEND != "minio":
+        raise ValueError(f"Unknown STORAGE_BACKEND: {settings.STORAGE_BACKEND}")
+    return MinioStorage(settings.MINIO_BUCKET, settings.MINIO_POOL_MAXSIZE)
+
+
+# 全局存储客户端
+storage = create_storage()
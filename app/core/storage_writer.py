@@ -0,0 +1,267 @@
+"""
+异步对象存储写入
+音频URL在请求处理时即可确定，实际上传由后台协程完成，不再占用请求响应时间。
+- 有界队列 + 并发上限，避免存储抖动拖垮事件循环
+- 上传失败按指数退避重试，重试耗尽或队列已满时落盘到本地暂存目录
+- 定期对账：将暂存目录中的条目重新放回上传队列
+- 可选归档编码（FLAC/Opus）同样在后台线程中完成
+- 可选上传守卫：上传期间持有对象的引用记录锁，对象已被释放时跳过上传
+"""
+
+import asyncio
+import json
+import os
+import uuid
+from dataclasses import dataclass, field
+from typing import AsyncContextManager, Callable, Dict, List, Optional
+
+from loguru import logger
+
+from app.core.config import settings
+from app.core.metrics import metrics
+from app.core.storage import storage
+from app.utils.audio_codec import encode_archive
+
+
+@dataclass
+class UploadTask:
+    """待上传对象"""
+    object_name: str
+    data: bytes
+    content_type: str = "audio/wav"
+    metadata: Dict[str, str] = field(default_factory=dict)
+    codec: Optional[str] = None  # 待执行的归档编码，编码完成后置空
+    spool_id: Optional[str] = None  # 来自暂存目录时的条目ID
+
+
+class StorageWriter:
+    """后台对象存储写入器"""
+
+    def __init__(
+        self,
+        max_queue: int,
+        concurrency: int,
+        max_retries: int,
+        spool_dir: str,
+        reconcile_interval: float
+    ):
+        self.concurrency = max(1, concurrency)
+        self.max_retries = max_retries
+        self.spool_dir = spool_dir
+        self.reconcile_interval = reconcile_interval
+        self._queue: asyncio.Queue = asyncio.Queue(maxsize=max(1, max_queue))
+        self._tasks: List[asyncio.Task] = []
+        self._pending_spool: set = set()
+        self._upload_guard: Optional[Callable[[str], AsyncContextManager[bool]]] = None
+
+    @property
+    def queue_depth(self) -> int:
+        return self._queue.qsize()
+
+    def set_upload_guard(self, guard: Callable[[str], AsyncContextManager[bool]]):
+        """设置上传守卫：guard(object_name) 为异步上下文管理器，上传在其中进行，返回False时跳过上传"""
+        self._upload_guard = guard
+
+    def object_url(self, object_name: str) -> str:
+        """对象的访问URL（上传前即可确定）"""
+        return storage.object_url(object_name)
+
+    async def submit(
+        self,
+        object_name: str,
+        data: bytes,
+        content_type: str = "audio/wav",
+        metadata: Optional[Dict[str, str]] = None,
+        codec: Optional[str] = None
+    ) -> str:
+        """提交上传任务并立即返回对象URL（codec不为空时上传前先做归档编码）"""
+        task = UploadTask(object_name, data, content_type, metadata or {}, codec)
+        try:
+            self._queue.put_nowait(task)
+            metrics.incr("storage_writer.submitted")
+        except asyncio.QueueFull:
+            metrics.incr("storage_writer.queue_full")
+            # 落盘涉及文件写入，放到线程中执行，不阻塞事件循环
+            await asyncio.to_thread(self._spool, task)
+        return self.object_url(object_name)
+
+    async def start(self):
+        if self._tasks:
+            return
+        os.makedirs(self.spool_dir, exist_ok=True)
+        self._tasks = [
+            asyncio.create_task(self._worker_loop(), name=f"storage-writer-{i}")
+            for i in range(self.concurrency)
+        ]
+        self._tasks.append(asyncio.create_task(self._reconcile_loop(), name="storage-reconcile"))
+        logger.info(f"Storage writer started with {self.concurrency} workers")
+
+    async def stop(self, drain_timeout: float = 10.0):
+        """停止写入器：尽量在时限内写完队列，剩余条目落盘"""
+        try:
+            await asyncio.wait_for(self._queue.join(), timeout=drain_timeout)
+        except asyncio.TimeoutError:
+            logger.warning(f"Storage writer drain timed out, spooling {self._queue.qsize()} pending uploads")
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        while not self._queue.empty():
+            task = self._queue.get_nowait()
+            if task.spool_id is None:
+                await asyncio.to_thread(self._spool, task)
+            self._queue.task_done()
+        logger.info("Storage writer stopped")
+
+    async def _worker_loop(self):
+        while True:
+            task = await self._queue.get()
+            try:
+                await self._upload_with_retry(task)
+            finally:
+                self._queue.task_done()
+
+    async def _encode(self, task: UploadTask):
+        """执行归档编码（CPU密集，放到线程中）"""
+        original_size = len(task.data)
+        with metrics.timer("storage_writer.encode"):
+            archived = await asyncio.to_thread(encode_archive, task.data, task.codec)
+        task.data = archived.data
+        task.content_type = archived.content_type
+        task.metadata = {**task.metadata, **archived.metadata}
+        task.codec = None
+        metrics.incr("storage_writer.bytes_in", original_size)
+        metrics.incr("storage_writer.bytes_out", len(archived.data))
+
+    async def _upload_with_retry(self, task: UploadTask):
+        if task.codec:
+            await self._encode(task)
+        for attempt in range(self.max_retries + 1):
+            try:
+                with metrics.timer("storage_writer.upload"):
+                    uploaded = await self._put(task)
+                metrics.incr("storage_writer.uploaded" if uploaded else "storage_writer.skipped_released")
+                if task.spool_id is not None:
+                    await asyncio.to_thread(self._remove_spool, task.spool_id)
+                return
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                metrics.incr("storage_writer.retry")
+                logger.warning(f"Upload of {task.object_name} failed (attempt {attempt + 1}): {e}")
+                if attempt < self.max_retries:
+                    await asyncio.sleep(min(2 ** attempt, 30))
+
+        metrics.incr("storage_writer.failed")
+        if task.spool_id is None:
+            await asyncio.to_thread(self._spool, task)
+        else:
+            self._pending_spool.discard(task.spool_id)
+
+    async def _put(self, task: UploadTask) -> bool:
+        """上传对象；守卫判定对象已被释放时跳过并返回False"""
+        if self._upload_guard is None:
+            await storage.put(task.object_name, task.data, task.content_type, task.metadata)
+            return True
+        async with self._upload_guard(task.object_name) as wanted:
+            if wanted:
+                await storage.put(task.object_name, task.data, task.content_type, task.metadata)
+            return wanted
+
+    def _spool(self, task: UploadTask):
+        """将上传任务写入暂存目录，等待对账重试"""
+        try:
+            os.makedirs(self.spool_dir, exist_ok=True)
+            spool_id = uuid.uuid4().hex
+            with open(os.path.join(self.spool_dir, f"{spool_id}.bin"), "wb") as f:
+                f.write(task.data)
+            # 元数据文件最后写入，存在即表示条目完整
+            with open(os.path.join(self.spool_dir, f"{spool_id}.json"), "w") as f:
+                json.dump({
+                    "object_name": task.object_name,
+                    "content_type": task.content_type,
+                    "metadata": task.metadata,
+                    "codec": task.codec,
+                }, f)
+            metrics.incr("storage_writer.spooled")
+        except Exception as e:
+            metrics.incr("storage_writer.lost")
+            logger.error(f"Failed to spool upload {task.object_name}, object will be missing: {e}")
+
+    def _remove_spool(self, spool_id: str):
+        self._pending_spool.discard(spool_id)
+        for suffix in (".json", ".bin"):
+            try:
+                os.unlink(os.path.join(self.spool_dir, spool_id + suffix))
+            except FileNotFoundError:
+                pass
+
+    async def _reconcile_loop(self):
+        while True:
+            await asyncio.sleep(self.reconcile_interval)
+            try:
+                await self.reconcile()
+            except Exception as e:
+                logger.error(f"Storage reconcile failed: {e}")
+
+    async def reconcile(self) -> int:
+        """把暂存目录中的条目重新放回上传队列，返回放回数量"""
+        free_slots = self._queue.maxsize - self._queue.qsize()
+        if free_slots <= 0:
+            return 0
+        entries = await asyncio.to_thread(self._load_spool_entries, free_slots)
+        requeued = 0
+        for task in entries:
+            try:
+                self._queue.put_nowait(task)
+            except asyncio.QueueFull:
+                break
+            self._pending_spool.add(task.spool_id)
+            requeued += 1
+        if requeued:
+            metrics.incr("storage_writer.reconciled", requeued)
+            logger.info(f"Requeued {requeued} spooled uploads")
+        return requeued
+
+    def _load_spool_entries(self, limit: int) -> List[UploadTask]:
+        """读取暂存目录中尚未在队列里的条目"""
+        if not os.path.isdir(self.spool_dir):
+            return []
+        entries = []
+        for name in sorted(os.listdir(self.spool_dir)):
+            if len(entries) >= limit:
+                break
+            if not name.endswith(".json"):
+                continue
+            spool_id = name[:-len(".json")]
+            if spool_id in self._pending_spool:
+                continue
+            try:
+                with open(os.path.join(self.spool_dir, name)) as f:
+                    meta = json.load(f)
+                with open(os.path.join(self.spool_dir, f"{spool_id}.bin"), "rb") as f:
+                    data = f.read()
+            except Exception as e:
+                logger.warning(f"Skipping unreadable spool entry {spool_id}: {e}")
+                continue
+            entries.append(UploadTask(
+                object_name=meta["object_name"],
+                data=data,
+                content_type=meta.get("content_type", "audio/wav"),
+                metadata=meta.get("metadata") or {},
+                codec=meta.get("codec"),
+                spool_id=spool_id
+            ))
+        return entries
+
+
+# 全局存储写入器
+storage_writer = StorageWriter(
+    max_queue=settings.STORAGE_WRITER_MAX_QUEUE,
+    concurrency=settings.STORAGE_WRITER_CONCURRENCY,
+    max_retries=settings.STORAGE_WRITER_MAX_RETRIES,
+    spool_dir=settings.STORAGE_SPOOL_DIR,
+    reconcile_interval=settings.STORAGE_RECONCILE_INTERVAL
+)
+
+metrics.register_gauge("storage_writer.queue_depth", lambda: storage_writer.queue_depth)
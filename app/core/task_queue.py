@@ -0,0 +1,320 @@
+"""
+持久化本地任务队列
+响应返回后的收尾工作（保存发言记录、刷新员工声纹状态等）原先使用进程内 BackgroundTasks，
+工作进程重启即丢失，也没有并发控制。这里改为写入本地SQLite（WAL模式，同机多个工作进程共享）：
+- 工作协程按类型领取任务，同类型任务可批量交给处理函数
+- 领取带租约，进程崩溃后租约过期的任务会被重新领取
+- 失败按指数退避重试，超过最大次数标记为failed
+- 幂等键：相同键的任务只会入队一次（保留期内）
+- 导出队列深度和最老待处理任务的等待时间
+sqlite3 是同步接口，所有数据库操作都在单独的线程中执行，不阻塞事件循环。
+"""
+
+import asyncio
+import json
+import os
+import sqlite3
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Awaitable, Callable, Dict, List, Optional
+
+from loguru import logger
+
+from app.core.config import settings
+from app.core.metrics import metrics
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS tasks (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    task_type TEXT NOT NULL,
+    payload TEXT NOT NULL,
+    idempotency_key TEXT UNIQUE,
+    status TEXT NOT NULL DEFAULT 'pending',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    run_at REAL NOT NULL,
+    lease_until REAL,
+    last_error TEXT,
+    created_at REAL NOT NULL,
+    finished_at REAL
+);
+CREATE INDEX IF NOT EXISTS idx_tasks_ready ON tasks (status, run_at);
+CREATE INDEX IF NOT EXISTS idx_tasks_type ON tasks (task_type, status);
+"""
+
+
+@dataclass
+class TaskHandler:
+    """任务处理函数：batch=True 时一次接收同类型的多个payload"""
+    func: Callable[..., Awaitable[None]]
+    batch: bool = False
+
+
+@dataclass
+class Task:
+    id: int
+    task_type: str
+    payload: Dict
+    attempts: int
+
+
+class TaskQueue:
+    """基于SQLite的持久化任务队列"""
+
+    def __init__(
+        self,
+        path: str,
+        workers: int,
+        batch_size: int,
+        poll_interval: float,
+        max_attempts: int,
+        lease_seconds: int,
+        retention_seconds: int
+    ):
+        self.path = path
+        self.workers = max(1, workers)
+        self.batch_size = max(1, batch_size)
+        self.poll_interval = poll_interval
+        self.max_attempts = max_attempts
+        self.lease_seconds = lease_seconds
+        self.retention_seconds = retention_seconds
+        self._handlers: Dict[str, TaskHandler] = {}
+        # 单线程执行所有SQLite操作，连接只在该线程中使用
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="task-queue")
+        self._conn: Optional[sqlite3.Connection] = None
+        self._tasks: List[asyncio.Task] = []
+        self._wakeup: Optional[asyncio.Event] = None
+        self._depth = 0
+        self._lag = 0.0
+        metrics.register_gauge("task_queue.depth", lambda: self._depth)
+        metrics.register_gauge("task_queue.lag_seconds", lambda: self._lag)
+
+    def register(self, task_type: str, func: Callable[..., Awaitable[None]], batch: bool = False):
+        """注册任务处理函数"""
+        self._handlers[task_type] = TaskHandler(func, batch)
+
+    async def _call(self, func, *args):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, func, *args)
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.executescript(SCHEMA)
+            self._conn = conn
+        return self._conn
+
+    async def enqueue(
+        self,
+        task_type: str,
+        payload: Dict,
+        idempotency_key: Optional[str] = None,
+        delay: float = 0
+    ) -> bool:
+        """任务入队；幂等键已存在时不重复入队，返回是否新入队"""
+        if task_type not in self._handlers:
+            raise ValueError(f"Unknown task type: {task_type}")
+        inserted = await self._call(self._insert, task_type, json.dumps(payload, default=str), idempotency_key, delay)
+        if inserted:
+            metrics.incr(f"task_queue.{task_type}.enqueued")
+            if self._wakeup:
+                self._wakeup.set()
+        else:
+            metrics.incr(f"task_queue.{task_type}.duplicate")
+        return inserted
+
+    def _insert(self, task_type: str, payload: str, idempotency_key: Optional[str], delay: float) -> bool:
+        now = time.time()
+        cursor = self._connect().execute(
+            "INSERT OR IGNORE INTO tasks (task_type, payload, idempotency_key, run_at, created_at) "
+            "VALUES (?, ?, ?, ?, ?)",
+            (task_type, payload, idempotency_key, now + delay, now)
+        )
+        return cursor.rowcount > 0
+
+    async def start(self):
+        if self._tasks:
+            return
+        await self._call(self._connect)
+        self._wakeup = asyncio.Event()
+        self._tasks = [
+            asyncio.create_task(self._worker_loop(i), name=f"task-queue-{i}")
+            for i in range(self.workers)
+        ]
+        self._tasks.append(asyncio.create_task(self._maintenance_loop(), name="task-queue-maintenance"))
+        logger.info(f"Task queue started with {self.workers} workers ({self.path})")
+
+    async def stop(self):
+        """停止工作协程；正在执行的任务租约到期后会被重新领取"""
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        if self._conn is not None:
+            await self._call(self._conn.close)
+            self._conn = None
+        logger.info("Task queue stopped")
+
+    async def _worker_loop(self, index: int):
+        while True:
+            try:
+                tasks = await self._call(self._claim)
+                if not tasks:
+                    self._wakeup.clear()
+                    try:
+                        await asyncio.wait_for(self._wakeup.wait(), timeout=self.poll_interval)
+                    except asyncio.TimeoutError:
+                        pass
+                    continue
+                await self._run(tasks)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Task queue worker {index} error: {e}")
+                await asyncio.sleep(self.poll_interval)
+
+    def _claim(self) -> List[Task]:
+        """领取最早就绪任务所属类型的一批任务"""
+        conn = self._connect()
+        now = time.time()
+        ready = "(status = 'pending' AND run_at <= ?) OR (status = 'running' AND lease_until < ?)"
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute(
+                f"SELECT task_type FROM tasks WHERE {ready} ORDER BY run_at LIMIT 1", (now, now)
+            ).fetchone()
+            if row is None:
+                conn.execute("COMMIT")
+                return []
+            task_type = row[0]
+            handler = self._handlers.get(task_type)
+            limit = self.batch_size if handler and handler.batch else 1
+            rows = conn.execute(
+                f"SELECT id, payload, attempts FROM tasks WHERE task_type = ? AND ({ready}) ORDER BY run_at LIMIT ?",
+                (task_type, now, now, limit)
+            ).fetchall()
+            conn.executemany(
+                "UPDATE tasks SET status = 'running', attempts = attempts + 1, lease_until = ? WHERE id = ?",
+                [(now + self.lease_seconds, task_id) for task_id, _, _ in rows]
+            )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return [Task(task_id, task_type, json.loads(payload), attempts + 1) for task_id, payload, attempts in rows]
+
+    async def _run(self, tasks: List[Task]):
+        task_type = tasks[0].task_type
+        handler = self._handlers.get(task_type)
+        if handler is None:
+            # 任务由其他版本的进程写入，本进程无法处理，等待租约过期
+            logger.warning(f"No handler registered for task type {task_type}")
+            return
+        try:
+            with metrics.timer(f"task_queue.{task_type}.run"):
+                if handler.batch:
+                    await handler.func([task.payload for task in tasks])
+                else:
+                    await handler.func(tasks[0].payload)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            if handler.batch and len(tasks) > 1:
+                # 批量调用失败时逐个重试，只有真正失败的任务进入重试/失败流程
+                logger.warning(f"Batch {task_type} failed ({len(tasks)} tasks), retrying one by one: {e}")
+                await self._run_individually(handler, tasks)
+            else:
+                logger.warning(f"Task {task_type} failed: {e}")
+                await self._call(self._fail, tasks, str(e))
+            return
+        await self._call(self._complete, [task.id for task in tasks])
+        metrics.incr(f"task_queue.{task_type}.done", len(tasks))
+
+    async def _run_individually(self, handler: TaskHandler, tasks: List[Task]):
+        task_type = tasks[0].task_type
+        done: List[int] = []
+        for task in tasks:
+            try:
+                await handler.func([task.payload])
+                done.append(task.id)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"Task {task_type} #{task.id} failed: {e}")
+                await self._call(self._fail, [task], str(e))
+        if done:
+            await self._call(self._complete, done)
+            metrics.incr(f"task_queue.{task_type}.done", len(done))
+
+    def _complete(self, task_ids: List[int]):
+        now = time.time()
+        self._connect().executemany(
+            "UPDATE tasks SET status = 'done', finished_at = ?, lease_until = NULL WHERE id = ?",
+            [(now, task_id) for task_id in task_ids]
+        )
+
+    def _fail(self, tasks: List[Task], error: str):
+        now = time.time()
+        retry, failed = [], []
+        for task in tasks:
+            if task.attempts < self.max_attempts:
+                retry.append((now + min(2 ** task.attempts, 300), error, task.id))
+            else:
+                failed.append((now, error, task.id))
+        conn = self._connect()
+        conn.executemany(
+            "UPDATE tasks SET status = 'pending', run_at = ?, last_error = ?, lease_until = NULL WHERE id = ?",
+            retry
+        )
+        conn.executemany(
+            "UPDATE tasks SET status = 'failed', finished_at = ?, last_error = ?, lease_until = NULL WHERE id = ?",
+            failed
+        )
+        task_type = tasks[0].task_type
+        if retry:
+            metrics.incr(f"task_queue.{task_type}.retry", len(retry))
+        if failed:
+            metrics.incr(f"task_queue.{task_type}.failed", len(failed))
+            logger.error(f"{len(failed)} {task_type} tasks failed permanently: {error}")
+
+    async def _maintenance_loop(self):
+        """刷新深度/延迟指标，清理超过保留期的已完成任务"""
+        while True:
+            try:
+                self._depth, self._lag = await self._call(self._stats)
+                await self._call(self._purge)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"Task queue maintenance failed: {e}")
+            await asyncio.sleep(max(self.poll_interval, 5.0))
+
+    def _stats(self):
+        now = time.time()
+        depth, oldest = self._connect().execute(
+            "SELECT COUNT(*), MIN(run_at) FROM tasks WHERE status IN ('pending', 'running')"
+        ).fetchone()
+        return depth, max(0.0, now - oldest) if oldest else 0.0
+
+    def _purge(self):
+        self._connect().execute(
+            "DELETE FROM tasks WHERE status IN ('done', 'failed') AND finished_at < ?",
+            (time.time() - self.retention_seconds,)
+        )
+
+
+# 全局任务队列
+task_queue = TaskQueue(
+    path=settings.TASK_QUEUE_PATH,
+    workers=settings.TASK_QUEUE_WORKERS,
+    batch_size=settings.TASK_QUEUE_BATCH_SIZE,
+    poll_interval=settings.TASK_QUEUE_POLL_INTERVAL,
+    max_attempts=settings.TASK_QUEUE_MAX_ATTEMPTS,
+    lease_seconds=settings.TASK_QUEUE_LEASE_SECONDS,
+    retention_seconds=settings.TASK_QUEUE_RETENTION_HOURS * 3600
+)
@@ -10,11 +10,21 @@ import os
 
 from app.core.config import settings
 from app.models.database import engine, Base
-from app.core.minio_client import minio_client
-from app.routers import emotion, auth, employee, voiceprint, meeting, speech, upload, system
+from app.core.storage import storage
+from app.routers import emotion, auth, employee, voiceprint, meeting, speech, upload, system, job
 from app.core.exceptions import VoiceprintException
+from app.core.concurrency import inference_limiter
+from app.core.ingest import UploadLimitMiddleware
 from app.services.voiceprint_service import VoiceprintService
 from app.services.emotion_service import EmotionService
+from app.services.job_service import job_worker_pool
+from app.core.storage_writer import storage_writer
+from app.core.log_writer import log_writer
+from app.core.task_queue import task_queue
+from app.services.emotion_rollup_service import emotion_rollup_service
+from app.services.voiceprint_counter_service import voiceprint_counter_service
+from app.services.voiceprint_gallery_service import voiceprint_gallery_service
+from app.services.audio_retention_service import audio_retention_service
 
 
 @asynccontextmanager
@@ -32,15 +42,11 @@ async def lifespan(app: FastAPI):
         logger.error(f"Failed to create database tables: {e}")
         raise
     
-    # 初始化MinIO桶
+    # 初始化对象存储（MinIO建桶/本地建目录）
     try:
-        if not minio_client.bucket_exists(settings.MINIO_BUCKET):
-            minio_client.make_bucket(settings.MINIO_BUCKET)
-            logger.info(f"MinIO bucket '{settings.MINIO_BUCKET}' created")
-        else:
-            logger.info(f"MinIO bucket '{settings.MINIO_BUCKET}' already exists")
+        await storage.initialize()
     except Exception as e:
-        logger.error(f"Failed to initialize MinIO: {e}")
+        logger.error(f"Failed to initialize {storage.name} storage: {e}")
         raise
     
     # 设置Hugging Face镜像（如果在中国大陆）
@@ -77,10 +83,30 @@ async def lifespan(app: FastAPI):
     for directory in [settings.UPLOAD_DIR, settings.TEMP_DIR, "logs"]:
         os.makedirs(directory, exist_ok=True)
     
+    # 加载内存声纹库（优先使用快照），启动后台存储写入、日志批量写入、持久化任务队列、批量任务工作池、
+    # 情绪汇总、声纹计数校正和过期音频清理
+    await voiceprint_gallery_service.start()
+    await storage_writer.start()
+    await log_writer.start()
+    await task_queue.start()
+    await job_worker_pool.start()
+    await emotion_rollup_service.start()
+    await voiceprint_counter_service.start()
+    await audio_retention_service.start()
+    
     yield
     
     # 关闭时执行
     logger.info("Shutting down Voice Recognition System...")
+    await audio_retention_service.stop()
+    await voiceprint_counter_service.stop()
+    await emotion_rollup_service.stop()
+    await job_worker_pool.stop()
+    await task_queue.stop()
+    await log_writer.stop()
+    await storage_writer.stop()
+    await voiceprint_gallery_service.stop()
+    storage.shutdown()
 
 
 # 创建FastAPI应用
@@ -109,11 +135,23 @@ if not settings.DEBUG:
         allowed_hosts=["*"]  # 生产环境应该设置具体主机
     )
 
+# 请求体大小限制中间件（在解析multipart之前拒绝超大上传）
+app.add_middleware(
+    UploadLimitMiddleware,
+    default_limit=settings.MAX_FILE_SIZE + 1024 * 1024,  # 预留表单字段开销
+    overrides={
+        "/api/emotion/detect/batch": settings.BATCH_MAX_REQUEST_SIZE,
+        "/api/job": settings.BATCH_MAX_REQUEST_SIZE,
+    }
+)
+
 
 # 请求处理时间中间件
 @app.middleware("http")
 async def add_process_time_header(request: Request, call_next):
     start_time = time.time()
+    # 请求到达时间，请求截止时间从这里开始计算
+    request.state.received_at = time.monotonic()
     response = await call_next(request)
     process_time = time.time() - start_time
     response.headers["X-Process-Time"] = str(process_time)
@@ -139,7 +177,8 @@ async def voiceprint_exception_handler(request: Request, exc: VoiceprintExceptio
             "message": exc.message,
             "error_code": exc.error_code,
             "details": exc.details
-        }
+        },
+        headers=exc.headers
     )
 
 
@@ -177,13 +216,13 @@ async def health_check():
         async with engine.begin() as conn:
             await conn.execute("SELECT 1")
         
-        # 检查MinIO连接
-        minio_client.list_buckets()
+        # 检查对象存储连接
+        await storage.ping()
         
         # 仅在需要时检查模型状态
         services = {
             "database": "healthy",
-            "minio": "healthy"
+            storage.name: "healthy"
         }
         
         if os.getenv("CHECK_MODELS_IN_HEALTH", "true").lower() == "true":
@@ -223,6 +262,16 @@ async def health_check():
         )
 
 
+# 推理队列状态（供自动扩缩容采集）
+@app.get("/health/inference", tags=["Health"])
+async def inference_queue_status():
+    """推理队列深度与并发状态"""
+    return {
+        "timestamp": time.time(),
+        **inference_limiter.status()
+    }
+
+
 # 根路径
 @app.get("/", tags=["Root"])
 async def root():
@@ -341,6 +390,8 @@ async def test_emotion_detection(audio_file: UploadFile = File(...)):
             }
         }
         
+    except VoiceprintException:
+        raise
     except Exception as e:
         logger.error(f"Test emotion detection failed: {e}")
         return JSONResponse(
@@ -482,6 +533,8 @@ async def simple_emotion_detection(audio_file: UploadFile = File(...)):
             }
         }
         
+    except VoiceprintException:
+        raise
     except Exception as e:
         logger.error(f"Simple emotion detection failed: {e}")
         return {
@@ -500,6 +553,7 @@ app.include_router(speech.router, prefix="/api/speech", tags=["语音识别"])
 app.include_router(upload.router, prefix="/api/upload", tags=["文件上传"])
 app.include_router(emotion.router, prefix="/api/emotion", tags=["情绪识别"])
 app.include_router(system.router, prefix="/api/system", tags=["系统管理"])
+app.include_router(job.router, prefix="/api/job", tags=["批量任务"])
 
 
 if __name__ == "__main__":
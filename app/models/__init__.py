@@ -3,10 +3,12 @@ from .database import Base, get_db, engine, AsyncSessionLocal
 from .user import UserModel
 from .employee import EmployeeModel
 from .voiceprint import VoiceprintModel, RecognitionLogModel
-from .meeting import MeetingModel
+from .meeting import MeetingModel, MeetingRecordingModel, SpeechRecordModel
+from .job import InferenceJobModel, InferenceJobItemModel
+from .audio_object import AudioObjectModel
 from .emotion import (
-    EmotionDetectionModel, EmotionFeedbackModel, EmotionSummaryModel,
-    EmotionAlertModel, EmotionInsightModel, EmotionComparisonModel
+    EmotionDetectionModel, EmotionFeedbackModel, EmotionSummaryModel, RollupWatermarkModel,
+    EmotionDailyEmployeeModel, EmotionAlertModel, EmotionInsightModel, EmotionComparisonModel
 )
 
 __all__ = [
@@ -19,9 +21,16 @@ __all__ = [
     "VoiceprintModel",
     "RecognitionLogModel",
     "MeetingModel",
+    "MeetingRecordingModel",
+    "SpeechRecordModel",
+    "InferenceJobModel",
+    "InferenceJobItemModel",
+    "AudioObjectModel",
     "EmotionDetectionModel",
     "EmotionFeedbackModel",
     "EmotionSummaryModel",
+    "RollupWatermarkModel",
+    "EmotionDailyEmployeeModel",
     "EmotionAlertModel",
     "EmotionInsightModel",
     "EmotionComparisonModel"
@@ -0,0 +1,18 @@
+from sqlalchemy import Column, Integer, String, DateTime, BigInteger
+from sqlalchemy.sql import func
+from app.models.database import Base
+
+
+class AudioObjectModel(Base):
+    """音频对象引用计数模型（对象名由内容哈希生成，相同音频只存一份）"""
+    __tablename__ = "audio_objects"
+
+    object_key = Column(String(255), primary_key=True, comment="对象存储键")
+    content_hash = Column(String(64), nullable=False, index=True, comment="原始音频SHA-256")
+    codec = Column(String(10), nullable=False, comment="归档编码")
+    original_size = Column(BigInteger, nullable=False, comment="原始音频大小（字节）")
+    ref_count = Column(Integer, nullable=False, default=1, comment="引用计数")
+
+    # 时间戳
+    created_at = Column(DateTime(timezone=True), server_default=func.now(), comment="创建时间")
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now(), comment="更新时间")
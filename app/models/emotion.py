@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Float, Boolean, DateTime, Text, JSON, ForeignKey
+from sqlalchemy import Column, Integer, String, Float, Boolean, DateTime, Text, JSON, ForeignKey, UniqueConstraint, Index
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from app.models.database import Base
@@ -7,6 +7,10 @@ from app.models.database import Base
 class EmotionDetectionModel(Base):
     """情绪检测记录模型"""
     __tablename__ = "emotion_detections"
+    __table_args__ = (
+        # 员工情绪历史按 (created_at, id) 游标分页
+        Index("idx_detection_employee_created", "employee_id", "created_at", "id"),
+    )
     
     id = Column(Integer, primary_key=True, index=True, autoincrement=True)
     detection_id = Column(String(64), unique=True, index=True, comment="检测唯一ID")
@@ -78,8 +82,11 @@ class EmotionFeedbackModel(Base):
 
 
 class EmotionSummaryModel(Base):
-    """情绪汇总模型"""
+    """情绪汇总模型（由汇总引擎按检测记录增量维护）"""
     __tablename__ = "emotion_summaries"
+    __table_args__ = (
+        UniqueConstraint("summary_type", "summary_date", name="uk_summary_type_date"),
+    )
     
     id = Column(Integer, primary_key=True, index=True, autoincrement=True)
     
@@ -109,6 +116,23 @@ class EmotionSummaryModel(Base):
     updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now(), comment="更新时间")
 
 
+class RollupWatermarkModel(Base):
+    """增量汇总高水位（已汇总的最大源记录ID）"""
+    __tablename__ = "rollup_watermarks"
+    
+    name = Column(String(50), primary_key=True, comment="汇总名称")
+    last_id = Column(Integer, nullable=False, default=0, comment="已汇总的最大记录ID")
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now(), comment="更新时间")
+
+
+class EmotionDailyEmployeeModel(Base):
+    """每日有检测记录的员工（随汇总水位维护，用于周期去重员工数）"""
+    __tablename__ = "emotion_daily_employees"
+    
+    summary_date = Column(String(10), primary_key=True, comment="日期(YYYY-MM-DD)")
+    employee_id = Column(Integer, primary_key=True, comment="员工ID")
+
+
 class EmotionAlertModel(Base):
     """情绪预警模型"""
     __tablename__ = "emotion_alerts"
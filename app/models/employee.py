@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Boolean, DateTime, Text, func
+from sqlalchemy import Column, Integer, String, Boolean, DateTime, Text, Index, func
 from sqlalchemy.orm import relationship
 from app.models.database import Base
 
@@ -6,6 +6,10 @@ from app.models.database import Base
 class EmployeeModel(Base):
     """员工模型"""
     __tablename__ = "employees"
+    __table_args__ = (
+        # 员工列表按 (created_at, employee_id) 游标分页
+        Index("idx_employee_created", "created_at"),
+    )
     
     employee_id = Column(Integer, primary_key=True, index=True, autoincrement=True)
     employee_code = Column(String(50), unique=True, index=True, nullable=False, comment="员工编号")
@@ -0,0 +1,66 @@
+from sqlalchemy import Column, Integer, String, DateTime, Text, ForeignKey, JSON, Index
+from sqlalchemy.orm import relationship
+from sqlalchemy.sql import func
+from app.models.database import Base
+
+
+class InferenceJobModel(Base):
+    """批量推理任务模型"""
+    __tablename__ = "inference_jobs"
+
+    job_id = Column(String(64), primary_key=True, index=True, comment="任务唯一ID")
+    job_type = Column(String(20), nullable=False, comment="任务类型(emotion/recognition)")
+    status = Column(String(20), nullable=False, default="pending", index=True, comment="任务状态(pending/running/completed/failed)")
+
+    # 关联信息
+    employee_id = Column(Integer, ForeignKey("employees.employee_id"), nullable=True, comment="员工ID")
+    meeting_id = Column(Integer, ForeignKey("meetings.meeting_id"), nullable=True, comment="会议ID")
+    created_by = Column(Integer, nullable=False, comment="提交用户ID")
+
+    # 进度信息
+    total_items = Column(Integer, nullable=False, default=0, comment="音频片段总数")
+    completed_items = Column(Integer, nullable=False, default=0, comment="已完成数量")
+    failed_items = Column(Integer, nullable=False, default=0, comment="失败数量")
+    error_message = Column(Text, nullable=True, comment="错误信息")
+
+    # 时间戳
+    created_at = Column(DateTime(timezone=True), server_default=func.now(), comment="创建时间")
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now(), comment="更新时间")
+    started_at = Column(DateTime(timezone=True), nullable=True, comment="开始处理时间")
+    finished_at = Column(DateTime(timezone=True), nullable=True, comment="完成时间")
+
+    # 关系
+    items = relationship("InferenceJobItemModel", back_populates="job", cascade="all, delete-orphan")
+
+
+class InferenceJobItemModel(Base):
+    """批量推理任务条目模型（持久化工作队列）"""
+    __tablename__ = "inference_job_items"
+    __table_args__ = (
+        Index("idx_job_items_status", "status", "id"),
+        Index("idx_job_items_job", "job_id", "item_index"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True, autoincrement=True)
+    job_id = Column(String(64), ForeignKey("inference_jobs.job_id"), nullable=False, comment="任务ID")
+    item_index = Column(Integer, nullable=False, comment="条目序号")
+
+    # 音频信息
+    object_key = Column(Text, nullable=False, comment="音频对象存储键")
+    filename = Column(String(255), nullable=True, comment="原始文件名")
+
+    # 处理状态
+    status = Column(String(20), nullable=False, default="pending", comment="条目状态(pending/running/done/failed)")
+    attempts = Column(Integer, nullable=False, default=0, comment="处理次数")
+    claimed_at = Column(DateTime(timezone=True), nullable=True, comment="领取时间")
+
+    # 处理结果
+    result = Column(JSON, nullable=True, comment="识别结果")
+    error_message = Column(Text, nullable=True, comment="错误信息")
+
+    # 时间戳
+    created_at = Column(DateTime(timezone=True), server_default=func.now(), comment="创建时间")
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now(), comment="更新时间")
+
+    # 关系
+    job = relationship("InferenceJobModel", back_populates="items")
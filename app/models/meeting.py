@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Boolean, DateTime, Text, ForeignKey, JSON
+from sqlalchemy import Column, Integer, BigInteger, String, Boolean, DateTime, Text, Float, ForeignKey, JSON
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from app.models.database import Base
@@ -47,4 +47,52 @@ class MeetingModel(Base):
     
     # 关系
     organizer = relationship("EmployeeModel", back_populates="organized_meetings")
-    emotion_detections = relationship("EmotionDetectionModel", back_populates="meeting", cascade="all, delete-orphan")
\ No newline at end of file
+    emotion_detections = relationship("EmotionDetectionModel", back_populates="meeting", cascade="all, delete-orphan")
+
+
+class MeetingRecordingModel(Base):
+    """会议录音模型（客户端通过预签名URL直传对象存储）"""
+    __tablename__ = "meeting_recordings"
+    
+    recording_id = Column(String(64), primary_key=True, index=True, comment="录音唯一ID")
+    meeting_id = Column(Integer, ForeignKey("meetings.meeting_id"), nullable=False, index=True, comment="会议ID")
+    
+    # 对象信息
+    object_key = Column(Text, nullable=False, comment="录音对象存储键")
+    filename = Column(String(255), nullable=True, comment="原始文件名")
+    content_type = Column(String(100), nullable=True, comment="文件类型")
+    file_size = Column(BigInteger, nullable=False, comment="文件大小（字节）")
+    upload_id = Column(String(255), nullable=True, comment="分片上传ID")
+    part_size = Column(BigInteger, nullable=True, comment="分片大小（字节）")
+    
+    # 处理状态
+    status = Column(String(20), nullable=False, default="uploading", comment="状态(uploading/uploaded/processing/processed/failed)")
+    job_id = Column(String(64), nullable=True, comment="处理任务ID")
+    duration = Column(Float, nullable=True, comment="录音时长（秒）")
+    error_message = Column(Text, nullable=True, comment="错误信息")
+    created_by = Column(Integer, nullable=False, comment="上传用户ID")
+    
+    # 时间戳
+    created_at = Column(DateTime(timezone=True), server_default=func.now(), comment="创建时间")
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now(), comment="更新时间")
+    uploaded_at = Column(DateTime(timezone=True), nullable=True, comment="上传完成时间")
+
+
+class SpeechRecordModel(Base):
+    """会议发言记录模型（声纹识别到发言人后写入）"""
+    __tablename__ = "speech_records"
+    
+    id = Column(Integer, primary_key=True, index=True, autoincrement=True)
+    meeting_id = Column(Integer, ForeignKey("meetings.meeting_id"), nullable=False, index=True, comment="会议ID")
+    employee_id = Column(Integer, ForeignKey("employees.employee_id"), nullable=True, index=True, comment="发言员工ID")
+    
+    # 发言信息
+    audio_url = Column(Text, nullable=True, comment="发言音频URL")
+    confidence_score = Column(Float, nullable=True, comment="声纹识别置信度")
+    start_time = Column(DateTime(timezone=True), nullable=True, comment="开始时间")
+    end_time = Column(DateTime(timezone=True), nullable=True, comment="结束时间")
+    duration = Column(Float, nullable=True, comment="时长（秒）")
+    is_identified = Column(Boolean, default=True, nullable=False, comment="是否识别出发言人")
+    
+    # 时间戳
+    created_at = Column(DateTime(timezone=True), server_default=func.now(), comment="创建时间")
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Boolean, DateTime, Text, ForeignKey, JSON, Float
+from sqlalchemy import Column, Integer, String, Boolean, DateTime, Text, ForeignKey, JSON, Float, Index
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from app.models.database import Base
@@ -7,6 +7,13 @@ from app.models.database import Base
 class VoiceprintModel(Base):
     """声纹模型"""
     __tablename__ = "voiceprints"
+    __table_args__ = (
+        # 声纹列表按 (created_at, voiceprint_id) 游标分页
+        Index("idx_voiceprint_employee_created", "employee_id", "is_active", "created_at"),
+        Index("idx_voiceprint_active_created", "is_active", "created_at"),
+        # 声纹库跨进程同步按 updated_at 拉取变更
+        Index("idx_voiceprint_updated", "updated_at"),
+    )
     
     voiceprint_id = Column(String(64), primary_key=True, index=True, comment="声纹唯一ID")
     
@@ -6,7 +6,9 @@ from datetime import timedelta
 from app.models.database import get_db
 from app.models.user import UserModel
 from app.schemas.user import UserCreate, UserLogin, UserLoginResponse, UserResponse
-from app.core.security import create_access_token, verify_password, get_password_hash, get_current_user
+from app.core.security import (
+    create_access_token, verify_password_async, get_password_hash_async, get_current_user, login_limiter
+)
 from app.core.config import settings
 
 router = APIRouter()
@@ -41,7 +43,7 @@ async def register(
             )
     
     # 创建新用户
-    hashed_password = get_password_hash(user_data.password)
+    hashed_password = await get_password_hash_async(user_data.password)
     db_user = UserModel(
         username=user_data.username,
         email=user_data.email,
@@ -71,7 +73,11 @@ async def login(
     result = await db.execute(stmt)
     user = result.scalar_one_or_none()
     
-    if not user or not verify_password(user_data.password, user.hashed_password):
+    # 密码验证受登录并发限制，超出排队上限返回429，排队超时返回503
+    async with login_limiter.slot():
+        password_valid = bool(user) and await verify_password_async(user_data.password, user.hashed_password)
+    
+    if not password_valid:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="用户名或密码错误"
@@ -1,13 +1,14 @@
-from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Form, BackgroundTasks
+from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Form, Request
 from fastapi.responses import JSONResponse
 from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List, Optional
 import asyncio
 import uuid
 import time
+from datetime import date, datetime, timedelta
 from loguru import logger
 
-from app.models.database import get_db
+from app.models.database import get_db, AsyncSessionLocal
 from app.services.emotion_service import emotion_service
 from app.schemas.emotion import (
     EmotionDetectionRequest, EmotionDetectionResponse, 
@@ -17,7 +18,16 @@ from app.schemas.emotion import (
     EmotionStatistics
 )
 from app.models.emotion import EmotionDetectionModel, EmotionFeedbackModel
+from app.core.config import settings
 from app.core.security import get_current_user
+from app.core.exceptions import VoiceprintException, RequestAbortedError
+from app.core.deadline import Deadline
+from app.core.ingest import read_audio_upload
+from app.core.concurrency import PRIORITY_BULK
+from app.core.log_writer import log_writer
+from app.utils.histogram import PROCESSING_TIME_BUCKETS, cumulative_bucket_columns, approx_percentile
+from app.services.emotion_rollup_service import emotion_rollup_service, SUMMARY_TYPES
+from app.utils.pagination import InvalidCursorError, cached_count, clamp_limit, keyset_page, split_page
 from app.models.user import UserModel
 
 router = APIRouter()
@@ -25,7 +35,7 @@ router = APIRouter()
 
 @router.post("/detect", response_model=EmotionDetectionResponse)
 async def detect_emotion(
-    background_tasks: BackgroundTasks,
+    request: Request,
     audio_file: UploadFile = File(...),
     employee_id: Optional[int] = Form(None),
     meeting_id: Optional[int] = Form(None),
@@ -42,15 +52,8 @@ async def detect_emotion(
         if not audio_file.content_type.startswith('audio/'):
             raise HTTPException(status_code=400, detail="请上传音频文件")
         
-        # 读取音频数据
-        audio_data = await audio_file.read()
-        
-        if len(audio_data) == 0:
-            raise HTTPException(status_code=400, detail="音频文件为空")
-        
-        # 检查文件大小（最大50MB）
-        if len(audio_data) > 50 * 1024 * 1024:
-            raise HTTPException(status_code=400, detail="音频文件过大，请上传小于50MB的文件")
+        # 分块读取音频数据（空文件、超出大小或时长限制时尽早拒绝）
+        audio_data = await read_audio_upload(audio_file)
         
         # 生成检测ID
         detection_id = str(uuid.uuid4())
@@ -59,7 +62,9 @@ async def detect_emotion(
         # 进行情绪检测
         emotion_result = await emotion_service.detect_emotion(
             audio_data=audio_data,
-            employee_id=employee_id
+            employee_id=employee_id,
+            deadline=Deadline.from_request(request),
+            meeting_id=meeting_id
         )
         
         # 更新处理时间
@@ -74,9 +79,8 @@ async def detect_emotion(
             error_code=None
         )
         
-        # 后台任务：保存检测结果到数据库
-        background_tasks.add_task(
-            save_emotion_detection,
+        # 检测结果交给批量日志写入器保存
+        save_emotion_detection(
             detection_id=detection_id,
             employee_id=employee_id,
             meeting_id=meeting_id,
@@ -86,7 +90,7 @@ async def detect_emotion(
         
         return response
         
-    except HTTPException:
+    except (HTTPException, VoiceprintException):
         raise
     except Exception as e:
         logger.error(f"Emotion detection failed: {e}")
@@ -95,7 +99,7 @@ async def detect_emotion(
 
 @router.post("/detect/batch", response_model=EmotionBatchResponse)
 async def batch_detect_emotion(
-    background_tasks: BackgroundTasks,
+    request: Request,
     audio_files: List[UploadFile] = File(...),
     employee_id: Optional[int] = Form(None),
     meeting_id: Optional[int] = Form(None),
@@ -119,25 +123,22 @@ async def batch_detect_emotion(
         
         start_time = time.time()
         results = []
+        deadline = Deadline.from_request(
+            request,
+            timeout=settings.REQUEST_DEADLINE_SECONDS * len(audio_files)
+        )
         
         # 处理每个音频文件
         for i, audio_file in enumerate(audio_files):
             try:
-                audio_data = await audio_file.read()
-                
-                if len(audio_data) == 0:
-                    results.append(EmotionDetectionResponse(
-                        success=False,
-                        emotion_feature=None,
-                        message=f"文件 {audio_file.filename} 为空",
-                        error_code="EMPTY_FILE"
-                    ))
-                    continue
+                audio_data = await read_audio_upload(audio_file)
                 
                 # 进行情绪检测
                 emotion_result = await emotion_service.detect_emotion(
                     audio_data=audio_data,
-                    employee_id=employee_id
+                    employee_id=employee_id,
+                    deadline=deadline,
+                    priority=PRIORITY_BULK
                 )
                 
                 results.append(EmotionDetectionResponse(
@@ -147,13 +148,15 @@ async def batch_detect_emotion(
                     error_code=None
                 ))
                 
+            except RequestAbortedError:
+                raise
             except Exception as e:
                 logger.error(f"Failed to process audio {audio_file.filename}: {e}")
                 results.append(EmotionDetectionResponse(
                     success=False,
                     emotion_feature=None,
                     message=f"文件 {audio_file.filename} 处理失败: {str(e)}",
-                    error_code="PROCESSING_ERROR"
+                    error_code=e.error_code if isinstance(e, VoiceprintException) else "PROCESSING_ERROR"
                 ))
         
         # 计算统计信息
@@ -168,9 +171,8 @@ async def batch_detect_emotion(
             processing_time=total_time
         )
         
-        # 后台任务：保存批量检测结果
-        background_tasks.add_task(
-            save_batch_emotion_detections,
+        # 批量检测结果交给批量日志写入器保存
+        save_batch_emotion_detections(
             results=results,
             employee_id=employee_id,
             meeting_id=meeting_id,
@@ -179,7 +181,7 @@ async def batch_detect_emotion(
         
         return response
         
-    except HTTPException:
+    except (HTTPException, VoiceprintException):
         raise
     except Exception as e:
         logger.error(f"Batch emotion detection failed: {e}")
@@ -232,7 +234,7 @@ async def submit_emotion_feedback(
             
             return {"message": "反馈提交成功", "feedback_id": feedback_model.id}
             
-    except HTTPException:
+    except (HTTPException, VoiceprintException):
         raise
     except Exception as e:
         logger.error(f"Failed to submit emotion feedback: {e}")
@@ -246,37 +248,74 @@ async def get_emotion_statistics(
     end_date: Optional[str] = None,
     current_user: UserModel = Depends(get_current_user)
 ):
-    """获取情绪检测统计信息"""
+    """获取情绪检测统计信息（全员按日期统计时读取汇总表，其余情况两次聚合查询）"""
     try:
-        async with get_db() as db:
-            from sqlalchemy import select, func, and_
+        start_day = _parse_day(start_date)
+        end_day = _parse_day(end_date)
+        if (
+            employee_id is None
+            and (start_date is None or start_day is not None)
+            and (end_date is None or end_day is not None)
+        ):
+            # 日汇总 + 水位之后尚未汇总的记录，结束日期包含当天
+            aggregate = await emotion_rollup_service.aggregate_range(start_day, end_day)
+            model_performance = aggregate.model_performance()
+            return EmotionStatistics(
+                total_detections=aggregate.total,
+                successful_detections=aggregate.successful,
+                average_confidence=model_performance["average_confidence"],
+                emotion_frequency=aggregate.emotion_counts,
+                quality_distribution=aggregate.quality,
+                model_performance=model_performance,
+                processing_time_stats=aggregate.processing_time_stats(),
+                error_rate=model_performance["error_rate"]
+            )
+        
+        async with AsyncSessionLocal() as db:
+            from sqlalchemy import select, func, and_, case
             
             # 构建查询条件
             conditions = []
             if employee_id:
                 conditions.append(EmotionDetectionModel.employee_id == employee_id)
-            if start_date:
+            # 纯日期参数与汇总路径一致：[开始日 00:00, 结束日次日 00:00)；带时间的参数按原值比较
+            if start_day is not None:
+                conditions.append(EmotionDetectionModel.created_at >= datetime.combine(start_day, datetime.min.time()))
+            elif start_date:
                 conditions.append(EmotionDetectionModel.created_at >= start_date)
-            if end_date:
+            if end_day is not None:
+                conditions.append(
+                    EmotionDetectionModel.created_at < datetime.combine(end_day + timedelta(days=1), datetime.min.time())
+                )
+            elif end_date:
                 conditions.append(EmotionDetectionModel.created_at <= end_date)
             
-            # 基础统计
-            base_query = select(
+            quality = EmotionDetectionModel.audio_quality_score
+            processing_time = EmotionDetectionModel.processing_time
+            
+            # 基础统计、质量分布（CASE分桶）和处理时间直方图在一次聚合中完成
+            stats_query = select(
                 func.count(EmotionDetectionModel.id).label('total_detections'),
-                func.sum(func.cast(EmotionDetectionModel.is_success, int)).label('successful_detections'),
+                func.sum(case((EmotionDetectionModel.is_success == True, 1), else_=0)).label('successful_detections'),
                 func.avg(EmotionDetectionModel.confidence_score).label('avg_confidence'),
-                func.avg(EmotionDetectionModel.processing_time).label('avg_processing_time')
+                func.avg(processing_time).label('avg_time'),
+                func.min(processing_time).label('min_time'),
+                func.max(processing_time).label('max_time'),
+                func.sum(case((quality >= 0.8, 1), else_=0)).label('quality_high'),
+                func.sum(case((and_(quality >= 0.5, quality < 0.8), 1), else_=0)).label('quality_medium'),
+                func.sum(case((quality < 0.5, 1), else_=0)).label('quality_low'),
+                *cumulative_bucket_columns(processing_time, PROCESSING_TIME_BUCKETS, 'time_le')
             )
             
             if conditions:
-                base_query = base_query.where(and_(*conditions))
+                stats_query = stats_query.where(and_(*conditions))
             
-            result = await db.execute(base_query)
+            result = await db.execute(stats_query)
             stats = result.first()
             
             # 计算错误率
             total = stats.total_detections or 0
-            successful = stats.successful_detections or 0
+            successful = int(stats.successful_detections or 0)
             error_rate = (total - successful) / total if total > 0 else 0.0
             
             # 情绪频率统计
@@ -296,47 +335,28 @@ async def get_emotion_statistics(
             emotion_frequency = {row.dominant_emotion: row.count for row in freq_result}
             
             # 质量分布统计
-            quality_distribution = {"high": 0, "medium": 0, "low": 0}
-            
-            quality_query = select(EmotionDetectionModel.audio_quality_score)
-            if conditions:
-                quality_query = quality_query.where(and_(*conditions))
-            
-            quality_result = await db.execute(quality_query)
-            for row in quality_result:
-                score = row.audio_quality_score
-                if score >= 0.8:
-                    quality_distribution["high"] += 1
-                elif score >= 0.5:
-                    quality_distribution["medium"] += 1
-                else:
-                    quality_distribution["low"] += 1
+            quality_distribution = {
+                "high": int(stats.quality_high or 0),
+                "medium": int(stats.quality_medium or 0),
+                "low": int(stats.quality_low or 0)
+            }
             
             # 模型性能指标
             model_performance = {
                 "average_confidence": float(stats.avg_confidence or 0.0),
-                "average_processing_time": float(stats.avg_processing_time or 0.0),
+                "average_processing_time": float(stats.avg_time or 0.0),
                 "success_rate": successful / total if total > 0 else 0.0,
                 "error_rate": error_rate
             }
             
-            # 处理时间统计
-            processing_query = select(
-                func.min(EmotionDetectionModel.processing_time).label('min_time'),
-                func.max(EmotionDetectionModel.processing_time).label('max_time'),
-                func.avg(EmotionDetectionModel.processing_time).label('avg_time')
-            )
-            
-            if conditions:
-                processing_query = processing_query.where(and_(*conditions))
-            
-            processing_result = await db.execute(processing_query)
-            processing_stats = processing_result.first()
-            
+            # 处理时间统计（分位数由直方图桶插值估算）
+            cumulative = [getattr(stats, f"time_le_{index}") for index in range(len(PROCESSING_TIME_BUCKETS))]
             processing_time_stats = {
-                "min": float(processing_stats.min_time or 0.0),
-                "max": float(processing_stats.max_time or 0.0),
-                "average": float(processing_stats.avg_time or 0.0)
+                "min": float(stats.min_time or 0.0),
+                "max": float(stats.max_time or 0.0),
+                "average": float(stats.avg_time or 0.0),
+                "p50": approx_percentile(0.5, PROCESSING_TIME_BUCKETS, cumulative, total, stats.min_time, stats.max_time),
+                "p95": approx_percentile(0.95, PROCESSING_TIME_BUCKETS, cumulative, total, stats.min_time, stats.max_time)
             }
             
             return EmotionStatistics(
@@ -355,30 +375,90 @@ async def get_emotion_statistics(
         raise HTTPException(status_code=500, detail="获取统计信息失败")
 
 
+@router.get("/summary", response_model=List[EmotionSummary])
+async def get_emotion_summary(
+    summary_type: str = "daily",
+    start_date: Optional[str] = None,
+    end_date: Optional[str] = None,
+    current_user: UserModel = Depends(get_current_user)
+):
+    """获取日/周/月情绪汇总（由汇总引擎增量维护，最新数据有约一个汇总周期的延迟）"""
+    if summary_type not in SUMMARY_TYPES:
+        raise HTTPException(status_code=400, detail="汇总类型必须是 daily/weekly/monthly")
+    for value in (start_date, end_date):
+        if value is not None and _parse_day(value) is None:
+            raise HTTPException(status_code=400, detail="日期格式必须是 YYYY-MM-DD")
+    
+    try:
+        summaries = await emotion_rollup_service.get_summaries(summary_type, start_date, end_date)
+        return [
+            EmotionSummary(
+                date=summary.summary_date,
+                summary_type=summary.summary_type,
+                employee_count=summary.employee_count,
+                total_detections=summary.total_detections,
+                successful_detections=summary.successful_detections,
+                emotion_distribution=summary.emotion_distribution or {},
+                average_confidence=summary.average_confidence,
+                average_intensity=summary.average_intensity,
+                average_complexity=summary.average_complexity,
+                quality_distribution=summary.quality_distribution or {},
+                model_performance={
+                    key: value for key, value in (summary.model_performance or {}).items()
+                    if isinstance(value, (int, float))
+                }
+            )
+            for summary in summaries
+        ]
+    except Exception as e:
+        logger.error(f"Failed to get emotion summary: {e}")
+        raise HTTPException(status_code=500, detail="获取情绪汇总失败")
+
+
+def _parse_day(value: Optional[str]) -> Optional[date]:
+    """解析纯日期参数(YYYY-MM-DD)，带时间或格式不符时返回None"""
+    if not value or len(value) != 10:
+        return None
+    try:
+        return date.fromisoformat(value)
+    except ValueError:
+        return None
+
+
 @router.get("/history/{employee_id}")
 async def get_emotion_history(
     employee_id: int,
     limit: int = 50,
-    offset: int = 0,
+    cursor: Optional[str] = None,
     current_user: UserModel = Depends(get_current_user)
 ):
-    """获取员工情绪检测历史"""
+    """获取员工情绪检测历史（游标分页，next_cursor为空表示没有更多记录）"""
     try:
-        async with get_db() as db:
+        limit = clamp_limit(limit)
+        async with AsyncSessionLocal() as db:
             from sqlalchemy import select
             from sqlalchemy.orm import selectinload
             
-            stmt = (
+            stmt = keyset_page(
                 select(EmotionDetectionModel)
                 .options(selectinload(EmotionDetectionModel.feedbacks))
-                .where(EmotionDetectionModel.employee_id == employee_id)
-                .order_by(EmotionDetectionModel.created_at.desc())
-                .limit(limit)
-                .offset(offset)
+                .where(EmotionDetectionModel.employee_id == employee_id),
+                EmotionDetectionModel.created_at,
+                EmotionDetectionModel.id,
+                cursor,
+                limit
             )
             
             result = await db.execute(stmt)
-            detections = result.scalars().all()
+            detections, next_cursor = split_page(
+                result.scalars().all(), limit, lambda detection: (detection.created_at, detection.id)
+            )
+            total_count = await cached_count(
+                db,
+                f"emotion_history:{employee_id}",
+                EmotionDetectionModel.id,
+                EmotionDetectionModel.employee_id == employee_id
+            )
             
             history = []
             for detection in detections:
@@ -409,9 +489,13 @@ async def get_emotion_history(
             return {
                 "employee_id": employee_id,
                 "history": history,
-                "total_count": len(history)
+                "total_count": total_count,
+                "next_cursor": next_cursor,
+                "has_more": next_cursor is not None
             }
             
+    except InvalidCursorError:
+        raise HTTPException(status_code=400, detail="无效的分页游标")
     except Exception as e:
         logger.error(f"Failed to get emotion history: {e}")
         raise HTTPException(status_code=500, detail="获取情绪历史失败")
@@ -436,8 +520,8 @@ async def get_emotion_model_status():
         raise HTTPException(status_code=500, detail="获取模型状态失败")
 
 
-# 后台任务函数
-async def save_emotion_detection(
+# 检测结果保存（写入批量日志队列，不占用请求处理时间）
+def save_emotion_detection(
     detection_id: str,
     employee_id: Optional[int],
     meeting_id: Optional[int],
@@ -445,34 +529,26 @@ async def save_emotion_detection(
     current_user_id: int
 ):
     """保存情绪检测结果到数据库"""
-    try:
-        async with get_db() as db:
-            detection_model = EmotionDetectionModel(
-                detection_id=detection_id,
-                employee_id=employee_id,
-                meeting_id=meeting_id,
-                dominant_emotion=emotion_result.dominant_emotion,
-                confidence_score=emotion_result.confidence,
-                emotion_probabilities=emotion_result.emotion_probabilities,
-                intensity=emotion_result.intensity,
-                complexity=emotion_result.complexity,
-                audio_url=emotion_result.audio_url,
-                audio_duration=emotion_result.audio_duration,
-                audio_quality_score=emotion_result.quality_score,
-                emotion_analysis=emotion_result.analysis,
-                model_name=emotion_result.model_name,
-                processing_time=emotion_result.processing_time,
-                is_success=True
-            )
-            
-            db.add(detection_model)
-            await db.commit()
-            
-    except Exception as e:
-        logger.error(f"Failed to save emotion detection: {e}")
+    log_writer.submit(EmotionDetectionModel, {
+        "detection_id": detection_id,
+        "employee_id": employee_id,
+        "meeting_id": meeting_id,
+        "dominant_emotion": emotion_result.dominant_emotion,
+        "confidence_score": emotion_result.confidence,
+        "emotion_probabilities": emotion_result.emotion_probabilities,
+        "intensity": emotion_result.intensity,
+        "complexity": emotion_result.complexity,
+        "audio_url": emotion_result.audio_url,
+        "audio_duration": emotion_result.audio_duration,
+        "audio_quality_score": emotion_result.quality_score,
+        "emotion_analysis": emotion_result.analysis,
+        "model_name": emotion_result.model_name,
+        "processing_time": emotion_result.processing_time,
+        "is_success": True
+    })
 
 
-async def save_batch_emotion_detections(
+def save_batch_emotion_detections(
     results: List[EmotionDetectionResponse],
     employee_id: Optional[int],
     meeting_id: Optional[int],
@@ -481,9 +557,8 @@ async def save_batch_emotion_detections(
     """保存批量情绪检测结果"""
     for result in results:
         if result.success and result.emotion_feature:
-            detection_id = str(uuid.uuid4())
-            await save_emotion_detection(
-                detection_id=detection_id,
+            save_emotion_detection(
+                detection_id=str(uuid.uuid4()),
                 employee_id=employee_id,
                 meeting_id=meeting_id,
                 emotion_result=result.emotion_feature,
@@ -1,30 +1,43 @@
 from fastapi import APIRouter, Depends, HTTPException, status
 from sqlalchemy.ext.asyncio import AsyncSession
-from typing import List
+from typing import List, Optional
 
 from app.models.database import get_db
 from app.models.employee import EmployeeModel
 from app.core.security import get_current_user, get_admin_user
 from app.models.user import UserModel
+from app.utils.pagination import InvalidCursorError, cached_count, clamp_limit, keyset_page, split_page
 
 router = APIRouter()
 
 
 @router.get("/")
 async def get_employees(
-    skip: int = 0,
     limit: int = 100,
+    cursor: Optional[str] = None,
     db: AsyncSession = Depends(get_db),
     current_user: UserModel = Depends(get_current_user)
 ):
-    """获取员工列表"""
+    """获取员工列表（游标分页，next_cursor为空表示没有更多记录）"""
     from sqlalchemy import select
     
-    stmt = select(EmployeeModel).offset(skip).limit(limit)
+    limit = clamp_limit(limit)
+    try:
+        stmt = keyset_page(select(EmployeeModel), EmployeeModel.created_at, EmployeeModel.employee_id, cursor, limit)
+    except InvalidCursorError:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="无效的分页游标")
     result = await db.execute(stmt)
-    employees = result.scalars().all()
+    employees, next_cursor = split_page(
+        result.scalars().all(), limit, lambda employee: (employee.created_at, employee.employee_id)
+    )
+    total = await cached_count(db, "employees", EmployeeModel.employee_id)
     
-    return {"employees": employees, "total": len(employees)}
+    return {
+        "employees": employees,
+        "total": total,
+        "next_cursor": next_cursor,
+        "has_more": next_cursor is not None
+    }
 
 
 @router.get("/{employee_id}")
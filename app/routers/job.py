@@ -0,0 +1,218 @@
+from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Form, Request
+from fastapi.responses import StreamingResponse
+from typing import List, Optional
+import asyncio
+from loguru import logger
+
+from app.core.config import settings
+from app.core.security import get_current_user
+from app.core.exceptions import VoiceprintException
+from app.core.ingest import read_audio_upload
+from app.models.user import UserModel
+from app.models.job import InferenceJobModel
+from app.schemas.job import (
+    JobObjectSubmitRequest, JobSubmitResponse, JobStatusResponse,
+    JobItemResult, JobResultsResponse
+)
+from app.services.job_service import (
+    job_service, JOB_TYPE_EMOTION, JOB_TYPE_RECOGNITION, TERMINAL_STATUSES
+)
+
+router = APIRouter()
+
+
+def _job_status(job: InferenceJobModel) -> JobStatusResponse:
+    processed = job.completed_items + job.failed_items
+    return JobStatusResponse(
+        job_id=job.job_id,
+        job_type=job.job_type,
+        status=job.status,
+        total_items=job.total_items,
+        completed_items=job.completed_items,
+        failed_items=job.failed_items,
+        progress=processed / job.total_items if job.total_items else 1.0,
+        error_message=job.error_message,
+        created_at=job.created_at,
+        started_at=job.started_at,
+        finished_at=job.finished_at
+    )
+
+
+async def _get_owned_job(job_id: str, current_user: UserModel) -> InferenceJobModel:
+    job = await job_service.get_job(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="任务不存在")
+    if job.created_by != current_user.user_id and not current_user.is_admin:
+        raise HTTPException(status_code=403, detail="无权访问该任务")
+    return job
+
+
+async def _submit_uploads(
+    job_type: str,
+    audio_files: List[UploadFile],
+    employee_id: Optional[int],
+    meeting_id: Optional[int],
+    current_user: UserModel
+) -> JobSubmitResponse:
+    if len(audio_files) > settings.JOB_MAX_ITEMS:
+        raise HTTPException(status_code=400, detail=f"单个任务最多支持{settings.JOB_MAX_ITEMS}个文件")
+
+    for audio_file in audio_files:
+        if not audio_file.content_type or not audio_file.content_type.startswith('audio/'):
+            raise HTTPException(status_code=400, detail=f"文件 {audio_file.filename} 不是音频文件")
+
+    async def clips():
+        # 逐个读取，上传完一个再读下一个，不在内存中同时保存所有片段
+        for audio_file in audio_files:
+            yield audio_file.filename, await read_audio_upload(audio_file)
+
+    job = await job_service.submit_clips(
+        job_type=job_type,
+        clips=clips(),
+        created_by=current_user.user_id,
+        employee_id=employee_id,
+        meeting_id=meeting_id
+    )
+    return JobSubmitResponse(
+        success=True,
+        job_id=job.job_id,
+        job_type=job.job_type,
+        total_items=job.total_items,
+        message="任务已提交"
+    )
+
+
+@router.post("/emotion", response_model=JobSubmitResponse)
+async def submit_emotion_job(
+    audio_files: List[UploadFile] = File(...),
+    employee_id: Optional[int] = Form(None),
+    meeting_id: Optional[int] = Form(None),
+    current_user: UserModel = Depends(get_current_user)
+):
+    """提交批量情绪检测任务"""
+    try:
+        return await _submit_uploads(JOB_TYPE_EMOTION, audio_files, employee_id, meeting_id, current_user)
+    except (HTTPException, VoiceprintException):
+        raise
+    except Exception as e:
+        logger.error(f"Failed to submit emotion job: {e}")
+        raise HTTPException(status_code=500, detail=f"任务提交失败: {str(e)}")
+
+
+@router.post("/recognition", response_model=JobSubmitResponse)
+async def submit_recognition_job(
+    audio_files: List[UploadFile] = File(...),
+    meeting_id: Optional[int] = Form(None),
+    current_user: UserModel = Depends(get_current_user)
+):
+    """提交批量声纹识别任务"""
+    try:
+        return await _submit_uploads(JOB_TYPE_RECOGNITION, audio_files, None, meeting_id, current_user)
+    except (HTTPException, VoiceprintException):
+        raise
+    except Exception as e:
+        logger.error(f"Failed to submit recognition job: {e}")
+        raise HTTPException(status_code=500, detail=f"任务提交失败: {str(e)}")
+
+
+@router.post("/objects", response_model=JobSubmitResponse)
+async def submit_object_job(
+    request: JobObjectSubmitRequest,
+    current_user: UserModel = Depends(get_current_user)
+):
+    """按对象存储键提交批量任务（音频已在MinIO中）"""
+    if len(request.object_keys) > settings.JOB_MAX_ITEMS:
+        raise HTTPException(status_code=400, detail=f"单个任务最多支持{settings.JOB_MAX_ITEMS}个文件")
+    if any(".." in key or key.startswith("/") for key in request.object_keys):
+        raise HTTPException(status_code=400, detail="无效的对象键")
+    if any(key.startswith("recordings/") for key in request.object_keys):
+        # 会议录音由录音任务流式分段处理，不能作为片段整体读入内存
+        raise HTTPException(status_code=400, detail="会议录音不能作为片段提交")
+    if not current_user.is_admin:
+        unowned = await job_service.unowned_object_keys(request.object_keys, current_user.user_id)
+        if unowned:
+            raise HTTPException(status_code=403, detail=f"无权访问对象: {unowned[0]}")
+
+    try:
+        job = await job_service.submit_objects(
+            job_type=request.job_type,
+            object_keys=request.object_keys,
+            created_by=current_user.user_id,
+            employee_id=request.employee_id,
+            meeting_id=request.meeting_id
+        )
+        return JobSubmitResponse(
+            success=True,
+            job_id=job.job_id,
+            job_type=job.job_type,
+            total_items=job.total_items,
+            message="任务已提交"
+        )
+    except Exception as e:
+        logger.error(f"Failed to submit object job: {e}")
+        raise HTTPException(status_code=500, detail=f"任务提交失败: {str(e)}")
+
+
+@router.get("/{job_id}", response_model=JobStatusResponse)
+async def get_job_status(
+    job_id: str,
+    current_user: UserModel = Depends(get_current_user)
+):
+    """查询任务进度"""
+    job = await _get_owned_job(job_id, current_user)
+    return _job_status(job)
+
+
+@router.get("/{job_id}/events")
+async def stream_job_events(
+    job_id: str,
+    request: Request,
+    current_user: UserModel = Depends(get_current_user)
+):
+    """订阅任务进度（Server-Sent Events），任务结束后关闭连接"""
+    await _get_owned_job(job_id, current_user)
+
+    async def event_stream():
+        last_payload = None
+        while not await request.is_disconnected():
+            job = await job_service.get_job(job_id)
+            if job is None:
+                break
+            payload = _job_status(job).model_dump_json()
+            if payload != last_payload:
+                yield f"event: progress\ndata: {payload}\n\n"
+                last_payload = payload
+            if job.status in TERMINAL_STATUSES:
+                break
+            await asyncio.sleep(settings.JOB_POLL_INTERVAL)
+
+    return StreamingResponse(event_stream(), media_type="text/event-stream")
+
+
+@router.get("/{job_id}/results", response_model=JobResultsResponse)
+async def get_job_results(
+    job_id: str,
+    offset: int = 0,
+    limit: int = 100,
+    current_user: UserModel = Depends(get_current_user)
+):
+    """获取任务结果（分页）"""
+    job = await _get_owned_job(job_id, current_user)
+    items = await job_service.get_items(job_id, offset=offset, limit=min(limit, 500))
+
+    return JobResultsResponse(
+        job_id=job.job_id,
+        status=job.status,
+        results=[
+            JobItemResult(
+                item_index=item.item_index,
+                filename=item.filename,
+                object_key=item.object_key,
+                status=item.status,
+                result=item.result,
+                error_message=item.error_message
+            )
+            for item in items
+        ],
+        total_count=job.total_items
+    )
@@ -1,10 +1,19 @@
 from fastapi import APIRouter, Depends, HTTPException, status
 from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List
+from loguru import logger
 
 from app.models.database import get_db
 from app.core.security import get_current_user
+from app.core.exceptions import VoiceprintException
 from app.models.user import UserModel
+from app.models.meeting import MeetingModel, MeetingRecordingModel
+from app.schemas.meeting import (
+    RecordingUploadRequest, RecordingUploadResponse,
+    RecordingCompleteRequest, RecordingStatusResponse
+)
+from app.services.recording_service import recording_service
+from app.services.job_service import job_service, JOB_TYPE_RECORDING
 
 router = APIRouter()
 
@@ -26,4 +35,88 @@ async def create_meeting(
     current_user: UserModel = Depends(get_current_user)
 ):
     """创建会议"""
-    return {"message": "创建会议接口"}
\ No newline at end of file
+    return {"message": "创建会议接口"}
+
+async def _get_meeting(db: AsyncSession, meeting_id: int) -> MeetingModel:
+    meeting = await db.get(MeetingModel, meeting_id)
+    if not meeting:
+        raise HTTPException(status_code=404, detail="会议不存在")
+    return meeting
+
+
+async def _get_recording(meeting_id: int, recording_id: str, current_user: UserModel) -> MeetingRecordingModel:
+    recording = await recording_service.get_recording(recording_id)
+    if not recording or recording.meeting_id != meeting_id:
+        raise HTTPException(status_code=404, detail="录音不存在")
+    if recording.created_by != current_user.user_id and not current_user.is_admin:
+        raise HTTPException(status_code=403, detail="无权访问该录音")
+    return recording
+
+
+@router.post("/{meeting_id}/recordings", response_model=RecordingUploadResponse)
+async def create_recording_upload(
+    meeting_id: int,
+    request: RecordingUploadRequest,
+    db: AsyncSession = Depends(get_db),
+    current_user: UserModel = Depends(get_current_user)
+):
+    """申请会议录音上传地址（客户端直传对象存储，大文件使用分片上传）"""
+    meeting = await _get_meeting(db, meeting_id)
+    if not meeting.recording_enabled:
+        raise HTTPException(status_code=400, detail="该会议未开启录音")
+
+    try:
+        return await recording_service.create_upload(
+            meeting=meeting,
+            filename=request.filename,
+            file_size=request.file_size,
+            content_type=request.content_type,
+            created_by=current_user.user_id
+        )
+    except VoiceprintException:
+        raise
+    except Exception as e:
+        logger.error(f"Failed to create recording upload for meeting {meeting_id}: {e}")
+        raise HTTPException(status_code=500, detail=f"申请上传地址失败: {str(e)}")
+
+
+@router.post("/{meeting_id}/recordings/{recording_id}/complete", response_model=RecordingStatusResponse)
+async def complete_recording_upload(
+    meeting_id: int,
+    recording_id: str,
+    request: RecordingCompleteRequest,
+    current_user: UserModel = Depends(get_current_user)
+):
+    """录音上传完成回调：合并分片并创建后台处理任务"""
+    recording = await _get_recording(meeting_id, recording_id, current_user)
+
+    try:
+        recording = await recording_service.complete_upload(
+            recording,
+            [part.model_dump() for part in request.parts]
+        )
+        job = await job_service.submit_objects(
+            job_type=JOB_TYPE_RECORDING,
+            object_keys=[recording.object_key],
+            created_by=current_user.user_id,
+            meeting_id=meeting_id
+        )
+        await recording_service.attach_job(recording.recording_id, job.job_id)
+        recording.job_id = job.job_id
+        return RecordingStatusResponse.model_validate(recording, from_attributes=True)
+    except VoiceprintException:
+        raise
+    except Exception as e:
+        logger.error(f"Failed to complete recording upload {recording_id}: {e}")
+        raise HTTPException(status_code=500, detail=f"完成上传失败: {str(e)}")
+
+
+@router.get("/{meeting_id}/recordings/{recording_id}", response_model=RecordingStatusResponse)
+async def get_recording_status(
+    meeting_id: int,
+    recording_id: str,
+    current_user: UserModel = Depends(get_current_user)
+):
+    """查询会议录音处理状态"""
+    recording = await _get_recording(meeting_id, recording_id, current_user)
+    return RecordingStatusResponse.model_validate(recording, from_attributes=True)
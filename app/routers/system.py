@@ -4,6 +4,8 @@ from sqlalchemy.ext.asyncio import AsyncSession
 from app.models.database import get_db
 from app.core.security import get_current_user, get_admin_user
 from app.models.user import UserModel
+from app.core.metrics import metrics
+from app.core.concurrency import inference_limiter
 
 router = APIRouter()
 
@@ -39,4 +41,15 @@ async def get_system_stats(
         "voiceprints_count": 0,
         "meetings_count": 0,
         "storage_used": "0 MB"
-    }
\ No newline at end of file
+    }
+
+
+@router.get("/metrics")
+async def get_system_metrics(
+    current_user: UserModel = Depends(get_admin_user)
+):
+    """获取运行时指标（管理员权限）"""
+    return {
+        "inference": inference_limiter.status(),
+        **metrics.snapshot()
+    }
@@ -1,8 +1,13 @@
+import mimetypes
+import os
+
 from fastapi import APIRouter, Depends, UploadFile, File, HTTPException
+from fastapi.responses import FileResponse
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.models.database import get_db
 from app.core.security import get_current_user
+from app.core.storage import storage, LocalStorage
 from app.models.user import UserModel
 
 router = APIRouter()
@@ -41,4 +46,21 @@ async def upload_image(
         "filename": image_file.filename,
         "size": image_file.size,
         "content_type": image_file.content_type
-    }
\ No newline at end of file
+    }
+
+
+@router.get("/objects/{object_name:path}")
+async def get_local_object(
+    object_name: str,
+    current_user: UserModel = Depends(get_current_user)
+):
+    """读取本地存储后端中的对象（STORAGE_BACKEND=local 时对象URL指向此接口）"""
+    if not isinstance(storage, LocalStorage):
+        raise HTTPException(status_code=404, detail="对象不存在")
+    
+    path = storage.path_for(object_name)
+    if not os.path.isfile(path):
+        raise HTTPException(status_code=404, detail="对象不存在")
+    
+    media_type = mimetypes.guess_type(object_name)[0] or "application/octet-stream"
+    return FileResponse(path, media_type=media_type)
@@ -1,12 +1,15 @@
-from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, BackgroundTasks
+from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Request
+from sqlalchemy import insert, select, update
 from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List, Optional
 import time
-import uuid
+from datetime import datetime
+from loguru import logger
 
-from app.models.database import get_db
+from app.models.database import get_db, AsyncSessionLocal
 from app.models.employee import EmployeeModel
 from app.models.voiceprint import VoiceprintModel
+from app.models.meeting import SpeechRecordModel
 from app.models.user import UserModel
 from app.schemas.voiceprint import (
     VoiceprintRegisterRequest, VoiceprintRegisterResponse,
@@ -14,15 +17,28 @@ from app.schemas.voiceprint import (
     VoiceprintStatusResponse, VoiceprintDeleteResponse
 )
 from app.services.voiceprint_service import voiceprint_service
+from app.services.audio_object_service import audio_object_service
+from app.services.voiceprint_counter_service import voiceprint_counter_service
+from app.services.employee_directory_service import employee_directory_service
+from app.services.voiceprint_gallery_service import voiceprint_gallery_service
 from app.core.security import get_current_user
+from app.core.exceptions import VoiceprintException
+from app.core.deadline import Deadline
+from app.core.ingest import read_audio_upload
+from app.core.task_queue import task_queue
+from app.utils.hashing import audio_digest
+from app.utils.pagination import InvalidCursorError, cached_count, clamp_limit, keyset_page, split_page
 
 
 router = APIRouter()
 
+# 持久化任务类型
+TASK_SPEECH_RECORD = "speech_record"
+
 
 @router.post("/register", response_model=VoiceprintRegisterResponse)
 async def register_voiceprint(
-    background_tasks: BackgroundTasks,
+    request: Request,
     employee_id: int,
     sample_index: int = 1,
     audio_file: UploadFile = File(...),
@@ -38,42 +54,29 @@ async def register_voiceprint(
     """
     try:
         # 验证员工存在
-        stmt = await db.get(EmployeeModel, employee_id)
-        if not stmt or stmt.status != 1:
+        employee = await db.get(EmployeeModel, employee_id)
+        if not employee or not employee.is_active:
             raise HTTPException(status_code=404, detail="员工不存在或已离职")
         
-        # 验证样本数量限制
-        existing_count = await db.execute(
-            "SELECT COUNT(*) FROM voiceprints WHERE employee_id = %s AND is_active = 1",
-            (employee_id,)
-        )
-        count = existing_count.scalar()
-        
-        if count >= 5:  # 最大5个样本
+        # 验证样本数量限制（读取员工声纹计数提前拒绝，保存时再原子检查）
+        if employee.voiceprint_count >= voiceprint_counter_service.max_samples:
             raise HTTPException(status_code=400, detail="已达到最大样本数量限制")
         
         # 验证文件格式
         if not audio_file.content_type.startswith('audio/'):
             raise HTTPException(status_code=400, detail="请上传音频文件")
         
-        # 读取音频数据
-        audio_data = await audio_file.read()
-        
-        # 限制文件大小 (50MB)
-        max_size = 50 * 1024 * 1024
-        if len(audio_data) > max_size:
-            raise HTTPException(status_code=400, detail="音频文件过大，最大50MB")
+        # 分块读取音频数据（超出大小或时长限制时尽早拒绝）
+        audio_data = await read_audio_upload(audio_file)
         
         # 注册声纹
         voiceprint_id = await voiceprint_service.register_voiceprint(
             employee_id=employee_id,
             audio_data=audio_data,
-            sample_index=sample_index
+            sample_index=sample_index,
+            deadline=Deadline.from_request(request)
         )
         
-        # 后台任务：更新员工声纹状态
-        background_tasks.add_task(update_employee_voiceprint_status, employee_id)
-        
         return VoiceprintRegisterResponse(
             success=True,
             voiceprint_id=voiceprint_id,
@@ -81,7 +84,7 @@ async def register_voiceprint(
             message="声纹注册成功"
         )
         
-    except HTTPException:
+    except (HTTPException, VoiceprintException):
         raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"声纹注册失败: {str(e)}")
@@ -89,11 +92,10 @@ async def register_voiceprint(
 
 @router.post("/recognize", response_model=VoiceprintRecognizeResponse)
 async def recognize_voiceprint(
-    background_tasks: BackgroundTasks,
+    request: Request,
     meeting_id: Optional[int] = None,
     audio_file: UploadFile = File(...),
-    current_user: UserModel = Depends(get_current_user),
-    db: AsyncSession = Depends(get_db)
+    current_user: UserModel = Depends(get_current_user)
 ):
     """
     声纹识别
@@ -106,55 +108,57 @@ async def recognize_voiceprint(
         if not audio_file.content_type.startswith('audio/'):
             raise HTTPException(status_code=400, detail="请上传音频文件")
         
-        # 读取音频数据
-        audio_data = await audio_file.read()
-        
-        # 限制文件大小
-        max_size = 50 * 1024 * 1024
-        if len(audio_data) > max_size:
-            raise HTTPException(status_code=400, detail="音频文件过大，最大50MB")
+        # 分块读取音频数据（超出大小或时长限制时尽早拒绝）
+        audio_data = await read_audio_upload(audio_file)
         
         # 进行声纹识别
         start_time = time.time()
-        result = await voiceprint_service.recognize_voiceprint(audio_data, meeting_id)
+        result = await voiceprint_service.recognize_voiceprint(
+            audio_data,
+            meeting_id,
+            deadline=Deadline.from_request(request)
+        )
         processing_time = (time.time() - start_time) * 1000  # 转换为毫秒
         result.processing_time = processing_time
         
-        # 后台任务：保存识别记录
+        # 后台任务：保存识别记录（同一会议中重试上传的同一段音频只记录一次）
         if meeting_id and result.employee_id:
-            background_tasks.add_task(
-                save_speech_record,
-                meeting_id=meeting_id,
-                employee_id=result.employee_id,
-                audio_url=result.audio_url,
-                confidence=result.confidence,
-                duration=0  # 需要从音频中计算
+            await task_queue.enqueue(
+                TASK_SPEECH_RECORD,
+                {
+                    "meeting_id": meeting_id,
+                    "employee_id": result.employee_id,
+                    "audio_url": result.audio_url,
+                    "confidence": result.confidence,
+                    "duration": 0  # 需要从音频中计算
+                },
+                idempotency_key=f"{TASK_SPEECH_RECORD}:{meeting_id}:{audio_digest(audio_data)}"
             )
         
-        # 如果有匹配的员工，获取员工信息
-        employee_info = None
-        if result.employee_id:
-            employee = await db.get(EmployeeModel, result.employee_id)
-            if employee:
-                employee_info = {
-                    "id": employee.id,
-                    "employee_id": employee.employee_id,
-                    "name": employee.name,
-                    "department": employee.department,
-                    "position": employee.position
-                }
+        # 匹配员工和候选员工的信息从员工目录缓存批量获取
+        directory = await employee_directory_service.get_many(
+            [result.employee_id] + [match["employee_id"] for match in result.all_matches]
+        )
+        all_matches = []
+        for match in result.all_matches:
+            entry = directory.get(match["employee_id"])
+            all_matches.append({
+                **match,
+                "employee_name": entry["name"] if entry else None,
+                "department": entry["department"] if entry else None
+            })
         
         return VoiceprintRecognizeResponse(
             success=result.success,
             confidence=result.confidence,
             threshold=result.threshold,
-            identified_employee=employee_info,
+            identified_employee=directory.get(result.employee_id),
             audio_url=result.audio_url,
             processing_time=result.processing_time,
-            all_matches=result.all_matches
+            all_matches=all_matches
         )
         
-    except HTTPException:
+    except (HTTPException, VoiceprintException):
         raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"声纹识别失败: {str(e)}")
@@ -170,39 +174,44 @@ async def get_voiceprint_status(
     try:
         # 验证员工存在
         employee = await db.get(EmployeeModel, employee_id)
-        if not employee or employee.status != 1:
+        if not employee or not employee.is_active:
             raise HTTPException(status_code=404, detail="员工不存在或已离职")
         
-        # 获取声纹信息
-        voiceprints = await db.execute(
-            "SELECT voiceprint_id, audio_sample_url, quality_score, created_at, sample_duration "
-            "FROM voiceprints WHERE employee_id = %s AND is_active = 1 ORDER BY created_at DESC",
-            (employee_id,)
+        # 获取声纹信息（最多 VOICEPRINT_MAX_SAMPLES 条，走 (employee_id, is_active, created_at) 索引）
+        result = await db.execute(
+            select(
+                VoiceprintModel.voiceprint_id,
+                VoiceprintModel.audio_sample_url,
+                VoiceprintModel.quality_score,
+                VoiceprintModel.created_at,
+                VoiceprintModel.sample_duration
+            )
+            .where(VoiceprintModel.employee_id == employee_id, VoiceprintModel.is_active == True)
+            .order_by(VoiceprintModel.created_at.desc())
         )
         
-        voiceprints_data = []
-        for vp in voiceprints.fetchall():
-            voiceprints_data.append({
-                "voiceprint_id": vp[0],
-                "audio_sample_url": vp[1],
-                "quality_score": vp[2],
-                "created_at": vp[3].isoformat() if vp[3] else None,
-                "sample_duration": vp[4]
-            })
-        
-        # 获取配置的所需样本数量
-        required_samples = 3  # 默认值，可以从配置表读取
-        
+        voiceprints_data = [
+            {
+                "voiceprint_id": vp.voiceprint_id,
+                "audio_sample_url": vp.audio_sample_url,
+                "quality_score": vp.quality_score,
+                "created_at": vp.created_at.isoformat() if vp.created_at else None,
+                "sample_duration": vp.sample_duration
+            }
+            for vp in result
+        ]
+        
+        # 注册数量和完成状态读取员工表上的计数
         return VoiceprintStatusResponse(
             employee_id=employee_id,
             employee_name=employee.name,
-            registered_count=len(voiceprints_data),
-            required_count=required_samples,
-            is_complete=len(voiceprints_data) >= required_samples,
+            registered_count=employee.voiceprint_count,
+            required_count=voiceprint_counter_service.required_samples,
+            is_complete=employee.voiceprint_registered,
             voiceprints=voiceprints_data
         )
         
-    except HTTPException:
+    except (HTTPException, VoiceprintException):
         raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"获取声纹状态失败: {str(e)}")
@@ -217,143 +226,137 @@ async def delete_voiceprint(
     """删除声纹样本"""
     try:
         # 获取声纹信息
-        voiceprint = await db.execute(
-            "SELECT * FROM voiceprints WHERE voiceprint_id = %s",
-            (voiceprint_id,)
-        )
-        vp_data = voiceprint.fetchone()
+        voiceprint = await db.get(VoiceprintModel, voiceprint_id)
         
-        if not vp_data:
+        if not voiceprint or not voiceprint.is_active:
             raise HTTPException(status_code=404, detail="声纹不存在")
         
-        # 删除MinIO中的音频文件
-        if vp_data[2]:  # audio_sample_url
-            try:
-                from app.core.minio_client import minio_client
-                from app.core.config import settings
-                
-                # 从URL中提取object_name
-                url_parts = vp_data[2].split('/')
-                if len(url_parts) >= 5:
-                    object_name = '/'.join(url_parts[-2:])
-                    minio_client.remove_object(settings.MINIO_BUCKET, object_name)
-                    
-            except Exception as e:
-                # 即使删除MinIO文件失败，也继续删除数据库记录
-                print(f"Warning: Failed to delete MinIO file: {e}")
+        employee_id = voiceprint.employee_id
+        audio_url = voiceprint.audio_sample_url
         
-        # 删除数据库记录
-        await db.execute(
-            "DELETE FROM voiceprints WHERE voiceprint_id = %s",
-            (voiceprint_id,)
+        # 软删除（其他进程按 updated_at 同步声纹库），条件更新保证并发删除只生效一次；
+        # 员工声纹计数在同一事务中更新
+        result = await db.execute(
+            update(VoiceprintModel)
+            .where(VoiceprintModel.voiceprint_id == voiceprint_id, VoiceprintModel.is_active == True)
+            .values(is_active=False)
+            .execution_options(synchronize_session=False)
         )
+        if not result.rowcount:
+            raise HTTPException(status_code=404, detail="声纹不存在")
+        await voiceprint_counter_service.decrement(db, employee_id)
         await db.commit()
+        await voiceprint_gallery_service.remove(voiceprint_id)
         
-        # 后台任务：更新员工声纹状态
-        background_tasks.add_task(update_employee_voiceprint_status, vp_data[1])  # employee_id
+        # 释放音频对象引用，没有其他记录引用时才删除文件（即使失败也不影响声纹删除）
+        try:
+            await audio_object_service.release_url(audio_url)
+        except Exception as e:
+            logger.warning(f"Failed to release audio object {audio_url}: {e}")
         
         return VoiceprintDeleteResponse(
             success=True,
             message="声纹删除成功"
         )
         
-    except HTTPException:
+    except (HTTPException, VoiceprintException):
         raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"删除声纹失败: {str(e)}")
 
 
-@router.get("/list", response_model=List[dict])
+@router.get("/list", response_model=dict)
 async def list_voiceprints(
     employee_id: Optional[int] = None,
-    page: int = 1,
-    size: int = 20,
+    limit: int = 20,
+    cursor: Optional[str] = None,
     current_user: UserModel = Depends(get_current_user),
     db: AsyncSession = Depends(get_db)
 ):
-    """获取声纹列表"""
+    """获取声纹列表（游标分页，next_cursor为空表示没有更多记录）"""
     try:
-        # 构建查询
-        where_clause = "WHERE v.is_active = 1"
-        params = []
-        
+        limit = clamp_limit(limit)
+        conditions = [VoiceprintModel.is_active == True]
         if employee_id:
-            where_clause += " AND v.employee_id = %s"
-            params.append(employee_id)
-        
-        # 分页
-        offset = (page - 1) * size
-        
-        query = f"""
-        SELECT 
-            v.voiceprint_id,
-            v.employee_id,
-            e.name as employee_name,
-            e.employee_id as employee_no,
-            e.department,
-            v.audio_sample_url,
-            v.quality_score,
-            v.sample_duration,
-            v.created_at
-        FROM voiceprints v
-        LEFT JOIN employees e ON v.employee_id = e.id
-        {where_clause}
-        ORDER BY v.created_at DESC
-        LIMIT %s OFFSET %s
-        """
-        
-        params.extend([size, offset])
-        
-        result = await db.execute(query, params)
-        voiceprints = []
-        
-        for row in result.fetchall():
-            voiceprints.append({
-                "voiceprint_id": row[0],
-                "employee_id": row[1],
-                "employee_name": row[2],
-                "employee_no": row[3],
-                "department": row[4],
-                "audio_sample_url": row[5],
-                "quality_score": row[6],
-                "sample_duration": row[7],
-                "created_at": row[8].isoformat() if row[8] else None
-            })
+            conditions.append(VoiceprintModel.employee_id == employee_id)
+        
+        stmt = keyset_page(
+            select(
+                VoiceprintModel.voiceprint_id,
+                VoiceprintModel.employee_id,
+                EmployeeModel.name.label("employee_name"),
+                EmployeeModel.employee_code.label("employee_no"),
+                EmployeeModel.department,
+                VoiceprintModel.audio_sample_url,
+                VoiceprintModel.quality_score,
+                VoiceprintModel.sample_duration,
+                VoiceprintModel.created_at
+            )
+            .outerjoin(EmployeeModel, VoiceprintModel.employee_id == EmployeeModel.employee_id)
+            .where(*conditions),
+            VoiceprintModel.created_at,
+            VoiceprintModel.voiceprint_id,
+            cursor,
+            limit
+        )
         
-        return voiceprints
+        result = await db.execute(stmt)
+        rows, next_cursor = split_page(result.all(), limit, lambda row: (row.created_at, row.voiceprint_id))
+        total = await cached_count(
+            db, f"voiceprints:{employee_id or 'all'}", VoiceprintModel.voiceprint_id, *conditions
+        )
         
+        voiceprints = [
+            {
+                "voiceprint_id": row.voiceprint_id,
+                "employee_id": row.employee_id,
+                "employee_name": row.employee_name,
+                "employee_no": row.employee_no,
+                "department": row.department,
+                "audio_sample_url": row.audio_sample_url,
+                "quality_score": row.quality_score,
+                "sample_duration": row.sample_duration,
+                "created_at": row.created_at.isoformat() if row.created_at else None
+            }
+            for row in rows
+        ]
+        
+        return {
+            "voiceprints": voiceprints,
+            "total": total,
+            "next_cursor": next_cursor,
+            "has_more": next_cursor is not None
+        }
+        
+    except InvalidCursorError:
+        raise HTTPException(status_code=400, detail="无效的分页游标")
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"获取声纹列表失败: {str(e)}")
 
 
 # 后台任务函数
-async def update_employee_voiceprint_status(employee_id: int):
-    """更新员工声纹状态"""
-    try:
-        async with get_db() as db:
-            # 这里可以添加更新逻辑，比如更新缓存或统计信息
-            pass
-    except Exception as e:
-        print(f"Error updating employee voiceprint status: {e}")
+async def save_speech_records(payloads: List[dict]):
+    """批量保存发言记录"""
+    now = datetime.now()
+    async with AsyncSessionLocal() as db:
+        await db.execute(
+            insert(SpeechRecordModel),
+            [
+                {
+                    "meeting_id": payload["meeting_id"],
+                    "employee_id": payload["employee_id"],
+                    "audio_url": payload.get("audio_url"),
+                    "confidence_score": payload.get("confidence"),
+                    "start_time": now,
+                    "end_time": now,
+                    "duration": payload.get("duration"),
+                    "is_identified": True
+                }
+                for payload in payloads
+            ]
+        )
+        await db.commit()
 
 
-async def save_speech_record(
-    meeting_id: int,
-    employee_id: int,
-    audio_url: str,
-    confidence: float,
-    duration: float
-):
-    """保存发言记录"""
-    try:
-        async with get_db() as db:
-            await db.execute(
-                """INSERT INTO speech_records 
-                   (meeting_id, employee_id, audio_url, confidence_score, 
-                    start_time, end_time, duration, is_identified)
-                   VALUES (%s, %s, %s, %s, NOW(), NOW(), %s, %s)""",
-                (meeting_id, employee_id, audio_url, confidence, duration, True)
-            )
-            await db.commit()
-    except Exception as e:
-        print(f"Error saving speech record: {e}")
\ No newline at end of file
+# 注册持久化任务处理函数
+task_queue.register(TASK_SPEECH_RECORD, save_speech_records, batch=True)
@@ -76,12 +76,19 @@ class EmotionAnalysis(BaseModel):
 
 class EmotionSummary(BaseModel):
     """情绪汇总"""
-    date: str = Field(..., description="日期")
+    model_config = {'protected_namespaces': ()}
+    
+    date: str = Field(..., description="日期（周汇总为周一日期，月汇总为YYYY-MM）")
+    summary_type: str = Field("daily", description="汇总类型(daily/weekly/monthly)")
     employee_count: int = Field(..., description="员工数量")
     total_detections: int = Field(..., description="总检测次数")
+    successful_detections: int = Field(0, description="成功检测次数")
     emotion_distribution: Dict[str, int] = Field(..., description="情绪分布统计")
     average_confidence: float = Field(..., ge=0.0, le=1.0, description="平均置信度")
+    average_intensity: float = Field(0.0, ge=0.0, le=1.0, description="平均情绪强度")
+    average_complexity: float = Field(0.0, ge=0.0, le=1.0, description="平均情绪复杂度")
     quality_distribution: Dict[str, int] = Field(..., description="音频质量分布")
+    model_performance: Optional[Dict[str, float]] = Field(None, description="模型性能指标")
 
 
 class EmotionFeedback(BaseModel):
@@ -136,5 +143,5 @@ class EmotionStatistics(BaseModel):
     emotion_frequency: Dict[str, int] = Field(..., description="情绪频率统计")
     quality_distribution: Dict[str, int] = Field(..., description="质量分布")
     model_performance: Dict[str, float] = Field(..., description="模型性能指标")
-    processing_time_stats: Dict[str, float] = Field(..., description="处理时间统计")
+    processing_time_stats: Dict[str, float] = Field(..., description="处理时间统计(min/max/average/p50/p95)")
     error_rate: float = Field(..., ge=0.0, le=1.0, description="错误率")
\ No newline at end of file
@@ -0,0 +1,53 @@
+from pydantic import BaseModel, Field
+from typing import List, Optional, Dict, Any
+from datetime import datetime
+
+
+class JobObjectSubmitRequest(BaseModel):
+    """按对象存储键提交批量任务请求"""
+    job_type: str = Field(..., pattern="^(emotion|recognition)$", description="任务类型(emotion/recognition)")
+    object_keys: List[str] = Field(..., min_length=1, description="音频对象存储键列表")
+    employee_id: Optional[int] = Field(None, description="员工ID")
+    meeting_id: Optional[int] = Field(None, description="会议ID")
+
+
+class JobSubmitResponse(BaseModel):
+    """批量任务提交响应"""
+    success: bool = Field(True, description="操作是否成功")
+    job_id: str = Field(..., description="任务ID")
+    job_type: str = Field(..., description="任务类型")
+    total_items: int = Field(..., description="音频片段总数")
+    message: str = Field(..., description="响应消息")
+
+
+class JobStatusResponse(BaseModel):
+    """批量任务状态响应"""
+    job_id: str = Field(..., description="任务ID")
+    job_type: str = Field(..., description="任务类型")
+    status: str = Field(..., description="任务状态")
+    total_items: int = Field(..., description="音频片段总数")
+    completed_items: int = Field(..., description="已完成数量")
+    failed_items: int = Field(..., description="失败数量")
+    progress: float = Field(..., ge=0, le=1, description="处理进度")
+    error_message: Optional[str] = Field(None, description="错误信息")
+    created_at: Optional[datetime] = Field(None, description="创建时间")
+    started_at: Optional[datetime] = Field(None, description="开始处理时间")
+    finished_at: Optional[datetime] = Field(None, description="完成时间")
+
+
+class JobItemResult(BaseModel):
+    """批量任务条目结果"""
+    item_index: int = Field(..., description="条目序号")
+    filename: Optional[str] = Field(None, description="原始文件名")
+    object_key: str = Field(..., description="音频对象存储键")
+    status: str = Field(..., description="条目状态")
+    result: Optional[Dict[str, Any]] = Field(None, description="识别结果")
+    error_message: Optional[str] = Field(None, description="错误信息")
+
+
+class JobResultsResponse(BaseModel):
+    """批量任务结果响应"""
+    job_id: str = Field(..., description="任务ID")
+    status: str = Field(..., description="任务状态")
+    results: List[JobItemResult] = Field(..., description="条目结果列表")
+    total_count: int = Field(..., description="条目总数")
@@ -0,0 +1,52 @@
+from pydantic import BaseModel, Field
+from typing import List, Optional
+from datetime import datetime
+
+
+class RecordingUploadRequest(BaseModel):
+    """会议录音上传申请"""
+    filename: str = Field(..., max_length=255, description="文件名")
+    file_size: int = Field(..., gt=0, description="文件大小（字节）")
+    content_type: str = Field("audio/wav", description="文件类型")
+
+
+class RecordingUploadPart(BaseModel):
+    """分片上传地址"""
+    part_number: int = Field(..., ge=1, description="分片序号（从1开始）")
+    url: str = Field(..., description="分片预签名PUT地址")
+
+
+class RecordingUploadResponse(BaseModel):
+    """会议录音上传地址响应"""
+    recording_id: str = Field(..., description="录音ID")
+    object_key: str = Field(..., description="对象存储键")
+    upload_type: str = Field(..., description="上传方式(single/multipart)")
+    upload_url: Optional[str] = Field(None, description="单次上传的预签名PUT地址")
+    upload_id: Optional[str] = Field(None, description="分片上传ID")
+    part_size: Optional[int] = Field(None, description="分片大小（字节），最后一片可以更小")
+    parts: List[RecordingUploadPart] = Field(default=[], description="分片上传地址列表")
+    expires_in: int = Field(..., description="地址有效期（秒）")
+
+
+class RecordingCompletePart(BaseModel):
+    """已上传分片"""
+    part_number: int = Field(..., ge=1, description="分片序号")
+    etag: str = Field(..., description="上传分片后返回的ETag")
+
+
+class RecordingCompleteRequest(BaseModel):
+    """录音上传完成回调"""
+    parts: List[RecordingCompletePart] = Field(default=[], description="分片列表（分片上传时必填）")
+
+
+class RecordingStatusResponse(BaseModel):
+    """会议录音状态响应"""
+    recording_id: str = Field(..., description="录音ID")
+    meeting_id: int = Field(..., description="会议ID")
+    status: str = Field(..., description="录音状态")
+    file_size: int = Field(..., description="文件大小（字节）")
+    job_id: Optional[str] = Field(None, description="处理任务ID")
+    duration: Optional[float] = Field(None, description="录音时长（秒）")
+    error_message: Optional[str] = Field(None, description="错误信息")
+    created_at: Optional[datetime] = Field(None, description="创建时间")
+    uploaded_at: Optional[datetime] = Field(None, description="上传完成时间")
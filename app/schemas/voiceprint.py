@@ -22,7 +22,7 @@ class VoiceprintMatch(BaseModel):
     employee_id: Optional[int] = Field(None, description="匹配的员工ID")
     confidence: float = Field(..., ge=0, le=1, description="匹配置信度")
     threshold: float = Field(..., description="匹配阈值")
-    audio_url: str = Field(..., description="音频文件URL")
+    audio_url: Optional[str] = Field(None, description="音频文件URL（按存储策略可能未保存）")
     all_matches: List[Dict[str, Any]] = Field(default=[], description="所有匹配结果")
     processing_time: float = Field(default=0, description="处理耗时(毫秒)")
 
@@ -52,7 +52,7 @@ class VoiceprintRecognizeResponse(BaseModel):
     confidence: float = Field(..., ge=0, le=1, description="匹配置信度")
     threshold: float = Field(..., description="匹配阈值")
     identified_employee: Optional[Dict[str, Any]] = Field(None, description="识别的员工信息")
-    audio_url: str = Field(..., description="音频文件URL")
+    audio_url: Optional[str] = Field(None, description="音频文件URL（按存储策略可能未保存）")
     processing_time: float = Field(..., description="处理耗时(毫秒)")
     all_matches: List[Dict[str, Any]] = Field(default=[], description="所有匹配结果")
 
@@ -0,0 +1,136 @@
+"""
+内容寻址的音频对象存储
+对象名由原始音频的SHA-256生成：{prefix}/{hash[0:2]}/{hash}.{ext}
+- 相同音频（客户端重试、重复片段）只上传一次，其余只增加引用计数
+- 引用计数归零时才删除对象，删除一个声纹不会影响引用同一音频的其他记录
+audio_objects 表即存在性检查，不需要额外访问对象存储。
+释放最后一个引用时在行锁内删除对象和记录，后台上传持有同一行的共享锁，
+因此并发的保存、上传与删除不会留下没有记录的对象或没有对象的记录。
+"""
+
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Optional
+
+from loguru import logger
+from sqlalchemy import delete, select, update
+from sqlalchemy.exc import IntegrityError
+
+from app.core.config import settings
+from app.core.metrics import metrics
+from app.core.storage import storage
+from app.core.storage_writer import storage_writer
+from app.models.audio_object import AudioObjectModel
+from app.models.database import AsyncSessionLocal
+from app.utils.audio_codec import codec_extension
+from app.utils.hashing import audio_digest
+
+
+class AudioObjectService:
+    """音频对象引用计数服务"""
+
+    def object_key(self, prefix: str, content_hash: str, codec: str) -> str:
+        return f"{prefix}/{content_hash[:2]}/{content_hash}.{codec_extension(codec)}"
+
+    async def store(self, audio_data: bytes, prefix: str, codec: Optional[str] = None) -> str:
+        """保存音频并返回对象URL；相同内容已存在时只增加引用计数"""
+        codec = codec or settings.ARCHIVE_CODEC_CLIPS
+        content_hash = audio_digest(audio_data)
+        object_key = self.object_key(prefix, content_hash, codec)
+
+        if await self._acquire(object_key, content_hash, codec, len(audio_data)):
+            await storage_writer.submit(object_key, audio_data, content_type="audio/wav", codec=codec)
+            metrics.incr("audio_objects.stored")
+        else:
+            metrics.incr("audio_objects.deduplicated")
+            metrics.incr("audio_objects.deduplicated_bytes", len(audio_data))
+        return storage.object_url(object_key)
+
+    async def _acquire(self, object_key: str, content_hash: str, codec: str, size: int) -> bool:
+        """增加引用计数；对象为新建时返回True（需要上传）"""
+        async with AsyncSessionLocal() as db:
+            for _ in range(2):
+                result = await db.execute(
+                    update(AudioObjectModel)
+                    .where(AudioObjectModel.object_key == object_key)
+                    .values(ref_count=AudioObjectModel.ref_count + 1)
+                )
+                if result.rowcount:
+                    await db.commit()
+                    return False
+
+                db.add(AudioObjectModel(
+                    object_key=object_key,
+                    content_hash=content_hash,
+                    codec=codec,
+                    original_size=size,
+                    ref_count=1
+                ))
+                try:
+                    await db.commit()
+                    return True
+                except IntegrityError:
+                    # 并发请求先插入了同一对象，回滚后按已存在处理
+                    await db.rollback()
+        raise RuntimeError(f"Failed to acquire audio object {object_key}")
+
+    async def release_url(self, url: Optional[str]) -> bool:
+        """按对象URL释放引用，返回对象是否被删除"""
+        object_key = storage.object_name_from_url(url) if url else None
+        if not object_key:
+            return False
+        return await self.release(object_key)
+
+    async def release(self, object_key: str) -> bool:
+        """减少引用计数，归零时删除对象；返回对象是否被删除"""
+        async with AsyncSessionLocal() as db:
+            ref_count = (await db.execute(
+                select(AudioObjectModel.ref_count)
+                .where(AudioObjectModel.object_key == object_key)
+                .with_for_update()
+            )).scalar()
+            if ref_count is None:
+                await db.commit()
+                # 内容寻址之前保存的对象没有引用记录，按独占对象直接删除
+                await self._remove_object(object_key)
+                return True
+
+            if ref_count > 1:
+                await db.execute(
+                    update(AudioObjectModel)
+                    .where(AudioObjectModel.object_key == object_key)
+                    .values(ref_count=AudioObjectModel.ref_count - 1)
+                )
+                await db.commit()
+                return False
+
+            # 最后一个引用：持有行锁删除对象再删除记录。
+            # 并发的store等锁释放后发现记录不存在，会重新创建记录并上传；
+            # 正在进行的后台上传持有共享锁，删除要等它完成后才开始
+            await self._remove_object(object_key)
+            await db.execute(delete(AudioObjectModel).where(AudioObjectModel.object_key == object_key))
+            await db.commit()
+        return True
+
+    @asynccontextmanager
+    async def upload_guard(self, object_key: str) -> AsyncIterator[bool]:
+        """后台上传期间持有引用记录的共享锁；记录已被释放时返回False，跳过上传"""
+        async with AsyncSessionLocal() as db:
+            ref_count = (await db.execute(
+                select(AudioObjectModel.ref_count)
+                .where(AudioObjectModel.object_key == object_key)
+                .with_for_update(read=True)
+            )).scalar()
+            yield ref_count is not None and ref_count > 0
+            await db.commit()
+
+    async def _remove_object(self, object_key: str):
+        try:
+            await storage.remove(object_key)
+            metrics.incr("audio_objects.removed")
+        except Exception as e:
+            logger.warning(f"Failed to delete audio object {object_key}: {e}")
+
+
+# 创建全局服务实例
+audio_object_service = AudioObjectService()
+storage_writer.set_upload_guard(audio_object_service.upload_guard)
@@ -0,0 +1,169 @@
+"""
+音频保留期清理
+识别日志和情绪检测记录各自持有一个音频对象引用，批量任务的片段直接保存在 jobs/{job_id}/ 下。
+超过保留期后清空记录中的音频URL并释放引用（记录本身保留用于统计），
+已结束的批量任务连同条目和片段一起删除，避免对象存储只增不减。
+"""
+
+import asyncio
+from datetime import datetime, timedelta
+from typing import List, Optional
+
+from loguru import logger
+from sqlalchemy import delete, select, update
+
+from app.core.config import settings
+from app.core.metrics import metrics
+from app.core.storage import storage
+from app.models.database import AsyncSessionLocal
+from app.models.emotion import EmotionDetectionModel
+from app.models.job import InferenceJobModel, InferenceJobItemModel
+from app.models.meeting import SpeechRecordModel
+from app.models.voiceprint import RecognitionLogModel
+from app.services.audio_object_service import audio_object_service
+from app.services.job_service import JOB_TYPE_EMOTION, JOB_TYPE_RECOGNITION, TERMINAL_STATUSES
+
+
+class AudioRetentionService:
+    """过期音频清理"""
+
+    def __init__(self, retention_days: int, interval: float, batch_size: int):
+        self.retention_days = retention_days
+        self.interval = interval
+        self.batch_size = max(1, batch_size)
+        self._task: Optional[asyncio.Task] = None
+
+    async def purge(self) -> int:
+        """清理一轮过期音频，返回释放的引用和删除的片段数量"""
+        if self.retention_days <= 0:
+            return 0
+        cutoff = datetime.utcnow() - timedelta(days=self.retention_days)
+        released = 0
+        while True:
+            count = await self._purge_recognition_logs(cutoff)
+            released += count
+            if count < self.batch_size:
+                break
+        while True:
+            count = await self._purge_emotion_detections(cutoff)
+            released += count
+            if count < self.batch_size:
+                break
+        removed = await self._purge_jobs(cutoff)
+
+        if released or removed:
+            metrics.incr("audio_retention.released", released)
+            metrics.incr("audio_retention.job_clips_removed", removed)
+            logger.info(f"Audio retention released {released} references and removed {removed} job clips")
+        return released + removed
+
+    async def _purge_recognition_logs(self, cutoff: datetime) -> int:
+        async with AsyncSessionLocal() as db:
+            rows = (await db.execute(
+                select(RecognitionLogModel.log_id, RecognitionLogModel.audio_url)
+                .where(RecognitionLogModel.created_at < cutoff, RecognitionLogModel.audio_url.isnot(None))
+                .order_by(RecognitionLogModel.log_id)
+                .limit(self.batch_size)
+            )).all()
+            if not rows:
+                return 0
+            urls = [row.audio_url for row in rows]
+            await db.execute(
+                update(RecognitionLogModel)
+                .where(RecognitionLogModel.log_id.in_([row.log_id for row in rows]))
+                .values(audio_url=None)
+            )
+            # 发言记录与识别日志共用同一段音频，本身不持有引用
+            await db.execute(
+                update(SpeechRecordModel)
+                .where(SpeechRecordModel.created_at < cutoff, SpeechRecordModel.audio_url.in_(set(urls)))
+                .values(audio_url=None)
+            )
+            await db.commit()
+        await self._release(urls)
+        return len(rows)
+
+    async def _purge_emotion_detections(self, cutoff: datetime) -> int:
+        async with AsyncSessionLocal() as db:
+            rows = (await db.execute(
+                select(EmotionDetectionModel.id, EmotionDetectionModel.audio_url)
+                .where(EmotionDetectionModel.created_at < cutoff, EmotionDetectionModel.audio_url.isnot(None))
+                .order_by(EmotionDetectionModel.id)
+                .limit(self.batch_size)
+            )).all()
+            if not rows:
+                return 0
+            await db.execute(
+                update(EmotionDetectionModel)
+                .where(EmotionDetectionModel.id.in_([row.id for row in rows]))
+                .values(audio_url=None)
+            )
+            await db.commit()
+        await self._release([row.audio_url for row in rows])
+        return len(rows)
+
+    async def _purge_jobs(self, cutoff: datetime) -> int:
+        """删除已结束的上传片段任务（录音任务的对象属于会议录音，不在此删除）"""
+        async with AsyncSessionLocal() as db:
+            job_ids = list((await db.execute(
+                select(InferenceJobModel.job_id)
+                .where(
+                    InferenceJobModel.job_type.in_((JOB_TYPE_EMOTION, JOB_TYPE_RECOGNITION)),
+                    InferenceJobModel.status.in_(TERMINAL_STATUSES),
+                    InferenceJobModel.finished_at < cutoff
+                )
+                .limit(self.batch_size)
+            )).scalars().all())
+            if not job_ids:
+                return 0
+            keys = (await db.execute(
+                select(InferenceJobItemModel.job_id, InferenceJobItemModel.object_key)
+                .where(InferenceJobItemModel.job_id.in_(job_ids))
+            )).all()
+
+        # 只删除该任务上传的片段；按对象键提交的任务引用的是其他任务或录音的对象
+        clip_keys = [row.object_key for row in keys if row.object_key.startswith(f"jobs/{row.job_id}/")]
+        failed = set(await storage.remove_many(clip_keys)) if clip_keys else set()
+        if failed:
+            logger.warning(f"Failed to remove {len(failed)} job clips, will retry on next purge")
+            job_ids = [job_id for job_id in job_ids if not any(key.startswith(f"jobs/{job_id}/") for key in failed)]
+
+        if job_ids:
+            async with AsyncSessionLocal() as db:
+                await db.execute(delete(InferenceJobItemModel).where(InferenceJobItemModel.job_id.in_(job_ids)))
+                await db.execute(delete(InferenceJobModel).where(InferenceJobModel.job_id.in_(job_ids)))
+                await db.commit()
+        return len(clip_keys) - len(failed)
+
+    async def _release(self, urls: List[str]):
+        for url in urls:
+            try:
+                await audio_object_service.release_url(url)
+            except Exception as e:
+                logger.warning(f"Failed to release audio object {url}: {e}")
+
+    async def start(self):
+        if self._task is None and self.retention_days > 0 and self.interval > 0:
+            self._task = asyncio.create_task(self._purge_loop(), name="audio-retention")
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    async def _purge_loop(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await self.purge()
+            except Exception as e:
+                logger.error(f"Audio retention purge failed: {e}")
+
+
+# 创建全局服务实例
+audio_retention_service = AudioRetentionService(
+    retention_days=settings.AUDIO_RETENTION_DAYS,
+    interval=settings.AUDIO_RETENTION_INTERVAL,
+    batch_size=settings.AUDIO_RETENTION_BATCH_SIZE
+)
@@ -0,0 +1,416 @@
+"""
+情绪检测增量汇总
+按高水位（已汇总的最大 emotion_detections.id）只处理新增记录，
+把每批新记录在SQL端按 日期×主要情绪 聚合后合并进 emotion_summaries 的日/周/月汇总。
+汇总行中保存可合并的中间状态（各项求和、处理时间直方图），
+统计接口读取汇总行，再加上水位之后尚未汇总的少量记录，不再扫描原始检测表。
+"""
+
+import asyncio
+from dataclasses import dataclass, field
+from datetime import date, datetime, timedelta
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from loguru import logger
+from sqlalchemy import and_, case, func, select
+from sqlalchemy.exc import IntegrityError
+
+from app.core.config import settings
+from app.core.metrics import metrics
+from app.models.database import AsyncSessionLocal
+from app.models.emotion import (
+    EmotionDailyEmployeeModel, EmotionDetectionModel, EmotionSummaryModel, RollupWatermarkModel
+)
+from app.utils.histogram import PROCESSING_TIME_BUCKETS, approx_percentile, cumulative_bucket_columns
+
+WATERMARK_NAME = "emotion_summaries"
+SUMMARY_TYPES = ("daily", "weekly", "monthly")
+
+
+@dataclass
+class EmotionAggregate:
+    """可合并的情绪统计中间状态"""
+    total: int = 0
+    successful: int = 0
+    emotion_counts: Dict[str, int] = field(default_factory=dict)
+    confidence_sum: float = 0.0
+    intensity_sum: float = 0.0
+    complexity_sum: float = 0.0
+    quality: Dict[str, int] = field(default_factory=lambda: {"high": 0, "medium": 0, "low": 0})
+    time_sum: float = 0.0
+    time_min: Optional[float] = None
+    time_max: Optional[float] = None
+    time_buckets: List[int] = field(default_factory=lambda: [0] * len(PROCESSING_TIME_BUCKETS))
+
+    def merge(self, other: "EmotionAggregate"):
+        self.total += other.total
+        self.successful += other.successful
+        for emotion, count in other.emotion_counts.items():
+            self.emotion_counts[emotion] = self.emotion_counts.get(emotion, 0) + count
+        self.confidence_sum += other.confidence_sum
+        self.intensity_sum += other.intensity_sum
+        self.complexity_sum += other.complexity_sum
+        for level, count in other.quality.items():
+            self.quality[level] = self.quality.get(level, 0) + count
+        self.time_sum += other.time_sum
+        if other.time_min is not None:
+            self.time_min = other.time_min if self.time_min is None else min(self.time_min, other.time_min)
+        if other.time_max is not None:
+            self.time_max = other.time_max if self.time_max is None else max(self.time_max, other.time_max)
+        self.time_buckets = [a + b for a, b in zip(self.time_buckets, other.time_buckets)]
+
+    def average(self, value: float) -> float:
+        return value / self.total if self.total else 0.0
+
+    def percentile(self, q: float) -> float:
+        return approx_percentile(q, PROCESSING_TIME_BUCKETS, self.time_buckets, self.total, self.time_min, self.time_max)
+
+    def model_performance(self) -> Dict[str, float]:
+        return {
+            "average_confidence": self.average(self.confidence_sum),
+            "average_processing_time": self.average(self.time_sum),
+            "success_rate": self.average(self.successful),
+            "error_rate": self.average(self.total - self.successful),
+        }
+
+    def processing_time_stats(self) -> Dict[str, float]:
+        return {
+            "min": float(self.time_min or 0.0),
+            "max": float(self.time_max or 0.0),
+            "average": self.average(self.time_sum),
+            "p50": self.percentile(0.5),
+            "p95": self.percentile(0.95),
+        }
+
+    def to_state(self) -> Dict:
+        """汇总行中保存的中间状态"""
+        return {
+            "confidence_sum": self.confidence_sum,
+            "intensity_sum": self.intensity_sum,
+            "complexity_sum": self.complexity_sum,
+            "time_sum": self.time_sum,
+            "time_min": self.time_min,
+            "time_max": self.time_max,
+            "time_buckets": self.time_buckets,
+        }
+
+    @classmethod
+    def from_summary(cls, summary: EmotionSummaryModel) -> "EmotionAggregate":
+        state = (summary.model_performance or {}).get("state") or {}
+        total = summary.total_detections or 0
+        aggregate = cls(
+            total=total,
+            successful=summary.successful_detections or 0,
+            emotion_counts=dict(summary.emotion_distribution or {}),
+            confidence_sum=state.get("confidence_sum", (summary.average_confidence or 0.0) * total),
+            intensity_sum=state.get("intensity_sum", (summary.average_intensity or 0.0) * total),
+            complexity_sum=state.get("complexity_sum", (summary.average_complexity or 0.0) * total),
+            quality={"high": 0, "medium": 0, "low": 0, **(summary.quality_distribution or {})},
+            time_sum=state.get("time_sum", 0.0),
+            time_min=state.get("time_min"),
+            time_max=state.get("time_max"),
+        )
+        buckets = state.get("time_buckets")
+        if buckets and len(buckets) == len(PROCESSING_TIME_BUCKETS):
+            aggregate.time_buckets = list(buckets)
+        return aggregate
+
+    def apply_to(self, summary: EmotionSummaryModel):
+        summary.total_detections = self.total
+        summary.successful_detections = self.successful
+        summary.emotion_distribution = dict(self.emotion_counts)
+        summary.average_confidence = self.average(self.confidence_sum)
+        summary.average_intensity = self.average(self.intensity_sum)
+        summary.average_complexity = self.average(self.complexity_sum)
+        summary.quality_distribution = dict(self.quality)
+        summary.model_performance = {
+            **self.model_performance(),
+            "p50_processing_time": self.percentile(0.5),
+            "p95_processing_time": self.percentile(0.95),
+            "state": self.to_state(),
+        }
+
+
+def period_key(summary_type: str, day: date) -> str:
+    """汇总周期键：日为日期，周为周一日期，月为YYYY-MM"""
+    if summary_type == "daily":
+        return day.isoformat()
+    if summary_type == "weekly":
+        return (day - timedelta(days=day.weekday())).isoformat()
+    return day.strftime("%Y-%m")
+
+
+def period_range(summary_type: str, key: str) -> Tuple[datetime, datetime]:
+    """汇总周期对应的时间范围 [start, end)"""
+    if summary_type == "monthly":
+        start = datetime.strptime(key, "%Y-%m")
+        end = (start.replace(day=28) + timedelta(days=4)).replace(day=1)
+        return start, end
+    start = datetime.strptime(key, "%Y-%m-%d")
+    return start, start + timedelta(days=7 if summary_type == "weekly" else 1)
+
+
+def _to_date(value) -> date:
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    return date.fromisoformat(str(value)[:10])
+
+
+async def aggregate_by_day(db, conditions: Iterable) -> Dict[date, EmotionAggregate]:
+    """在SQL端按 日期×主要情绪 聚合满足条件的检测记录"""
+    detection = EmotionDetectionModel
+    quality = detection.audio_quality_score
+    processing_time = detection.processing_time
+    day = func.date(detection.created_at).label("day")
+    query = select(
+        day,
+        detection.dominant_emotion,
+        func.count(detection.id).label("total"),
+        func.sum(case((detection.is_success == True, 1), else_=0)).label("successful"),
+        func.sum(detection.confidence_score).label("confidence_sum"),
+        func.sum(detection.intensity).label("intensity_sum"),
+        func.sum(detection.complexity).label("complexity_sum"),
+        func.sum(case((quality >= 0.8, 1), else_=0)).label("quality_high"),
+        func.sum(case((and_(quality >= 0.5, quality < 0.8), 1), else_=0)).label("quality_medium"),
+        func.sum(case((quality < 0.5, 1), else_=0)).label("quality_low"),
+        func.sum(processing_time).label("time_sum"),
+        func.min(processing_time).label("time_min"),
+        func.max(processing_time).label("time_max"),
+        *cumulative_bucket_columns(processing_time, PROCESSING_TIME_BUCKETS, "time_le")
+    ).where(and_(*conditions)).group_by(day, detection.dominant_emotion)
+
+    result: Dict[date, EmotionAggregate] = {}
+    for row in await db.execute(query):
+        aggregate = EmotionAggregate(
+            total=row.total,
+            successful=int(row.successful or 0),
+            emotion_counts={row.dominant_emotion: row.total},
+            confidence_sum=float(row.confidence_sum or 0.0),
+            intensity_sum=float(row.intensity_sum or 0.0),
+            complexity_sum=float(row.complexity_sum or 0.0),
+            quality={
+                "high": int(row.quality_high or 0),
+                "medium": int(row.quality_medium or 0),
+                "low": int(row.quality_low or 0),
+            },
+            time_sum=float(row.time_sum or 0.0),
+            time_min=row.time_min,
+            time_max=row.time_max,
+            time_buckets=[int(getattr(row, f"time_le_{i}") or 0) for i in range(len(PROCESSING_TIME_BUCKETS))],
+        )
+        result.setdefault(_to_date(row.day), EmotionAggregate()).merge(aggregate)
+    return result
+
+
+class EmotionRollupService:
+    """情绪汇总引擎"""
+
+    def __init__(self, interval: float, batch_size: int, settle_seconds: float):
+        self.interval = interval
+        self.batch_size = max(1, batch_size)
+        self.settle_seconds = settle_seconds
+        self._task: Optional[asyncio.Task] = None
+
+    async def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run_loop(), name="emotion-rollup")
+            logger.info("Emotion rollup started")
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    async def _run_loop(self):
+        while True:
+            try:
+                # 积压较多时连续处理，直到追上水位
+                while await self.run_once() >= self.batch_size:
+                    pass
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Emotion rollup failed: {e}")
+            await asyncio.sleep(self.interval)
+
+    async def get_watermark(self) -> int:
+        async with AsyncSessionLocal() as db:
+            watermark = await db.get(RollupWatermarkModel, WATERMARK_NAME)
+            return watermark.last_id if watermark else 0
+
+    async def _lock_watermark(self, db) -> RollupWatermarkModel:
+        """锁定水位行，保证多个工作进程不会重复汇总同一批记录"""
+        for _ in range(2):
+            result = await db.execute(
+                select(RollupWatermarkModel)
+                .where(RollupWatermarkModel.name == WATERMARK_NAME)
+                .with_for_update()
+            )
+            watermark = result.scalar_one_or_none()
+            if watermark is not None:
+                return watermark
+            db.add(RollupWatermarkModel(name=WATERMARK_NAME, last_id=0))
+            try:
+                await db.commit()
+            except IntegrityError:
+                await db.rollback()
+        raise RuntimeError("Failed to initialize rollup watermark")
+
+    async def _next_upper_id(self, db, last_id: int) -> Optional[int]:
+        """本批次处理到的最大ID：最多batch_size条，并且不越过尚未稳定的最新记录"""
+        detection = EmotionDetectionModel
+        cutoff = datetime.now() - timedelta(seconds=self.settle_seconds)
+        first_recent = (await db.execute(
+            select(func.min(detection.id)).where(detection.id > last_id, detection.created_at > cutoff)
+        )).scalar()
+
+        candidates = select(detection.id).where(detection.id > last_id)
+        if first_recent is not None:
+            candidates = candidates.where(detection.id < first_recent)
+        candidates = candidates.order_by(detection.id).limit(self.batch_size).subquery()
+        return (await db.execute(select(func.max(candidates.c.id)))).scalar()
+
+    async def run_once(self) -> int:
+        """汇总一批新记录，返回处理的记录数"""
+        async with AsyncSessionLocal() as db:
+            watermark = await self._lock_watermark(db)
+            last_id = watermark.last_id
+            upper_id = await self._next_upper_id(db, last_id)
+            if upper_id is None:
+                await db.commit()
+                return 0
+
+            detection = EmotionDetectionModel
+            by_day = await aggregate_by_day(db, [detection.id > last_id, detection.id <= upper_id])
+
+            new_days = await self._record_daily_employees(db, last_id, upper_id)
+
+            # 合并到日/周/月汇总
+            updates: Dict[Tuple[str, str], EmotionAggregate] = {}
+            for day, aggregate in by_day.items():
+                for summary_type in SUMMARY_TYPES:
+                    key = (summary_type, period_key(summary_type, day))
+                    updates.setdefault(key, EmotionAggregate()).merge(aggregate)
+
+            processed = 0
+            for (summary_type, summary_date), delta in updates.items():
+                result = await db.execute(
+                    select(EmotionSummaryModel).where(
+                        EmotionSummaryModel.summary_type == summary_type,
+                        EmotionSummaryModel.summary_date == summary_date
+                    )
+                )
+                summary = result.scalar_one_or_none()
+                if summary is None:
+                    summary = EmotionSummaryModel(summary_type=summary_type, summary_date=summary_date)
+                    db.add(summary)
+                    merged = EmotionAggregate()
+                else:
+                    merged = EmotionAggregate.from_summary(summary)
+                merged.merge(delta)
+                merged.apply_to(summary)
+                # 只有周期内出现了新的(日期, 员工)组合时才需要重新计数
+                if any(period_key(summary_type, day) == summary_date for day in new_days):
+                    summary.employee_count = await self._employee_count(db, summary_type, summary_date)
+                elif summary.employee_count is None:
+                    summary.employee_count = 0
+                if summary_type == "daily":
+                    processed += delta.total
+
+            watermark.last_id = upper_id
+            await db.commit()
+
+        metrics.incr("emotion_rollup.rows", processed)
+        logger.debug(f"Emotion rollup advanced watermark {last_id} -> {upper_id} ({processed} rows)")
+        return processed
+
+    async def _record_daily_employees(self, db, last_id: int, upper_id: int) -> List[date]:
+        """把本批次的 (日期, 员工) 组合写入每日员工表，返回出现新组合的日期"""
+        detection = EmotionDetectionModel
+        day = func.date(detection.created_at)
+        result = await db.execute(
+            select(day, detection.employee_id)
+            .where(detection.id > last_id, detection.id <= upper_id, detection.employee_id.isnot(None))
+            .distinct()
+        )
+        pairs = {(_to_date(row_day).isoformat(), employee_id) for row_day, employee_id in result}
+        if not pairs:
+            return []
+
+        # 水位行已加锁，同一时刻只有一个进程写入，先查已有组合再补齐即可
+        daily = EmotionDailyEmployeeModel
+        existing = await db.execute(
+            select(daily.summary_date, daily.employee_id).where(
+                daily.summary_date.in_({summary_date for summary_date, _ in pairs}),
+                daily.employee_id.in_({employee_id for _, employee_id in pairs})
+            )
+        )
+        new_pairs = pairs - {tuple(row) for row in existing}
+        db.add_all([
+            daily(summary_date=summary_date, employee_id=employee_id)
+            for summary_date, employee_id in new_pairs
+        ])
+        await db.flush()
+        return [_to_date(summary_date) for summary_date in {summary_date for summary_date, _ in new_pairs}]
+
+    async def _employee_count(self, db, summary_type: str, summary_date: str) -> int:
+        """去重员工数不可增量合并，按周期从每日员工表重新计数（每天最多员工数行，不扫描检测表）"""
+        start, end = period_range(summary_type, summary_date)
+        daily = EmotionDailyEmployeeModel
+        result = await db.execute(
+            select(func.count(func.distinct(daily.employee_id)))
+            .where(daily.summary_date >= start.date().isoformat(), daily.summary_date < end.date().isoformat())
+        )
+        return result.scalar() or 0
+
+    async def get_summaries(
+        self,
+        summary_type: str,
+        start_date: Optional[str] = None,
+        end_date: Optional[str] = None
+    ) -> List[EmotionSummaryModel]:
+        """读取汇总行（按周期升序）"""
+        async with AsyncSessionLocal() as db:
+            query = select(EmotionSummaryModel).where(EmotionSummaryModel.summary_type == summary_type)
+            if start_date:
+                query = query.where(EmotionSummaryModel.summary_date >= period_key(summary_type, _to_date(start_date)))
+            if end_date:
+                query = query.where(EmotionSummaryModel.summary_date <= period_key(summary_type, _to_date(end_date)))
+            result = await db.execute(query.order_by(EmotionSummaryModel.summary_date))
+            return list(result.scalars().all())
+
+    async def aggregate_range(self, start: Optional[date], end: Optional[date]) -> EmotionAggregate:
+        """统计 [start, end] 日期范围内的全部检测：日汇总 + 水位之后尚未汇总的记录"""
+        async with AsyncSessionLocal() as db:
+            watermark = await db.get(RollupWatermarkModel, WATERMARK_NAME)
+            last_id = watermark.last_id if watermark else 0
+
+            query = select(EmotionSummaryModel).where(EmotionSummaryModel.summary_type == "daily")
+            if start:
+                query = query.where(EmotionSummaryModel.summary_date >= start.isoformat())
+            if end:
+                query = query.where(EmotionSummaryModel.summary_date <= end.isoformat())
+            total = EmotionAggregate()
+            for summary in (await db.execute(query)).scalars():
+                total.merge(EmotionAggregate.from_summary(summary))
+
+            detection = EmotionDetectionModel
+            conditions = [detection.id > last_id]
+            if start:
+                conditions.append(detection.created_at >= datetime.combine(start, datetime.min.time()))
+            if end:
+                conditions.append(detection.created_at < datetime.combine(end + timedelta(days=1), datetime.min.time()))
+            for aggregate in (await aggregate_by_day(db, conditions)).values():
+                total.merge(aggregate)
+            return total
+
+
+# 创建全局服务实例
+emotion_rollup_service = EmotionRollupService(
+    interval=settings.EMOTION_ROLLUP_INTERVAL,
+    batch_size=settings.EMOTION_ROLLUP_BATCH_SIZE,
+    settle_seconds=settings.EMOTION_ROLLUP_SETTLE_SECONDS
+)
@@ -2,18 +2,22 @@ import librosa
 import numpy as np
 import torch
 import torchaudio
-import soundfile as sf
 from speechbrain.inference.classifiers import EncoderClassifier
 from typing import List, Dict, Tuple, Optional
-import asyncio
-import io
-import tempfile
 import os
 from loguru import logger
 
 from app.core.config import settings
-from app.core.minio_client import minio_client
-from app.schemas.emotion import EmotionFeature, EmotionResult
+from app.services.audio_object_service import audio_object_service
+from app.core.concurrency import inference_limiter, run_inference, PRIORITY_INTERACTIVE, PRIORITY_BULK
+from app.core.deadline import Deadline, checkpoint
+from app.core.exceptions import RequestAbortedError
+from app.core.cache import emotion_cache
+from app.core.singleflight import emotion_flight
+from app.schemas.emotion import EmotionFeature
+from app.utils.hashing import audio_digest
+from app.utils.audio_codec import decode_pcm
+from app.services.storage_policy import storage_policy
 
 # 支持的情绪标签
 EMOTION_LABELS = {
@@ -132,78 +136,76 @@ class EmotionService:
         """检查模型状态"""
         return self._model is not None
     
-    async def detect_emotion(self, audio_data: bytes, employee_id: Optional[int] = None) -> EmotionResult:
-        """检测语音情绪"""
+    async def detect_emotion(
+        self,
+        audio_data: bytes,
+        employee_id: Optional[int] = None,
+        deadline: Optional[Deadline] = None,
+        priority: str = PRIORITY_INTERACTIVE,
+        meeting_id: Optional[int] = None,
+        store_audio: bool = True
+    ) -> EmotionFeature:
+        """检测语音情绪（先查内容哈希缓存，未命中时合并相同内容的并发请求）"""
         if not self._model:
             raise RuntimeError("Emotion recognition model not initialized")
         
+        cache_key = audio_digest(audio_data, settings.EMOTION_MODEL)
+        cached = await emotion_cache.get(cache_key) if emotion_cache is not None else None
+        if cached is not None:
+            result = EmotionFeature(**cached)
+        else:
+            shared = await emotion_flight.do(
+                cache_key,
+                lambda: self._detect_uncached(audio_data, cache_key, deadline, priority),
+                timeout=deadline.remaining() if deadline else None
+            )
+            # 合并的请求共享同一结果对象，复制后再填充本请求的音频URL
+            result = shared.model_copy()
+        
+        # 按存储策略上传音频文件（在推理槽位之外进行）
+        await checkpoint(deadline, "upload")
+        if store_audio and await storage_policy.should_store_emotion(result, meeting_id):
+            result.audio_url = await self._upload_audio(audio_data)
+        
+        logger.info(f"Emotion detection completed: {result.dominant_emotion} ({result.confidence:.2f})")
+        return result
+    
+    async def _detect_uncached(
+        self,
+        audio_data: bytes,
+        cache_key: str,
+        deadline: Optional[Deadline],
+        priority: str
+    ) -> EmotionFeature:
+        """在推理准入控制下检测情绪并写入缓存"""
+        async with inference_limiter.slot(priority, timeout=deadline.remaining() if deadline else None):
+            result = await self._run_detection(audio_data, deadline)
+        if emotion_cache is not None:
+            # 缓存只保存推理结果，音频URL每次请求单独生成
+            await emotion_cache.set(cache_key, result.model_dump(exclude={"audio_url"}))
+        return result
+    
+    async def _run_detection(self, audio_data: bytes, deadline: Optional[Deadline] = None) -> EmotionFeature:
+        """情绪检测流水线：预处理 -> 质量评估 -> 情绪识别 -> 分析"""
         try:
             # 1. 音频预处理
-            audio_tensor, sr = await self._preprocess_audio(audio_data)
+            await checkpoint(deadline, "decode")
+            audio_tensor, sr = await self._preprocess_audio(audio_data, deadline)
             
             # 2. 音频质量评估
-            quality_score = await self._assess_audio_quality(audio_tensor, sr)
+            await checkpoint(deadline, "quality")
+            quality_score = await run_inference(self._assess_audio_quality, audio_tensor, sr)
             
             if quality_score < settings.AUDIO_QUALITY_THRESHOLD:
                 raise ValueError(f"音频质量过低 ({quality_score:.2f})，无法准确识别情绪")
             
             # 3. 情绪识别
-            with torch.no_grad():
-                # 确保音频在正确的设备上
-                audio_tensor = audio_tensor.to(self._device)
-                
-                # 添加批次维度
-                if audio_tensor.dim() == 1:
-                    audio_tensor = audio_tensor.unsqueeze(0)
-                
-                # 进行情绪预测 - 使用SpeechBrain标准接口
-                try:
-                    # 保存音频到临时文件并使用classify_file
-                    with tempfile.NamedTemporaryFile(delete=False, suffix=".wav") as temp_file:
-                        # 将tensor转换为numpy数组并保存为WAV文件
-                        audio_np = audio_tensor.cpu().numpy()
-                        
-                        # 确保音频数据在合理范围内
-                        if np.max(np.abs(audio_np)) > 0:
-                            audio_np = audio_np / np.max(np.abs(audio_np))
-                        
-                        # 使用soundfile保存为标准的16位PCM WAV格式
-                        sf.write(temp_file.name, audio_np, sr, subtype='PCM_16')
-                        
-                        # 检查文件是否成功创建
-                        if not os.path.exists(temp_file.name) or os.path.getsize(temp_file.name) == 0:
-                            raise RuntimeError("临时WAV文件创建失败")
-                        
-                        # 使用SpeechBrain的classify_file方法
-                        prediction = self._model.classify_file(temp_file.name)
-                        
-                        # 清理临时文件
-                        os.unlink(temp_file.name)
-                        
-                        # 提取概率 - SpeechBrain通常返回包含probs的对象
-                        if hasattr(prediction, 'probs'):
-                            probs = prediction.probs.squeeze().cpu().numpy()
-                        elif hasattr(prediction, 'logits'):
-                            probs = torch.softmax(prediction.logits.squeeze(), dim=-1).cpu().numpy()
-                        else:
-                            # 如果以上都不行，尝试直接访问
-                            probs = prediction.squeeze().cpu().numpy() if hasattr(prediction, 'squeeze') else np.array(prediction)
-                        
-                        # 获取主要情绪和置信度
-                        dominant_index = np.argmax(probs)
-                        confidence = float(probs[dominant_index])
-                        
-                        # 映射到情绪标签
-                        if hasattr(self._model, 'label_encoder'):
-                            # 如果有标签编码器，使用它
-                            emotion_label = self._model.label_encoder.ind2lab[dominant_index]
-                        else:
-                            # 否则使用默认映射
-                            emotion_label = EMOTION_LABELS.get(dominant_index, f"emotion_{dominant_index}")
-                            
-                except Exception as e:
-                    logger.error(f"Emotion prediction failed: {e}")
-                    raise RuntimeError(f"情绪识别失败: {e}")
+            await checkpoint(deadline, "inference")
+            try:
+                probs, emotion_label, confidence = await run_inference(self._predict, audio_tensor)
+            except Exception as e:
+                logger.error(f"Emotion prediction failed: {e}")
+                raise RuntimeError(f"情绪识别失败: {e}")
             
             # 4. 处理结果 - 构建完整的情绪概率字典
             emotion_probabilities = {}
@@ -233,10 +235,7 @@ class EmotionService:
             intensity = await self._calculate_emotion_intensity(emotion_probabilities)
             complexity = await self._calculate_emotion_complexity(emotion_probabilities)
             
-            # 7. 上传音频文件
-            audio_url = await self._upload_audio(audio_data, f"emotion_{int(asyncio.get_event_loop().time())}.wav")
-            
-            # 8. 生成详细分析
+            # 7. 生成详细分析
             emotion_analysis = await self._generate_emotion_analysis(
                 emotion_probabilities, 
                 dominant_emotion, 
@@ -245,7 +244,7 @@ class EmotionService:
                 complexity
             )
             
-            result = EmotionResult(
+            return EmotionFeature(
                 dominant_emotion=dominant_emotion,
                 confidence=confidence,
                 emotion_probabilities=emotion_probabilities,
@@ -253,27 +252,65 @@ class EmotionService:
                 complexity=complexity,
                 quality_score=quality_score,
                 analysis=emotion_analysis,
-                audio_url=audio_url,
-                audio_duration=len(audio_tensor) / sr,
+                audio_duration=audio_tensor.shape[-1] / sr,
                 model_name=settings.EMOTION_MODEL,
                 processing_time=0  # 实际应该计算处理时间
             )
             
-            logger.info(f"Emotion detection completed: {dominant_emotion} ({confidence:.2f})")
-            return result
-            
         except Exception as e:
             logger.error(f"Emotion detection failed: {e}")
             raise
     
-    async def batch_detect_emotion(self, audio_files: List[bytes], employee_id: Optional[int] = None) -> List[EmotionResult]:
-        """批量检测情绪"""
+    def _predict(self, audio_tensor: torch.Tensor) -> Tuple[np.ndarray, str, float]:
+        """模型前向，返回 (概率, 主要情绪, 置信度)（在推理线程池中执行）"""
+        with torch.no_grad():
+            # 幅度归一化后直接在内存中分类，不再写临时WAV文件
+            wavs = audio_tensor.to(self._device)
+            if wavs.dim() == 1:
+                wavs = wavs.unsqueeze(0)
+            peak = wavs.abs().max()
+            if peak > 0:
+                wavs = wavs / peak
+            
+            prediction = self._model.classify_batch(wavs)
+            # classify_batch 返回 (out_prob, score, index, text_lab)
+            if isinstance(prediction, tuple):
+                prediction = prediction[0]
+            
+            # 提取概率 - SpeechBrain通常返回包含probs的对象
+            if hasattr(prediction, 'probs'):
+                probs = prediction.probs.squeeze().cpu().numpy()
+            elif hasattr(prediction, 'logits'):
+                probs = torch.softmax(prediction.logits.squeeze(), dim=-1).cpu().numpy()
+            else:
+                probs = prediction.squeeze().cpu().numpy() if hasattr(prediction, 'squeeze') else np.array(prediction)
+        
+        # 获取主要情绪和置信度
+        dominant_index = int(np.argmax(probs))
+        confidence = float(probs[dominant_index])
+        
+        # 映射到情绪标签
+        if hasattr(self._model, 'label_encoder'):
+            emotion_label = self._model.label_encoder.ind2lab[dominant_index]
+        else:
+            emotion_label = EMOTION_LABELS.get(dominant_index, f"emotion_{dominant_index}")
+        return probs, emotion_label, confidence
+    
+    async def batch_detect_emotion(
+        self,
+        audio_files: List[bytes],
+        employee_id: Optional[int] = None,
+        deadline: Optional[Deadline] = None
+    ) -> List[EmotionFeature]:
+        """批量检测情绪（以bulk优先级运行）"""
         results = []
         
         for i, audio_data in enumerate(audio_files):
             try:
-                result = await self.detect_emotion(audio_data, employee_id)
+                result = await self.detect_emotion(audio_data, employee_id, deadline, PRIORITY_BULK)
                 results.append(result)
+            except RequestAbortedError:
+                raise
             except Exception as e:
                 logger.error(f"Failed to detect emotion for audio {i}: {e}")
                 # 可以选择添加一个错误结果或者跳过
@@ -281,62 +318,32 @@ class EmotionService:
         
         return results
     
-    async def _preprocess_audio(self, audio_data: bytes) -> Tuple[torch.Tensor, int]:
+    async def _preprocess_audio(self, audio_data: bytes, deadline: Optional[Deadline] = None) -> Tuple[torch.Tensor, int]:
         """音频预处理"""
         try:
-            # 使用tempfile处理音频数据
-            with tempfile.NamedTemporaryFile(delete=False, suffix=".wav") as temp_file:
-                temp_file.write(audio_data)
-                temp_file_path = temp_file.name
+            # 在内存中解码为16kHz单声道float32
+            audio, sr = await run_inference(decode_pcm, audio_data, 16000)
+            
+            # 确保音频长度合适（至少1秒）
+            if len(audio) < sr:  # 少于1秒
+                # 填充到至少1秒
+                padded_audio = np.zeros(sr, dtype=np.float32)
+                padded_audio[:len(audio)] = audio
+                audio = padded_audio
+            
+            logger.info(f"音频加载成功: 时长={len(audio)/sr:.2f}s, 采样率={sr}")
+            
+            # 音频增强
+            await checkpoint(deadline, "enhance")
+            audio = await run_inference(self._enhance_audio, audio)
+            
+            # 转换为tensor
+            audio_tensor = torch.from_numpy(audio).float()
+            
+            logger.info(f"音频预处理完成: 时长={len(audio)/sr:.2f}s, 采样率={sr}")
+            
+            return audio_tensor, sr
             
-            try:
-                # 尝试多种方式加载音频
-                try:
-                    # 方法1: 直接使用librosa加载
-                    audio, sr = librosa.load(temp_file_path, sr=16000, mono=True)
-                except Exception as e:
-                    logger.warning(f"Librosa加载失败，尝试备用方法: {e}")
-                    
-                    # 方法2: 使用soundfile加载
-                    import soundfile as sf
-                    audio, sr = sf.read(temp_file_path)
-                    
-                    # 转换为单声道
-                    if len(audio.shape) > 1:
-                        audio = np.mean(audio, axis=1)
-                    
-                    # 重采样到16kHz
-                    if sr != 16000:
-                        from scipy import signal
-                        num_samples = int(len(audio) * 16000 / sr)
-                        audio = signal.resample(audio, num_samples)
-                        sr = 16000
-                
-                # 确保音频长度合适（至少1秒）
-                if len(audio) < sr:  # 少于1秒
-                    # 填充到至少1秒
-                    target_length = max(len(audio), sr)
-                    padded_audio = np.zeros(target_length)
-                    padded_audio[:len(audio)] = audio
-                    audio = padded_audio
-                
-                logger.info(f"音频加载成功: 时长={len(audio)/sr:.2f}s, 采样率={sr}")
-                
-                # 音频增强
-                audio = self._enhance_audio(audio)
-                
-                # 转换为tensor
-                audio_tensor = torch.from_numpy(audio).float()
-                
-                logger.info(f"音频预处理完成: 时长={len(audio)/sr:.2f}s, 采样率={sr}")
-                
-                return audio_tensor, sr
-                
-            finally:
-                # 清理临时文件
-                if os.path.exists(temp_file_path):
-                    os.unlink(temp_file_path)
-                    
         except Exception as e:
             logger.error(f"Audio preprocessing for emotion failed: {e}")
             raise
@@ -360,7 +367,7 @@ class EmotionService:
             logger.warning(f"Audio enhancement for emotion failed, using original: {e}")
             return audio
     
-    async def _assess_audio_quality(self, audio_tensor: torch.Tensor, sr: int) -> float:
+    def _assess_audio_quality(self, audio_tensor: torch.Tensor, sr: int) -> float:
         """评估音频质量（针对情绪识别）"""
         try:
             audio = audio_tensor.numpy()
@@ -591,48 +598,9 @@ class EmotionService:
             logger.error(f"Suggestion generation failed: {e}")
             return ["建议保持良好的情绪状态"]
     
-    async def _upload_audio(self, audio_data: bytes, filename: str) -> str:
-        """上传音频到MinIO"""
-        try:
-            import time
-            timestamp = int(time.time())
-            object_name = f"emotion/{timestamp}_{filename}"
-            
-            # === 调试日志开始 ===
-            logger.info(f"[DEBUG] MINIO_ENDPOINT={settings.MINIO_ENDPOINT}")
-            logger.info(f"[DEBUG] MINIO_BUCKET={settings.MINIO_BUCKET}")
-            logger.info(f"[DEBUG] MINIO_SECURE={settings.MINIO_SECURE}")
-            logger.info(f"[DEBUG] computed minio_url={settings.minio_url}")
-            # === 调试日志结束 ===
-            
-            # 检查关键配置项是否为 None
-            if settings.minio_url is None:
-                logger.error("[ERROR] settings.minio_url is None")
-                raise ValueError("MinIO URL is not configured")
-            if settings.MINIO_BUCKET is None:
-                logger.error("[ERROR] settings.MINIO_BUCKET is None")
-                raise ValueError("MinIO Bucket is not configured")
-            
-            minio_client.put_object(
-                bucket_name=settings.MINIO_BUCKET,
-                object_name=object_name,
-                data=io.BytesIO(audio_data),
-                length=len(audio_data),
-                content_type="audio/wav"
-            )
-            
-            audio_url = f"{settings.minio_url}/{settings.MINIO_BUCKET}/{object_name}"
-            # 确保 audio_url 不是 None
-            if audio_url is None:
-                logger.error("[ERROR] Generated audio_url is None")
-                raise ValueError("Generated audio_url is None")
-                
-            logger.info(f"[DEBUG] Generated audio_url={audio_url}")
-            return audio_url
-            
-        except Exception as e:
-            logger.error(f"Failed to upload emotion audio to MinIO: {e}")
-            raise
+    async def _upload_audio(self, audio_data: bytes, codec: Optional[str] = None) -> str:
+        """按内容哈希保存音频（相同音频只上传一次），立即返回对象URL"""
+        return await audio_object_service.store(audio_data, "emotion", codec)
 
 
 # 创建全局服务实例
@@ -0,0 +1,76 @@
+"""
+员工目录缓存
+识别结果需要员工姓名、部门、职位，同一会议中反复识别的是同一批人。
+按员工ID读穿缓存（本地LRU + 可选Redis，带TTL），未命中的ID合并为一次 IN 查询；
+ORM修改或删除员工时在事务提交后失效。
+"""
+
+from typing import Any, Dict, Iterable, Optional
+
+from sqlalchemy import select
+
+from app.core.cache import ResultCache, invalidate_on_commit
+from app.core.config import settings
+from app.models.database import AsyncSessionLocal
+from app.models.employee import EmployeeModel
+
+# 目录中保存的字段
+DIRECTORY_FIELDS = ("employee_id", "employee_code", "name", "department", "position", "is_active")
+
+
+class EmployeeDirectoryService:
+    """员工目录（员工ID → 基本信息）"""
+
+    def __init__(self, cache: Optional[ResultCache]):
+        self.cache = cache
+
+    async def get(self, employee_id: int) -> Optional[Dict[str, Any]]:
+        return (await self.get_many([employee_id])).get(employee_id)
+
+    async def get_many(self, employee_ids: Iterable[int]) -> Dict[int, Dict[str, Any]]:
+        """批量获取员工信息，返回 {employee_id: entry}；不存在的员工不在结果中"""
+        ids = list(dict.fromkeys(i for i in employee_ids if i is not None))
+        entries: Dict[int, Dict[str, Any]] = {}
+        if self.cache is not None and ids:
+            # 一次批量读取（Redis MGET），而不是逐个ID往返
+            cached = await self.cache.get_many([str(employee_id) for employee_id in ids])
+            entries = {employee_id: cached[str(employee_id)] for employee_id in ids if str(employee_id) in cached}
+        missing = [employee_id for employee_id in ids if employee_id not in entries]
+
+        if missing:
+            async with AsyncSessionLocal() as db:
+                result = await db.execute(
+                    select(*[getattr(EmployeeModel, name) for name in DIRECTORY_FIELDS])
+                    .where(EmployeeModel.employee_id.in_(missing))
+                )
+                rows = result.all()
+            loaded = {}
+            for row in rows:
+                entry = dict(row._mapping)
+                entries[entry["employee_id"]] = entry
+                loaded[str(entry["employee_id"])] = entry
+            if self.cache is not None:
+                await self.cache.set_many(loaded)
+        return entries
+
+    async def invalidate(self, employee_id: int):
+        if self.cache is not None:
+            await self.cache.delete(str(employee_id))
+
+
+employee_directory_service = EmployeeDirectoryService(
+    ResultCache(
+        name="employee",
+        maxsize=settings.EMPLOYEE_CACHE_MAX_ENTRIES,
+        ttl=settings.EMPLOYEE_CACHE_TTL,
+        redis_url=settings.REDIS_URL
+    ) if settings.EMPLOYEE_CACHE_ENABLED else None
+)
+
+
+# ORM修改或删除员工时失效缓存，提交后再删除一次，避免并发查询把旧行写回缓存
+invalidate_on_commit(
+    EmployeeModel,
+    employee_directory_service.cache,
+    lambda employee: str(employee.employee_id) if employee.employee_id is not None else None
+)
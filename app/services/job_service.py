@@ -0,0 +1,393 @@
+"""
+批量推理任务服务
+提交的音频片段先写入对象存储，并在 inference_jobs / inference_job_items 表中排队；
+进程内的工作协程以bulk优先级批量领取并处理条目，结果按批提交
+"""
+
+import asyncio
+import uuid
+from datetime import datetime, timedelta
+from typing import AsyncIterator, List, Optional, Tuple
+
+from loguru import logger
+from sqlalchemy import select, update, or_, and_
+
+from app.core.config import settings
+from app.core.concurrency import PRIORITY_BULK
+from app.core.exceptions import RateLimitError, ServiceBusyError
+from app.core.metrics import metrics
+from app.core.storage import storage
+from app.models.database import AsyncSessionLocal
+from app.models.emotion import EmotionDetectionModel
+from app.models.job import InferenceJobModel, InferenceJobItemModel
+from app.services.emotion_service import emotion_service
+from app.services.voiceprint_service import voiceprint_service
+from app.services.recording_service import recording_service
+from app.utils.audio_codec import decode_archive, upload_extension
+
+JOB_TYPE_EMOTION = "emotion"
+JOB_TYPE_RECOGNITION = "recognition"
+JOB_TYPE_RECORDING = "recording"
+JOB_TYPES = (JOB_TYPE_EMOTION, JOB_TYPE_RECOGNITION, JOB_TYPE_RECORDING)
+
+TERMINAL_STATUSES = ("completed", "failed")
+
+
+def clip_object_key(job_id: str, filename: Optional[str]) -> str:
+    """片段对象键只由任务ID、随机ID和白名单扩展名组成，客户端文件名只记录在条目中"""
+    return f"jobs/{job_id}/{uuid.uuid4().hex}{upload_extension(filename)}"
+
+
+class JobService:
+    """批量推理任务服务"""
+
+    async def submit_clips(
+        self,
+        job_type: str,
+        clips: AsyncIterator[Tuple[str, bytes]],
+        created_by: int,
+        employee_id: Optional[int] = None,
+        meeting_id: Optional[int] = None
+    ) -> InferenceJobModel:
+        """提交音频片段：逐个读取并上传到对象存储（同一时刻只持有一个片段），再创建任务"""
+        job_id = str(uuid.uuid4())
+        object_keys = []
+        filenames = []
+        async for filename, audio_data in clips:
+            object_key = clip_object_key(job_id, filename)
+            await storage.put(object_key, audio_data)
+            object_keys.append(object_key)
+            filenames.append(filename)
+
+        return await self._create_job(job_id, job_type, object_keys, filenames, created_by, employee_id, meeting_id)
+
+    async def submit_objects(
+        self,
+        job_type: str,
+        object_keys: List[str],
+        created_by: int,
+        employee_id: Optional[int] = None,
+        meeting_id: Optional[int] = None
+    ) -> InferenceJobModel:
+        """提交已存在于对象存储中的音频"""
+        job_id = str(uuid.uuid4())
+        filenames = [key.rsplit("/", 1)[-1] for key in object_keys]
+        return await self._create_job(job_id, job_type, object_keys, filenames, created_by, employee_id, meeting_id)
+
+    async def unowned_object_keys(self, object_keys: List[str], user_id: int) -> List[str]:
+        """返回不属于该用户的对象键：只允许提交本人任务上传的片段"""
+        keys = list(dict.fromkeys(object_keys))
+        async with AsyncSessionLocal() as db:
+            result = await db.execute(
+                select(InferenceJobItemModel.object_key)
+                .join(InferenceJobModel, InferenceJobModel.job_id == InferenceJobItemModel.job_id)
+                .where(InferenceJobItemModel.object_key.in_(keys), InferenceJobModel.created_by == user_id)
+            )
+            owned = set(result.scalars().all())
+        return [key for key in keys if key not in owned]
+
+    async def _create_job(
+        self,
+        job_id: str,
+        job_type: str,
+        object_keys: List[str],
+        filenames: List[str],
+        created_by: int,
+        employee_id: Optional[int],
+        meeting_id: Optional[int]
+    ) -> InferenceJobModel:
+        if job_type not in JOB_TYPES:
+            raise ValueError(f"Unsupported job type: {job_type}")
+
+        async with AsyncSessionLocal() as db:
+            job = InferenceJobModel(
+                job_id=job_id,
+                job_type=job_type,
+                status="pending",
+                employee_id=employee_id,
+                meeting_id=meeting_id,
+                created_by=created_by,
+                total_items=len(object_keys)
+            )
+            db.add(job)
+            db.add_all([
+                InferenceJobItemModel(
+                    job_id=job_id,
+                    item_index=index,
+                    object_key=object_key,
+                    filename=filename,
+                    status="pending"
+                )
+                for index, (object_key, filename) in enumerate(zip(object_keys, filenames))
+            ])
+            await db.commit()
+
+        metrics.incr("jobs.submitted")
+        metrics.incr("jobs.items_submitted", len(object_keys))
+        job_worker_pool.notify()
+        logger.info(f"Inference job {job_id} submitted: {job_type}, {len(object_keys)} items")
+        return job
+
+    async def get_job(self, job_id: str) -> Optional[InferenceJobModel]:
+        async with AsyncSessionLocal() as db:
+            return await db.get(InferenceJobModel, job_id)
+
+    async def get_items(self, job_id: str, offset: int = 0, limit: int = 100) -> List[InferenceJobItemModel]:
+        async with AsyncSessionLocal() as db:
+            stmt = (
+                select(InferenceJobItemModel)
+                .where(InferenceJobItemModel.job_id == job_id)
+                .order_by(InferenceJobItemModel.item_index)
+                .offset(offset)
+                .limit(limit)
+            )
+            result = await db.execute(stmt)
+            return result.scalars().all()
+
+
+class JobWorkerPool:
+    """进程内任务工作池"""
+
+    def __init__(self, workers: int, batch_size: int, poll_interval: float, lease_seconds: int):
+        self.workers = workers
+        self.batch_size = batch_size
+        self.poll_interval = poll_interval
+        self.lease_seconds = lease_seconds
+        self._tasks: List[asyncio.Task] = []
+        self._wakeup = asyncio.Event()
+
+    def notify(self):
+        """唤醒空闲的工作协程"""
+        self._wakeup.set()
+
+    async def start(self):
+        if self._tasks:
+            return
+        self._tasks = [
+            asyncio.create_task(self._worker_loop(i), name=f"job-worker-{i}")
+            for i in range(self.workers)
+        ]
+        logger.info(f"Job worker pool started with {self.workers} workers")
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        logger.info("Job worker pool stopped")
+
+    async def _worker_loop(self, worker_index: int):
+        while True:
+            try:
+                items = await self._claim_items()
+                if not items:
+                    self._wakeup.clear()
+                    try:
+                        await asyncio.wait_for(self._wakeup.wait(), timeout=self.poll_interval)
+                    except asyncio.TimeoutError:
+                        pass
+                    continue
+                await self._process_batch(items)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Job worker {worker_index} error: {e}")
+                await asyncio.sleep(self.poll_interval)
+
+    async def _claim_items(self) -> List[InferenceJobItemModel]:
+        """领取一批待处理条目（过期租约的条目会被重新领取）"""
+        now = datetime.utcnow()
+        lease_expired = now - timedelta(seconds=self.lease_seconds)
+        async with AsyncSessionLocal() as db:
+            stmt = (
+                select(InferenceJobItemModel)
+                .where(or_(
+                    InferenceJobItemModel.status == "pending",
+                    and_(
+                        InferenceJobItemModel.status == "running",
+                        InferenceJobItemModel.claimed_at < lease_expired
+                    )
+                ))
+                .order_by(InferenceJobItemModel.id)
+                .limit(self.batch_size)
+                .with_for_update(skip_locked=True)
+            )
+            result = await db.execute(stmt)
+            items = result.scalars().all()
+            if not items:
+                await db.commit()
+                return []
+
+            for item in items:
+                item.status = "running"
+                item.claimed_at = now
+                item.attempts += 1
+
+            job_ids = {item.job_id for item in items}
+            await db.execute(
+                update(InferenceJobModel)
+                .where(InferenceJobModel.job_id.in_(job_ids), InferenceJobModel.status == "pending")
+                .values(status="running", started_at=now)
+            )
+            await db.commit()
+            return items
+
+    async def _process_batch(self, items: List[InferenceJobItemModel]):
+        """处理一批条目，并在一个事务中写回结果"""
+        job_cache = {}
+        outcomes = []
+        heartbeat = asyncio.create_task(self._heartbeat([item.id for item in items]))
+        try:
+            for item in items:
+                if item.job_id not in job_cache:
+                    job_cache[item.job_id] = await job_service.get_job(item.job_id)
+                job = job_cache[item.job_id]
+                outcomes.append((item, await self._process_item(job, item)))
+        finally:
+            heartbeat.cancel()
+
+        async with AsyncSessionLocal() as db:
+            progress = {}
+            for item, (status, result, error) in outcomes:
+                values = {"status": status, "result": result, "error_message": error}
+                if status == "busy":
+                    # 推理繁忙放回队列不算一次处理，退还领取时增加的次数
+                    values["status"] = "pending"
+                    values["attempts"] = InferenceJobItemModel.attempts - 1
+                if values["status"] == "pending":
+                    values["claimed_at"] = None
+                await db.execute(
+                    update(InferenceJobItemModel)
+                    .where(InferenceJobItemModel.id == item.id)
+                    .values(**values)
+                )
+                if status == "done":
+                    progress.setdefault(item.job_id, [0, 0])[0] += 1
+                    job = job_cache[item.job_id]
+                    if job and job.job_type == JOB_TYPE_EMOTION:
+                        db.add(self._emotion_detection_row(job, result))
+                elif status == "failed":
+                    progress.setdefault(item.job_id, [0, 0])[1] += 1
+
+            for job_id, (done, failed) in progress.items():
+                await db.execute(
+                    update(InferenceJobModel)
+                    .where(InferenceJobModel.job_id == job_id)
+                    .values(
+                        completed_items=InferenceJobModel.completed_items + done,
+                        failed_items=InferenceJobModel.failed_items + failed
+                    )
+                )
+            await db.commit()
+
+            for job_id in progress:
+                await self._finalize_job(db, job_id)
+
+        metrics.incr("jobs.items_processed", len(outcomes))
+        if any(outcome[0] in ("pending", "busy") for _, outcome in outcomes):
+            # 有条目被放回队列时稍作等待，避免在推理繁忙时反复领取
+            await asyncio.sleep(self.poll_interval)
+
+    async def _heartbeat(self, item_ids: List[int]):
+        """处理期间定期续租，避免长录音等慢条目被其他工作协程重复领取"""
+        while True:
+            await asyncio.sleep(self.lease_seconds / 3)
+            try:
+                async with AsyncSessionLocal() as db:
+                    await db.execute(
+                        update(InferenceJobItemModel)
+                        .where(InferenceJobItemModel.id.in_(item_ids), InferenceJobItemModel.status == "running")
+                        .values(claimed_at=datetime.utcnow())
+                    )
+                    await db.commit()
+            except Exception as e:
+                logger.warning(f"Job lease heartbeat failed: {e}")
+
+    async def _process_item(self, job: Optional[InferenceJobModel], item: InferenceJobItemModel):
+        """处理单个条目，返回 (状态, 结果, 错误信息)"""
+        if job is None:
+            return "failed", None, "任务不存在"
+        try:
+            if job.job_type == JOB_TYPE_RECORDING:
+                # 长录音由录音服务流式读取并分段处理
+                result = await recording_service.process_recording(job.meeting_id, item.object_key)
+                return "done", result, None
+            audio_data = await self._read_object(item.object_key)
+            if job.job_type == JOB_TYPE_EMOTION:
+                emotion_result = await emotion_service.detect_emotion(
+                    audio_data=audio_data,
+                    employee_id=job.employee_id,
+                    priority=PRIORITY_BULK,
+                    meeting_id=job.meeting_id,
+                    store_audio=False
+                )
+                return "done", emotion_result.model_dump(), None
+            match = await voiceprint_service.recognize_voiceprint(
+                audio_data,
+                job.meeting_id,
+                priority=PRIORITY_BULK,
+                store_audio=False
+            )
+            return "done", match.model_dump(), None
+        except (RateLimitError, ServiceBusyError):
+            # 推理队列繁忙，放回队列稍后重试
+            metrics.incr("jobs.items_requeued_busy")
+            return "busy", None, None
+        except Exception as e:
+            logger.warning(f"Job {item.job_id} item {item.item_index} failed: {e}")
+            if item.attempts < settings.JOB_MAX_ATTEMPTS and not isinstance(e, ValueError):
+                return "pending", None, str(e)
+            return "failed", None, str(e)
+
+    async def _read_object(self, object_key: str) -> bytes:
+        """读取对象存储中的音频（FLAC/Opus归档自动解码为WAV）
+        片段整体读入内存，超过上传大小上限的对象（如会议录音）直接判为失败，不再重试"""
+        stat = await storage.stat(object_key)
+        if stat.size > settings.MAX_FILE_SIZE:
+            raise ValueError(f"对象过大（{stat.size}字节），长录音请使用录音任务处理")
+        data = await storage.get(object_key)
+        return await asyncio.to_thread(decode_archive, data)
+
+    def _emotion_detection_row(self, job: InferenceJobModel, result: dict) -> EmotionDetectionModel:
+        return EmotionDetectionModel(
+            detection_id=str(uuid.uuid4()),
+            employee_id=job.employee_id,
+            meeting_id=job.meeting_id,
+            dominant_emotion=result["dominant_emotion"],
+            confidence_score=result["confidence"],
+            emotion_probabilities=result["emotion_probabilities"],
+            intensity=result["intensity"],
+            complexity=result["complexity"],
+            audio_url=result.get("audio_url"),
+            audio_duration=result["audio_duration"],
+            audio_quality_score=result["quality_score"],
+            emotion_analysis=result.get("analysis"),
+            model_name=result["model_name"],
+            processing_time=result.get("processing_time", 0),
+            is_success=True
+        )
+
+    async def _finalize_job(self, db, job_id: str):
+        """所有条目处理完毕后更新任务状态"""
+        job = await db.get(InferenceJobModel, job_id, populate_existing=True)
+        if job is None or job.status in TERMINAL_STATUSES:
+            return
+        if job.completed_items + job.failed_items < job.total_items:
+            return
+        job.status = "completed" if job.completed_items > 0 else "failed"
+        job.finished_at = datetime.utcnow()
+        if job.status == "failed":
+            job.error_message = "所有音频片段处理失败"
+        await db.commit()
+        metrics.incr(f"jobs.{job.status}")
+        logger.info(f"Inference job {job_id} {job.status}: {job.completed_items}/{job.total_items} succeeded")
+
+
+# 创建全局服务实例
+job_service = JobService()
+job_worker_pool = JobWorkerPool(
+    workers=settings.JOB_WORKERS,
+    batch_size=settings.JOB_BATCH_SIZE,
+    poll_interval=settings.JOB_POLL_INTERVAL,
+    lease_seconds=settings.JOB_LEASE_SECONDS
+)
@@ -0,0 +1,310 @@
+"""
+会议录音服务
+长录音不经过API进程：客户端申请预签名PUT地址（大文件使用分片上传）直传对象存储，
+上传完成回调后创建批量任务，由任务工作池从对象存储流式读取、分段识别。
+"""
+
+import asyncio
+import io
+import os
+import subprocess
+import tempfile
+import uuid
+from datetime import datetime
+from typing import Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+import soundfile as sf
+from sqlalchemy import select, update
+
+from app.core.config import settings
+from app.core.concurrency import PRIORITY_BULK
+from app.core.exceptions import RateLimitError, ServiceBusyError, ValidationError
+from app.core.metrics import metrics
+from app.core.storage import storage
+from app.models.database import AsyncSessionLocal
+from app.models.meeting import MeetingModel, MeetingRecordingModel
+from app.schemas.meeting import RecordingUploadPart, RecordingUploadResponse
+from app.services.emotion_service import emotion_service
+from app.services.voiceprint_service import voiceprint_service
+from app.utils.audio_codec import upload_extension
+
+# S3分片上传的最小分片大小（最后一片除外）
+MIN_PART_SIZE = 5 * 1024 * 1024
+MAX_PARTS = 10000
+
+
+class RecordingService:
+    """会议录音服务"""
+
+    async def create_upload(
+        self,
+        meeting: MeetingModel,
+        filename: str,
+        file_size: int,
+        content_type: str,
+        created_by: int
+    ) -> RecordingUploadResponse:
+        """申请录音上传地址：小文件单次PUT，大文件分片PUT"""
+        if file_size > settings.RECORDING_MAX_SIZE:
+            raise ValidationError(f"录音文件过大，最大{settings.RECORDING_MAX_SIZE // (1024 * 1024)}MB")
+
+        recording_id = str(uuid.uuid4())
+        # 对象键只使用白名单扩展名，客户端文件名只记录在录音表中
+        object_key = f"recordings/{meeting.meeting_id}/{recording_id}{upload_extension(filename)}"
+        expires = settings.RECORDING_PRESIGN_EXPIRES
+
+        upload_id = None
+        part_size = None
+        upload_url = None
+        parts: List[RecordingUploadPart] = []
+
+        if file_size <= settings.RECORDING_PART_SIZE:
+            upload_url = await storage.presigned_put_url(object_key, expires)
+        else:
+            part_size = max(settings.RECORDING_PART_SIZE, MIN_PART_SIZE, -(-file_size // MAX_PARTS))
+            part_count = -(-file_size // part_size)
+            upload_id = await storage.create_multipart_upload(object_key, content_type)
+            for part_number in range(1, part_count + 1):
+                url = await storage.presigned_part_url(object_key, upload_id, part_number, expires)
+                parts.append(RecordingUploadPart(part_number=part_number, url=url))
+
+        async with AsyncSessionLocal() as db:
+            db.add(MeetingRecordingModel(
+                recording_id=recording_id,
+                meeting_id=meeting.meeting_id,
+                object_key=object_key,
+                filename=filename,
+                content_type=content_type,
+                file_size=file_size,
+                upload_id=upload_id,
+                part_size=part_size,
+                status="uploading",
+                created_by=created_by
+            ))
+            await db.commit()
+
+        metrics.incr("recordings.upload_created")
+        return RecordingUploadResponse(
+            recording_id=recording_id,
+            object_key=object_key,
+            upload_type="multipart" if upload_id else "single",
+            upload_url=upload_url,
+            upload_id=upload_id,
+            part_size=part_size,
+            parts=parts,
+            expires_in=settings.RECORDING_PRESIGN_EXPIRES
+        )
+
+    async def get_recording(self, recording_id: str) -> Optional[MeetingRecordingModel]:
+        async with AsyncSessionLocal() as db:
+            return await db.get(MeetingRecordingModel, recording_id)
+
+    async def complete_upload(self, recording: MeetingRecordingModel, parts: List[Dict]) -> MeetingRecordingModel:
+        """上传完成：合并分片并校验对象存在"""
+        if recording.status != "uploading":
+            raise ValidationError(f"录音状态为{recording.status}，不能重复完成上传")
+
+        if recording.upload_id:
+            if not parts:
+                raise ValidationError("分片上传需要提供分片列表")
+            await storage.complete_multipart_upload(recording.object_key, recording.upload_id, parts)
+
+        try:
+            stat = await storage.stat(recording.object_key)
+        except Exception:
+            raise ValidationError("录音文件尚未上传到存储")
+
+        async with AsyncSessionLocal() as db:
+            recording = await db.get(MeetingRecordingModel, recording.recording_id)
+            recording.status = "uploaded"
+            recording.file_size = stat.size
+            recording.uploaded_at = datetime.utcnow()
+            await db.commit()
+            await db.refresh(recording)
+
+        metrics.incr("recordings.uploaded")
+        metrics.incr("recordings.uploaded_bytes", stat.size)
+        return recording
+
+    async def attach_job(self, recording_id: str, job_id: str):
+        """记录处理任务"""
+        await self._update(recording_id, job_id=job_id)
+
+    async def process_recording(self, meeting_id: Optional[int], object_key: str) -> Dict:
+        """流式读取录音并分段识别（由任务工作池调用）"""
+        recording = await self._find_by_object_key(object_key)
+        if recording:
+            await self._update(recording.recording_id, status="processing")
+
+        temp_path = None
+        try:
+            temp_path = await self._download_to_temp(object_key)
+            enable_emotion = await self._emotion_enabled(meeting_id)
+
+            segments = []
+            duration = 0.0
+            # 解码在工作线程中逐段进行，事件循环只等待每一段的结果
+            iterator = self._iter_segments(temp_path)
+            try:
+                index = 0
+                while True:
+                    item = await asyncio.to_thread(next, iterator, None)
+                    if item is None:
+                        break
+                    start, audio, sr = item
+                    segment = await self._process_segment(index, start, audio, sr, meeting_id, enable_emotion)
+                    segments.append(segment)
+                    duration = segment["end"]
+                    index += 1
+            finally:
+                # 关闭生成器会终止ffmpeg子进程，同样放到线程中
+                await asyncio.to_thread(iterator.close)
+
+            if recording:
+                await self._update(recording.recording_id, status="processed", duration=duration)
+            metrics.incr("recordings.processed")
+            return {"duration": duration, "segment_count": len(segments), "segments": segments}
+        except Exception as e:
+            if recording:
+                await self._update(recording.recording_id, status="failed", error_message=str(e))
+            raise
+        finally:
+            if temp_path and os.path.exists(temp_path):
+                os.unlink(temp_path)
+
+    async def _download_to_temp(self, object_key: str) -> str:
+        """按块把对象写入临时文件，API/工作进程内存占用与录音长度无关"""
+        temp_file = tempfile.NamedTemporaryFile(delete=False, dir=settings.TEMP_DIR, suffix=os.path.splitext(object_key)[1])
+        try:
+            with temp_file:
+                await storage.download(object_key, temp_file)
+        except Exception:
+            os.unlink(temp_file.name)
+            raise
+        return temp_file.name
+
+    def _iter_segments(self, path: str) -> Iterator[Tuple[float, np.ndarray, int]]:
+        """按固定时长切分录音，生成 (起始秒, 单声道样本, 采样率)"""
+        try:
+            f = sf.SoundFile(path)
+        except RuntimeError:
+            # soundfile不支持的格式（如小程序上传的aac/m4a）交给ffmpeg流式解码
+            yield from self._iter_ffmpeg_segments(path)
+            return
+
+        with f:
+            sr = f.samplerate
+            start = 0.0
+            for block in f.blocks(blocksize=int(settings.RECORDING_SEGMENT_SECONDS * sr), dtype="float32", always_2d=True):
+                yield start, block.mean(axis=1), sr
+                start += len(block) / sr
+
+    def _iter_ffmpeg_segments(self, path: str) -> Iterator[Tuple[float, np.ndarray, int]]:
+        """ffmpeg把录音解码为单声道float32 PCM写到管道，按分段大小逐块读取，内存占用与录音长度无关"""
+        sr = settings.SAMPLE_RATE
+        step = int(settings.RECORDING_SEGMENT_SECONDS * sr)
+        with tempfile.TemporaryFile() as stderr:
+            process = subprocess.Popen(
+                [
+                    settings.RECORDING_FFMPEG_PATH, "-nostdin", "-v", "error",
+                    "-i", path, "-f", "f32le", "-ac", "1", "-ar", str(sr), "pipe:1"
+                ],
+                stdout=subprocess.PIPE,
+                stderr=stderr
+            )
+            finished = False
+            try:
+                start = 0.0
+                while True:
+                    data = process.stdout.read(step * 4)
+                    if not data:
+                        break
+                    audio = np.frombuffer(data[:len(data) // 4 * 4], dtype=np.float32)
+                    yield start, audio, sr
+                    start += len(audio) / sr
+                finished = True
+            finally:
+                if not finished and process.poll() is None:
+                    process.kill()
+                process.stdout.close()
+                process.wait()
+
+            if process.returncode != 0:
+                stderr.seek(0)
+                message = stderr.read().decode("utf-8", errors="replace").strip()
+                raise ValidationError(f"录音解码失败: {message or process.returncode}")
+
+    async def _process_segment(
+        self,
+        index: int,
+        start: float,
+        audio: np.ndarray,
+        sr: int,
+        meeting_id: Optional[int],
+        enable_emotion: bool
+    ) -> Dict:
+        end = start + len(audio) / sr
+        segment = {"index": index, "start": round(start, 3), "end": round(end, 3)}
+        if len(audio) < sr:  # 不足1秒的尾段不做识别
+            return segment
+
+        buffer = io.BytesIO()
+        sf.write(buffer, audio, sr, format="WAV", subtype="PCM_16")
+        clip = buffer.getvalue()
+
+        try:
+            match = await self._retry_busy(lambda: voiceprint_service.recognize_voiceprint(
+                clip, meeting_id, priority=PRIORITY_BULK, store_audio=False
+            ))
+            segment.update(employee_id=match.employee_id, confidence=match.confidence)
+        except Exception as e:
+            segment["recognition_error"] = str(e)
+
+        if enable_emotion:
+            try:
+                emotion = await self._retry_busy(lambda: emotion_service.detect_emotion(
+                    clip, priority=PRIORITY_BULK, meeting_id=meeting_id, store_audio=False
+                ))
+                segment.update(dominant_emotion=emotion.dominant_emotion, emotion_confidence=emotion.confidence)
+            except Exception as e:
+                segment["emotion_error"] = str(e)
+        return segment
+
+    async def _retry_busy(self, func, attempts: int = 5):
+        """推理队列繁忙时等待后重试当前分段，而不是让整段录音重新排队"""
+        for attempt in range(attempts):
+            try:
+                return await func()
+            except (RateLimitError, ServiceBusyError) as e:
+                if attempt == attempts - 1:
+                    raise
+                retry_after = (e.details or {}).get("retry_after") or settings.INFERENCE_RETRY_AFTER
+                await asyncio.sleep(retry_after)
+
+    async def _emotion_enabled(self, meeting_id: Optional[int]) -> bool:
+        if not meeting_id:
+            return False
+        async with AsyncSessionLocal() as db:
+            meeting = await db.get(MeetingModel, meeting_id)
+            return bool(meeting and meeting.enable_emotion_detection)
+
+    async def _find_by_object_key(self, object_key: str) -> Optional[MeetingRecordingModel]:
+        async with AsyncSessionLocal() as db:
+            result = await db.execute(
+                select(MeetingRecordingModel).where(MeetingRecordingModel.object_key == object_key)
+            )
+            return result.scalars().first()
+
+    async def _update(self, recording_id: str, **values):
+        async with AsyncSessionLocal() as db:
+            await db.execute(
+                update(MeetingRecordingModel)
+                .where(MeetingRecordingModel.recording_id == recording_id)
+                .values(**values)
+            )
+            await db.commit()
+
+
+# 创建全局服务实例
+recording_service = RecordingService()
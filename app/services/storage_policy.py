@@ -0,0 +1,81 @@
+"""
+音频存储策略
+决定一次请求的音频是否需要写入对象存储：
+- 注册样本：始终保存
+- 开启录音（recording_enabled）的会议：始终保存
+- 识别：失败、得分接近阈值时保存，其余按采样率随机保存
+- 情绪检测：低置信度时保存，其余按采样率随机保存
+"""
+
+import random
+from typing import Optional
+
+from loguru import logger
+
+from app.core.cache import LRUCache
+from app.core.config import settings
+from app.core.metrics import metrics
+from app.models.database import AsyncSessionLocal
+from app.models.meeting import MeetingModel
+from app.schemas.emotion import EmotionFeature
+from app.schemas.voiceprint import VoiceprintMatch
+
+
+class StoragePolicy:
+    """音频存储策略"""
+
+    def __init__(self):
+        # 会议录音开关缓存：meeting_id -> recording_enabled
+        self._recording_cache = LRUCache(maxsize=1024, ttl=settings.STORAGE_POLICY_MEETING_CACHE_TTL)
+
+    async def meeting_recording_enabled(self, meeting_id: Optional[int]) -> bool:
+        """会议是否开启录音"""
+        if not meeting_id:
+            return False
+        cached = self._recording_cache.get(meeting_id)
+        if cached is not None:
+            return cached
+        try:
+            async with AsyncSessionLocal() as db:
+                meeting = await db.get(MeetingModel, meeting_id)
+                enabled = bool(meeting and meeting.recording_enabled)
+        except Exception as e:
+            logger.warning(f"Failed to load recording flag for meeting {meeting_id}: {e}")
+            return False
+        self._recording_cache.set(meeting_id, enabled)
+        return enabled
+
+    def should_store_enrollment(self) -> bool:
+        """注册样本始终保存"""
+        return self._decide("enrollment", "always")
+
+    async def should_store_recognition(self, match: VoiceprintMatch, meeting_id: Optional[int] = None) -> bool:
+        if await self.meeting_recording_enabled(meeting_id):
+            return self._decide("recognition", "recording")
+        if not match.success:
+            return self._decide("recognition", "failure")
+        if abs(match.confidence - match.threshold) <= settings.STORAGE_NEAR_THRESHOLD_MARGIN:
+            return self._decide("recognition", "near_threshold")
+        return self._sample("recognition", settings.STORAGE_RECOGNITION_SAMPLE_RATE)
+
+    async def should_store_emotion(self, result: EmotionFeature, meeting_id: Optional[int] = None) -> bool:
+        if await self.meeting_recording_enabled(meeting_id):
+            return self._decide("emotion", "recording")
+        if result.confidence < settings.STORAGE_EMOTION_LOW_CONFIDENCE:
+            return self._decide("emotion", "low_confidence")
+        return self._sample("emotion", settings.STORAGE_EMOTION_SAMPLE_RATE)
+
+    def _sample(self, kind: str, rate: float) -> bool:
+        if random.random() < rate:
+            return self._decide(kind, "sampled")
+        metrics.incr(f"storage_policy.{kind}.skipped")
+        return False
+
+    @staticmethod
+    def _decide(kind: str, reason: str) -> bool:
+        metrics.incr(f"storage_policy.{kind}.stored.{reason}")
+        return True
+
+
+# 创建全局策略实例
+storage_policy = StoragePolicy()
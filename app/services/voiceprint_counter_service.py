@@ -0,0 +1,133 @@
+"""
+员工声纹计数
+employees.voiceprint_count / voiceprint_registered 与声纹的新增、删除在同一事务中更新，
+样本数上限用条件UPDATE（voiceprint_count < 上限）原子检查，不再每次注册都 COUNT(*)。
+定期校正任务按 voiceprints 表重新计数，修正异常中断或手工改库造成的偏差。
+"""
+
+import asyncio
+from typing import Iterable, Optional
+
+from loguru import logger
+from sqlalchemy import func, select, update
+
+from app.core.config import settings
+from app.core.metrics import metrics
+from app.models.database import AsyncSessionLocal
+from app.models.employee import EmployeeModel
+from app.models.voiceprint import VoiceprintModel
+
+
+class VoiceprintCounterService:
+    """员工声纹计数维护"""
+
+    def __init__(self, max_samples: int, required_samples: int, reconcile_interval: float):
+        self.max_samples = max_samples
+        self.required_samples = required_samples
+        self.reconcile_interval = reconcile_interval
+        self._task: Optional[asyncio.Task] = None
+
+    async def increment(self, db, employee_id: int) -> bool:
+        """计数加一（在调用方事务中执行）；已达上限时返回False"""
+        # voiceprint_registered 写在前面：MySQL按顺序赋值，标准SQL使用旧值，两种语义下结果一致
+        result = await db.execute(
+            update(EmployeeModel)
+            .where(
+                EmployeeModel.employee_id == employee_id,
+                EmployeeModel.voiceprint_count < self.max_samples
+            )
+            .ordered_values(
+                (EmployeeModel.voiceprint_registered, EmployeeModel.voiceprint_count + 1 >= self.required_samples),
+                (EmployeeModel.voiceprint_count, EmployeeModel.voiceprint_count + 1)
+            )
+            .execution_options(synchronize_session=False)
+        )
+        return result.rowcount > 0
+
+    async def decrement(self, db, employee_id: int):
+        """计数减一（在调用方事务中执行）"""
+        await db.execute(
+            update(EmployeeModel)
+            .where(EmployeeModel.employee_id == employee_id, EmployeeModel.voiceprint_count > 0)
+            .ordered_values(
+                (EmployeeModel.voiceprint_registered, EmployeeModel.voiceprint_count - 1 >= self.required_samples),
+                (EmployeeModel.voiceprint_count, EmployeeModel.voiceprint_count - 1)
+            )
+            .execution_options(synchronize_session=False)
+        )
+
+    async def reconcile(self, employee_ids: Optional[Iterable[int]] = None) -> int:
+        """按声纹表重新计数并修正偏差（不传employee_ids时校正全部员工），返回修正的员工数"""
+        ids = list(employee_ids) if employee_ids is not None else None
+        if ids is not None and not ids:
+            return 0
+
+        actual_counts = (
+            select(VoiceprintModel.employee_id, func.count(VoiceprintModel.voiceprint_id).label("actual"))
+            .where(VoiceprintModel.is_active == True)
+            .group_by(VoiceprintModel.employee_id)
+            .subquery()
+        )
+        query = (
+            select(EmployeeModel.employee_id)
+            .outerjoin(actual_counts, actual_counts.c.employee_id == EmployeeModel.employee_id)
+            .where(EmployeeModel.voiceprint_count != func.coalesce(actual_counts.c.actual, 0))
+        )
+        if ids is not None:
+            query = query.where(EmployeeModel.employee_id.in_(ids))
+
+        async with AsyncSessionLocal() as db:
+            drifted = list((await db.execute(query)).scalars().all())
+            if drifted:
+                # 更新时重新计数（相关子查询），不会覆盖查询之后并发注册/删除造成的变化
+                current = (
+                    select(func.count(VoiceprintModel.voiceprint_id))
+                    .where(
+                        VoiceprintModel.employee_id == EmployeeModel.employee_id,
+                        VoiceprintModel.is_active == True
+                    )
+                    .scalar_subquery()
+                )
+                await db.execute(
+                    update(EmployeeModel)
+                    .where(EmployeeModel.employee_id.in_(drifted))
+                    .ordered_values(
+                        (EmployeeModel.voiceprint_registered, current >= self.required_samples),
+                        (EmployeeModel.voiceprint_count, current)
+                    )
+                    .execution_options(synchronize_session=False)
+                )
+            await db.commit()
+        fixed = len(drifted)
+
+        if fixed:
+            metrics.incr("voiceprint_counter.drift_fixed", fixed)
+            logger.warning(f"Reconciled voiceprint counters for {fixed} employees")
+        return fixed
+
+    async def start(self):
+        if self._task is None and self.reconcile_interval > 0:
+            self._task = asyncio.create_task(self._reconcile_loop(), name="voiceprint-reconcile")
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    async def _reconcile_loop(self):
+        # 启动时先校正一次，补齐计数维护之前已有的声纹
+        while True:
+            try:
+                await self.reconcile()
+            except Exception as e:
+                logger.error(f"Voiceprint counter reconciliation failed: {e}")
+            await asyncio.sleep(self.reconcile_interval)
+
+
+# 创建全局服务实例
+voiceprint_counter_service = VoiceprintCounterService(
+    max_samples=settings.VOICEPRINT_MAX_SAMPLES,
+    required_samples=settings.VOICEPRINT_REQUIRED_SAMPLES,
+    reconcile_interval=settings.VOICEPRINT_RECONCILE_INTERVAL
+)
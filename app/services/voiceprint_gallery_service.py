@@ -0,0 +1,430 @@
+"""
+声纹库（内存特征矩阵）
+识别时不再逐条读取 voiceprints 表，而是在进程内维护归一化后的 float32 特征矩阵，一次矩阵乘法得到全部相似度。
+- 快照：定期把矩阵写成 .npy 文件，另存声纹ID映射和版本水位（已包含的最大 updated_at）
+- 启动：以只读内存映射方式加载最新快照，再从数据库补齐 updated_at 晚于水位的变更
+- 本进程注册/删除声纹时立即更新矩阵；删除为软删除（is_active=False），以便其他进程按 updated_at 发现
+- 同步：每 GALLERY_SYNC_INTERVAL 秒按 updated_at 拉取其他进程的变更并增量应用；
+  配置 REDIS_URL 时变更同时通过发布/订阅通知，其他进程收到后立即同步
+多个工作进程共享快照目录，通过文件锁保证同一时刻只有一个进程写快照。
+"""
+
+import asyncio
+import fcntl
+import json
+import os
+import time
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, List, Optional, Sequence
+
+import numpy as np
+from loguru import logger
+from sqlalchemy import func, select
+
+from app.core.config import settings
+from app.core.metrics import metrics
+from app.models.database import AsyncSessionLocal
+from app.models.voiceprint import VoiceprintModel
+
+try:
+    import redis.asyncio as aioredis
+except ImportError:  # redis 为可选依赖
+    aioredis = None
+
+MANIFEST_NAME = "gallery.json"
+LOCK_NAME = ".gallery.lock"
+
+
+@dataclass(frozen=True)
+class GalleryState:
+    """不可变的声纹库状态，更新时整体替换，读取无需加锁"""
+    matrix: np.ndarray  # (N, D) float32，每行已归一化
+    voiceprint_ids: List[str]
+    employee_ids: np.ndarray  # (N,) int64
+    watermark: Optional[datetime]  # 已从数据库同步的最大 updated_at
+
+    @property
+    def size(self) -> int:
+        return len(self.voiceprint_ids)
+
+    @property
+    def dim(self) -> Optional[int]:
+        return int(self.matrix.shape[1]) if self.size else None
+
+
+def _empty_state(watermark: Optional[datetime] = None) -> GalleryState:
+    return GalleryState(np.zeros((0, 0), dtype=np.float32), [], np.zeros(0, dtype=np.int64), watermark)
+
+
+def _normalize(embedding: Sequence[float]) -> np.ndarray:
+    vector = np.asarray(embedding, dtype=np.float32).reshape(-1)
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm > 0 else vector
+
+
+class VoiceprintGalleryService:
+    """进程内声纹库"""
+
+    def __init__(
+        self,
+        snapshot_dir: str,
+        snapshot_interval: float,
+        snapshot_keep: int,
+        sync_interval: float,
+        sync_overlap: float,
+        redis_url: Optional[str] = None,
+        channel: str = "voiceprint:gallery"
+    ):
+        self.snapshot_dir = snapshot_dir
+        self.snapshot_interval = snapshot_interval
+        self.snapshot_keep = max(1, snapshot_keep)
+        self.sync_interval = sync_interval
+        self.sync_overlap = timedelta(seconds=sync_overlap)
+        self.channel = channel
+        self._redis = None
+        if redis_url and aioredis is not None:
+            self._redis = aioredis.from_url(redis_url)
+        elif redis_url:
+            logger.warning("redis package not installed, voiceprint gallery sync falls back to polling")
+        self._state: Optional[GalleryState] = None
+        self._lock = asyncio.Lock()
+        self._tasks: List[asyncio.Task] = []
+        self._sync_event: Optional[asyncio.Event] = None
+        self._recent: Dict[str, datetime] = {}  # 回看窗口内已应用的 (声纹ID → updated_at)
+        self._last_sync = time.monotonic()
+        metrics.register_gauge("voiceprint_gallery.size", lambda: self._state.size if self._state else 0)
+        metrics.register_gauge("voiceprint_gallery.staleness_seconds", lambda: time.monotonic() - self._last_sync)
+
+    # ---- 生命周期 ----
+
+    async def start(self):
+        try:
+            await self.ensure_loaded()
+        except Exception as e:
+            # 数据库暂不可用时不阻止启动，首次识别时再加载
+            logger.error(f"Failed to load voiceprint gallery: {e}")
+        if self._tasks:
+            return
+        if self.snapshot_interval > 0:
+            self._tasks.append(asyncio.create_task(self._snapshot_loop(), name="gallery-snapshot"))
+        if self.sync_interval > 0:
+            self._sync_event = asyncio.Event()
+            self._tasks.append(asyncio.create_task(self._sync_loop(), name="gallery-sync"))
+            if self._redis is not None:
+                self._tasks.append(asyncio.create_task(self._subscribe_loop(), name="gallery-subscribe"))
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    async def ensure_loaded(self) -> GalleryState:
+        if self._state is not None:
+            return self._state
+        async with self._lock:
+            if self._state is None:
+                start = time.monotonic()
+                state = await asyncio.to_thread(self._read_snapshot)
+                source = "snapshot" if state is not None else "database"
+                self._state = state or await self._load_from_db()
+                if state is not None:
+                    await self._catch_up()
+                metrics.observe("voiceprint_gallery.load_seconds", time.monotonic() - start)
+                logger.info(f"Voiceprint gallery loaded from {source}: {self._state.size} voiceprints")
+                if state is None and self.snapshot_interval > 0:
+                    # 立即写出快照，滚动重启时后续进程不必再全量读库
+                    try:
+                        await asyncio.to_thread(self._write_snapshot, self._state)
+                    except Exception as e:
+                        logger.warning(f"Failed to write voiceprint gallery snapshot: {e}")
+        return self._state
+
+    # ---- 查询 ----
+
+    async def search(self, embedding: Sequence[float], top_k: int) -> List[Dict]:
+        """返回相似度最高的top_k个声纹 [{voiceprint_id, employee_id, similarity}]，按相似度降序"""
+        state = await self.ensure_loaded()
+        if not state.size:
+            return []
+        query = _normalize(embedding)
+        if query.shape[0] != state.dim:
+            raise ValueError(f"Embedding dimension {query.shape[0]} does not match gallery dimension {state.dim}")
+
+        similarities = state.matrix @ query
+        k = min(top_k, state.size)
+        top = np.argpartition(-similarities, k - 1)[:k]
+        top = top[np.argsort(-similarities[top])]
+        return [
+            {
+                "voiceprint_id": state.voiceprint_ids[i],
+                "employee_id": int(state.employee_ids[i]),
+                "similarity": float(similarities[i])
+            }
+            for i in top
+        ]
+
+    # ---- 变更 ----
+
+    async def upsert(self, voiceprint_id: str, employee_id: int, embedding: Sequence[float]):
+        """本进程新增声纹后立即加入声纹库（水位不变，其他进程按 updated_at 同步）"""
+        async with self._lock:
+            if self._state is not None:
+                self._state = self._apply(self._state, [(voiceprint_id, employee_id, embedding)], [])
+        await self._publish(voiceprint_id)
+
+    async def remove(self, voiceprint_id: str):
+        async with self._lock:
+            if self._state is not None:
+                self._state = self._apply(self._state, [], [voiceprint_id])
+        await self._publish(voiceprint_id)
+
+    def _apply(
+        self,
+        state: GalleryState,
+        upserts: Sequence[tuple],
+        removals: Iterable[str],
+        watermark: Optional[datetime] = None
+    ) -> GalleryState:
+        """在副本上应用变更，返回新状态（内存映射的快照矩阵在这里复制为普通数组）"""
+        rows: Dict[str, tuple] = {
+            voiceprint_id: (int(state.employee_ids[i]), state.matrix[i])
+            for i, voiceprint_id in enumerate(state.voiceprint_ids)
+        }
+        for voiceprint_id in removals:
+            rows.pop(voiceprint_id, None)
+        dim = state.dim
+        for voiceprint_id, employee_id, embedding in upserts:
+            vector = _normalize(embedding)
+            if dim is None:
+                dim = vector.shape[0]
+            if vector.shape[0] != dim:
+                logger.warning(f"Skipping voiceprint {voiceprint_id}: embedding dimension {vector.shape[0]} != {dim}")
+                continue
+            rows[voiceprint_id] = (employee_id, vector)
+
+        watermark = max(filter(None, (state.watermark, watermark)), default=None)
+        if not rows:
+            return _empty_state(watermark)
+        ids = list(rows)
+        return GalleryState(
+            matrix=np.stack([rows[i][1] for i in ids]).astype(np.float32, copy=False),
+            voiceprint_ids=ids,
+            employee_ids=np.array([rows[i][0] for i in ids], dtype=np.int64),
+            watermark=watermark
+        )
+
+    # ---- 数据库同步 ----
+
+    async def _load_from_db(self) -> GalleryState:
+        async with AsyncSessionLocal() as db:
+            result = await db.execute(
+                select(
+                    VoiceprintModel.voiceprint_id,
+                    VoiceprintModel.employee_id,
+                    VoiceprintModel.feature_data,
+                    VoiceprintModel.updated_at
+                ).where(VoiceprintModel.is_active == True)
+            )
+            rows = result.all()
+            # 水位取全部行（含已停用）的最大 updated_at，之后只需同步更新的行
+            watermark = (await db.execute(select(func.max(VoiceprintModel.updated_at)))).scalar()
+        return self._apply(
+            _empty_state(),
+            [(row.voiceprint_id, row.employee_id, row.feature_data) for row in rows],
+            [],
+            watermark
+        )
+
+    async def _catch_up(self) -> int:
+        """应用 updated_at 晚于水位的变更，返回变更行数（调用方持有锁）"""
+        state = self._state
+        query = select(
+            VoiceprintModel.voiceprint_id,
+            VoiceprintModel.employee_id,
+            VoiceprintModel.feature_data,
+            VoiceprintModel.is_active,
+            VoiceprintModel.updated_at
+        )
+        if state.watermark is not None:
+            # 回看一小段时间：时间戳精度为秒，且同一秒内提交的行可能晚于水位才可见；重复应用是幂等的
+            query = query.where(VoiceprintModel.updated_at >= state.watermark - self.sync_overlap)
+        async with AsyncSessionLocal() as db:
+            rows = (await db.execute(query.order_by(VoiceprintModel.updated_at))).all()
+        self._last_sync = time.monotonic()
+
+        # 回看窗口内已应用过的同一版本不再重复应用，没有新变更时不复制矩阵
+        rows = [row for row in rows if self._recent.get(row.voiceprint_id) != row.updated_at]
+        if not rows:
+            return 0
+
+        upserts = [(row.voiceprint_id, row.employee_id, row.feature_data) for row in rows if row.is_active]
+        removals = [row.voiceprint_id for row in rows if not row.is_active]
+        watermark = max((row.updated_at for row in rows if row.updated_at), default=None)
+        self._state = self._apply(state, upserts, removals, watermark)
+        for row in rows:
+            self._recent[row.voiceprint_id] = row.updated_at
+        horizon = self._state.watermark - self.sync_overlap if self._state.watermark else None
+        if horizon is not None:
+            self._recent = {key: value for key, value in self._recent.items() if value and value >= horizon}
+        metrics.incr("voiceprint_gallery.synced_rows", len(rows))
+        return len(rows)
+
+    async def sync(self) -> int:
+        """拉取其他进程的变更并增量应用，返回变更行数"""
+        if self._state is None:
+            await self.ensure_loaded()
+            return 0
+        async with self._lock:
+            return await self._catch_up()
+
+    async def _sync_loop(self):
+        """按间隔轮询；收到发布/订阅通知时提前同步。未同步时间不超过 sync_interval"""
+        while True:
+            try:
+                await asyncio.wait_for(self._sync_event.wait(), timeout=self.sync_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._sync_event.clear()
+            try:
+                await self.sync()
+            except Exception as e:
+                logger.warning(f"Voiceprint gallery sync failed: {e}")
+
+    async def _publish(self, voiceprint_id: str):
+        if self._redis is None:
+            return
+        try:
+            await self._redis.publish(self.channel, json.dumps({"voiceprint_id": voiceprint_id, "pid": os.getpid()}))
+        except Exception as e:
+            metrics.incr("voiceprint_gallery.publish_error")
+            logger.warning(f"Failed to publish voiceprint gallery change: {e}")
+
+    async def _subscribe_loop(self):
+        """订阅变更通知；连接断开后重连，期间由轮询兜底"""
+        while True:
+            try:
+                pubsub = self._redis.pubsub()
+                await pubsub.subscribe(self.channel)
+                try:
+                    async for message in pubsub.listen():
+                        if message.get("type") != "message":
+                            continue
+                        data = json.loads(message["data"])
+                        if data.get("pid") != os.getpid():
+                            self._sync_event.set()
+                finally:
+                    await pubsub.close()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"Voiceprint gallery subscription lost: {e}")
+            await asyncio.sleep(self.sync_interval)
+
+    # ---- 快照 ----
+
+    async def _snapshot_loop(self):
+        while True:
+            await asyncio.sleep(self.snapshot_interval)
+            try:
+                if self._state is not None:
+                    await asyncio.to_thread(self._write_snapshot, self._state)
+            except Exception as e:
+                logger.warning(f"Failed to write voiceprint gallery snapshot: {e}")
+
+    def _read_manifest(self) -> Optional[Dict]:
+        path = os.path.join(self.snapshot_dir, MANIFEST_NAME)
+        if not os.path.exists(path):
+            return None
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)
+
+    def _read_snapshot(self) -> Optional[GalleryState]:
+        """以只读内存映射加载最新快照；快照不存在或与当前模型不符时返回None"""
+        try:
+            manifest = self._read_manifest()
+            if manifest is None or manifest.get("model") != settings.VOICEPRINT_MODEL:
+                return None
+            version = manifest["version"]
+            with open(os.path.join(self.snapshot_dir, f"gallery-{version}.json"), encoding="utf-8") as f:
+                id_map = json.load(f)
+            watermark = datetime.fromisoformat(manifest["watermark"]) if manifest.get("watermark") else None
+            if not id_map["voiceprint_ids"]:
+                return _empty_state(watermark)
+            matrix = np.load(os.path.join(self.snapshot_dir, f"gallery-{version}.npy"), mmap_mode="r")
+            if matrix.shape[0] != len(id_map["voiceprint_ids"]):
+                raise ValueError("snapshot matrix and id map do not match")
+            return GalleryState(
+                matrix=matrix,
+                voiceprint_ids=id_map["voiceprint_ids"],
+                employee_ids=np.asarray(id_map["employee_ids"], dtype=np.int64),
+                watermark=watermark
+            )
+        except Exception as e:
+            logger.warning(f"Ignoring voiceprint gallery snapshot: {e}")
+            return None
+
+    def _write_snapshot(self, state: GalleryState) -> bool:
+        """写入快照（矩阵、ID映射写完后再替换清单文件）；其他进程正在写或内容未变化时跳过"""
+        os.makedirs(self.snapshot_dir, exist_ok=True)
+        with open(os.path.join(self.snapshot_dir, LOCK_NAME), "w") as lock_file:
+            try:
+                fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                return False
+
+            watermark = state.watermark.isoformat() if state.watermark else None
+            manifest = self._read_manifest()
+            if manifest and manifest.get("watermark") == watermark and manifest.get("size") == state.size:
+                return False
+
+            version = f"{int(time.time() * 1000)}"
+            np.save(os.path.join(self.snapshot_dir, f"gallery-{version}.npy"), np.ascontiguousarray(state.matrix))
+            with open(os.path.join(self.snapshot_dir, f"gallery-{version}.json"), "w", encoding="utf-8") as f:
+                json.dump({
+                    "voiceprint_ids": state.voiceprint_ids,
+                    "employee_ids": state.employee_ids.tolist()
+                }, f)
+            manifest_tmp = os.path.join(self.snapshot_dir, f"{MANIFEST_NAME}.tmp")
+            with open(manifest_tmp, "w", encoding="utf-8") as f:
+                json.dump({
+                    "version": version,
+                    "watermark": watermark,
+                    "size": state.size,
+                    "dim": state.dim,
+                    "model": settings.VOICEPRINT_MODEL
+                }, f)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(manifest_tmp, os.path.join(self.snapshot_dir, MANIFEST_NAME))
+            self._prune_snapshots()
+
+        metrics.incr("voiceprint_gallery.snapshots")
+        logger.info(f"Voiceprint gallery snapshot {version} written ({state.size} voiceprints)")
+        return True
+
+    def _prune_snapshots(self):
+        """只保留最近几个版本；已被其他进程映射的文件删除后仍可读取"""
+        versions = sorted(
+            (name[len("gallery-"):-len(".npy")] for name in os.listdir(self.snapshot_dir)
+             if name.startswith("gallery-") and name.endswith(".npy")),
+            key=int
+        )
+        for version in versions[:-self.snapshot_keep]:
+            for suffix in (".npy", ".json"):
+                try:
+                    os.unlink(os.path.join(self.snapshot_dir, f"gallery-{version}{suffix}"))
+                except FileNotFoundError:
+                    pass
+
+
+# 创建全局服务实例
+voiceprint_gallery_service = VoiceprintGalleryService(
+    snapshot_dir=settings.GALLERY_SNAPSHOT_DIR,
+    snapshot_interval=settings.GALLERY_SNAPSHOT_INTERVAL,
+    snapshot_keep=settings.GALLERY_SNAPSHOT_KEEP,
+    sync_interval=settings.GALLERY_SYNC_INTERVAL,
+    sync_overlap=settings.GALLERY_SYNC_OVERLAP,
+    redis_url=settings.REDIS_URL
+)
@@ -8,18 +8,28 @@ from speechbrain.inference.speaker import SpeakerRecognition
 from speechbrain.inference.encoders import MelSpectrogramEncoder
 from scipy import signal
 from scipy.stats import entropy
-from typing import List, Dict, Tuple, Optional
+from typing import Dict, Tuple, Optional
 import asyncio
-import io
-import tempfile
+import uuid
 import os
 from loguru import logger
 
 from app.core.config import settings
-from app.core.minio_client import minio_client
+from app.services.audio_object_service import audio_object_service
+from app.core.concurrency import inference_limiter, run_inference, PRIORITY_INTERACTIVE
+from app.core.deadline import Deadline, checkpoint
+from app.core.cache import embedding_cache
+from app.core.log_writer import log_writer
+from app.core.singleflight import embedding_flight
+from app.utils.hashing import audio_digest
+from app.utils.audio_codec import decode_pcm
+from app.services.storage_policy import storage_policy
+from app.services.voiceprint_counter_service import voiceprint_counter_service
+from app.services.voiceprint_gallery_service import voiceprint_gallery_service
+from app.core.exceptions import SampleLimitExceededError
 from app.schemas.voiceprint import VoiceprintFeature, VoiceprintMatch
-from app.models.database import get_db
-from app.models.voiceprint import VoiceprintModel
+from app.models.database import AsyncSessionLocal
+from app.models.voiceprint import VoiceprintModel, RecognitionLogModel
 from app.models.employee import EmployeeModel
 
 
@@ -101,25 +111,61 @@ class VoiceprintService:
         """检查模型状态"""
         return self._model is not None
     
-    async def extract_voiceprint(self, audio_data: bytes, employee_id: int) -> VoiceprintFeature:
-        """提取声纹特征"""
+    async def extract_voiceprint(
+        self,
+        audio_data: bytes,
+        employee_id: int,
+        deadline: Optional[Deadline] = None,
+        priority: str = PRIORITY_INTERACTIVE
+    ) -> VoiceprintFeature:
+        """提取声纹特征（先查内容哈希缓存，未命中时合并相同内容的并发请求）"""
         if not self._model:
             raise RuntimeError("声纹识别模型未初始化，请先运行模型下载脚本: python scripts/download_models.py")
         
+        cache_key = audio_digest(audio_data, settings.VOICEPRINT_MODEL)
+        if embedding_cache is not None:
+            cached = await embedding_cache.get(cache_key)
+            if cached is not None:
+                return VoiceprintFeature(**cached)
+        
+        return await embedding_flight.do(
+            cache_key,
+            lambda: self._extract_uncached(audio_data, cache_key, deadline, priority),
+            timeout=deadline.remaining() if deadline else None
+        )
+    
+    async def _extract_uncached(
+        self,
+        audio_data: bytes,
+        cache_key: str,
+        deadline: Optional[Deadline],
+        priority: str
+    ) -> VoiceprintFeature:
+        """在推理准入控制下提取特征并写入缓存"""
+        async with inference_limiter.slot(priority, timeout=deadline.remaining() if deadline else None):
+            feature = await self._run_extraction(audio_data, deadline)
+        
+        if embedding_cache is not None:
+            await embedding_cache.set(cache_key, feature.model_dump())
+        return feature
+    
+    async def _run_extraction(self, audio_data: bytes, deadline: Optional[Deadline] = None) -> VoiceprintFeature:
+        """声纹提取流水线：预处理 -> 质量评估 -> 特征提取"""
         try:
             # 1. 音频预处理
-            audio_tensor, sr = await self._preprocess_audio(audio_data)
+            await checkpoint(deadline, "decode")
+            audio_tensor, sr = await self._preprocess_audio(audio_data, deadline)
             
             # 2. 质量评估
-            quality_score = await self._assess_audio_quality(audio_tensor, sr)
+            await checkpoint(deadline, "quality")
+            quality_score = await run_inference(self._assess_audio_quality, audio_tensor, sr)
             
             if quality_score < settings.AUDIO_QUALITY_THRESHOLD:
                 raise ValueError(f"音频质量过低 ({quality_score:.2f})，请重新录制")
             
             # 3. 提取声纹特征
-            with torch.no_grad():
-                embedding = self._model.encode_batch(audio_tensor.unsqueeze(0))
-                embedding = embedding.squeeze().cpu().numpy()
+            await checkpoint(deadline, "inference")
+            embedding = await run_inference(self._encode, audio_tensor)
             
             # 4. 归一化特征
             embedding = self._normalize_embedding(embedding)
@@ -136,17 +182,42 @@ class VoiceprintService:
             logger.error(f"Voiceprint extraction failed: {e}")
             raise
     
-    async def register_voiceprint(self, employee_id: int, audio_data: bytes, sample_index: int) -> str:
+    def _encode(self, audio_tensor: torch.Tensor) -> np.ndarray:
+        """模型前向，返回声纹向量（在推理线程池中执行）"""
+        with torch.no_grad():
+            embedding = self._model.encode_batch(audio_tensor.unsqueeze(0))
+            return embedding.squeeze().cpu().numpy()
+    
+    async def register_voiceprint(
+        self,
+        employee_id: int,
+        audio_data: bytes,
+        sample_index: int,
+        deadline: Optional[Deadline] = None
+    ) -> str:
         """注册声纹"""
         try:
             # 提取声纹特征
-            feature = await self.extract_voiceprint(audio_data, employee_id)
+            feature = await self.extract_voiceprint(audio_data, employee_id, deadline)
             
-            # 上传音频到MinIO
-            audio_url = await self._upload_audio(audio_data, f"voiceprint_{employee_id}_{sample_index}.wav")
+            # 上传音频到MinIO（注册样本始终保存）
+            await checkpoint(deadline, "upload")
+            audio_url = None
+            if storage_policy.should_store_enrollment():
+                audio_url = await self._upload_audio(audio_data, codec=settings.ARCHIVE_CODEC_ENROLLMENT)
             
-            # 保存到数据库
-            voiceprint_id = await self._save_voiceprint(employee_id, feature, audio_url)
+            # 保存到数据库；未保存成功（超出上限、超时、断开、数据库错误）时释放音频引用
+            saved = False
+            try:
+                await checkpoint(deadline, "db")
+                voiceprint_id = await self._save_voiceprint(employee_id, feature, audio_url)
+                saved = True
+            finally:
+                if not saved and audio_url:
+                    try:
+                        await asyncio.shield(audio_object_service.release_url(audio_url))
+                    except Exception as e:
+                        logger.warning(f"Failed to release audio object {audio_url}: {e}")
             
             logger.info(f"Voiceprint registered for employee {employee_id}, sample {sample_index}")
             return voiceprint_id
@@ -155,44 +226,29 @@ class VoiceprintService:
             logger.error(f"Voiceprint registration failed: {e}")
             raise
     
-    async def recognize_voiceprint(self, audio_data: bytes, meeting_id: Optional[int] = None) -> VoiceprintMatch:
-        """声纹识别"""
+    async def recognize_voiceprint(
+        self,
+        audio_data: bytes,
+        meeting_id: Optional[int] = None,
+        deadline: Optional[Deadline] = None,
+        priority: str = PRIORITY_INTERACTIVE,
+        store_audio: bool = True
+    ) -> VoiceprintMatch:
+        """声纹识别（store_audio=False 时不保存音频，用于已在对象存储中的录音分段）"""
         try:
             # 提取当前音频特征
-            current_feature = await self.extract_voiceprint(audio_data, 0)
+            current_feature = await self.extract_voiceprint(audio_data, 0, deadline, priority)
             
-            # 获取所有活跃的声纹特征
-            voiceprints = await self._get_active_voiceprints()
+            # 在内存声纹库中计算余弦相似度，只保留相似度最高的 VOICEPRINT_TOP_K 个候选
+            all_matches = await voiceprint_gallery_service.search(
+                current_feature.embedding, settings.VOICEPRINT_TOP_K
+            )
             
-            if not voiceprints:
+            if not all_matches:
                 raise ValueError("No active voiceprints found")
             
-            # 计算相似度
-            best_match = None
-            best_similarity = 0
-            all_matches = []
-            
-            for vp in voiceprints:
-                # 计算余弦相似度
-                similarity = self._calculate_similarity(
-                    np.array(current_feature.embedding),
-                    np.array(vp.feature_data)
-                )
-                
-                match_info = {
-                    "voiceprint_id": vp.voiceprint_id,
-                    "employee_id": vp.employee_id,
-                    "similarity": float(similarity)
-                }
-                all_matches.append(match_info)
-                
-                if similarity > best_similarity:
-                    best_similarity = similarity
-                    best_match = match_info
-            
-            # 上传音频
-            import time
-            audio_url = await self._upload_audio(audio_data, f"recognition_{int(time.time())}.wav")
+            best_match = all_matches[0]
+            best_similarity = max(best_match["similarity"], 0.0)
             
             # 生成结果
             threshold = settings.VOICEPRINT_THRESHOLD
@@ -204,13 +260,17 @@ class VoiceprintService:
                 employee_id=best_match["employee_id"] if is_identified else None,
                 confidence=best_similarity,
                 threshold=threshold,
-                audio_url=audio_url,
                 all_matches=all_matches,
                 processing_time=0  # 实际应该计算处理时间
             )
             
+            # 按存储策略决定是否保存音频
+            await checkpoint(deadline, "upload")
+            if store_audio and await storage_policy.should_store_recognition(result, meeting_id):
+                result.audio_url = await self._upload_audio(audio_data)
+            
             # 记录识别日志
-            await self._log_recognition(result, audio_data)
+            self._log_recognition(result, current_feature.duration)
             
             return result
             
@@ -218,36 +278,21 @@ class VoiceprintService:
             logger.error(f"Voiceprint recognition failed: {e}")
             raise
     
-    async def _preprocess_audio(self, audio_data: bytes) -> Tuple[torch.Tensor, int]:
+    async def _preprocess_audio(self, audio_data: bytes, deadline: Optional[Deadline] = None) -> Tuple[torch.Tensor, int]:
         """音频预处理"""
         try:
-            # 使用tempfile处理音频数据
-            with tempfile.NamedTemporaryFile(delete=False, suffix=".wav") as temp_file:
-                temp_file.write(audio_data)
-                temp_file_path = temp_file.name
+            # 在内存中解码为单声道float32并重采样
+            audio, sr = await run_inference(decode_pcm, audio_data, settings.SAMPLE_RATE)
+            
+            # 音频增强
+            await checkpoint(deadline, "enhance")
+            audio = await run_inference(self._enhance_audio, audio)
+            
+            # 转换为tensor
+            audio_tensor = torch.from_numpy(audio).float()
+            
+            return audio_tensor, sr
             
-            try:
-                # 加载音频
-                audio, sr = librosa.load(temp_file_path, sr=settings.SAMPLE_RATE, mono=True)
-                
-                # 重采样到目标采样率
-                if sr != settings.SAMPLE_RATE:
-                    audio = librosa.resample(audio, orig_sr=sr, target_sr=settings.SAMPLE_RATE)
-                    sr = settings.SAMPLE_RATE
-                
-                # 音频增强
-                audio = self._enhance_audio(audio)
-                
-                # 转换为tensor
-                audio_tensor = torch.from_numpy(audio).float()
-                
-                return audio_tensor, sr
-                
-            finally:
-                # 清理临时文件
-                if os.path.exists(temp_file_path):
-                    os.unlink(temp_file_path)
-                    
         except Exception as e:
             logger.error(f"Audio preprocessing failed: {e}")
             raise
@@ -285,7 +330,7 @@ class VoiceprintService:
             logger.warning(f"Audio enhancement failed, using original: {e}")
             return audio
     
-    async def _assess_audio_quality(self, audio_tensor: torch.Tensor, sr: int) -> float:
+    def _assess_audio_quality(self, audio_tensor: torch.Tensor, sr: int) -> float:
         """评估音频质量"""
         try:
             audio = audio_tensor.numpy()
@@ -387,53 +432,20 @@ class VoiceprintService:
         )
         return float(similarity)
     
-    async def _upload_audio(self, audio_data: bytes, filename: str) -> str:
-        """上传音频到MinIO"""
-        try:
-            import time
-            timestamp = int(time.time())
-            object_name = f"audio/{timestamp}_{filename}"
-            
-            # === 调试日志开始 ===
-            logger.info(f"[DEBUG] MINIO_ENDPOINT={settings.MINIO_ENDPOINT}")
-            logger.info(f"[DEBUG] MINIO_BUCKET={settings.MINIO_BUCKET}")
-            logger.info(f"[DEBUG] MINIO_SECURE={settings.MINIO_SECURE}")
-            logger.info(f"[DEBUG] computed minio_url={settings.minio_url}")
-            # === 调试日志结束 ===
-            
-            # 检查关键配置项是否为 None
-            if settings.minio_url is None:
-                logger.error("[ERROR] settings.minio_url is None")
-                raise ValueError("MinIO URL is not configured")
-            if settings.MINIO_BUCKET is None:
-                logger.error("[ERROR] settings.MINIO_BUCKET is None")
-                raise ValueError("MinIO Bucket is not configured")
-            
-            minio_client.put_object(
-                bucket_name=settings.MINIO_BUCKET,
-                object_name=object_name,
-                data=io.BytesIO(audio_data),
-                length=len(audio_data),
-                content_type="audio/wav"
-            )
-            
-            audio_url = f"{settings.minio_url}/{settings.MINIO_BUCKET}/{object_name}"
-            # 确保 audio_url 不是 None
-            if audio_url is None:
-                logger.error("[ERROR] Generated audio_url is None")
-                raise ValueError("Generated audio_url is None")
-                
-            logger.info(f"[DEBUG] Generated audio_url={audio_url}")
-            return audio_url
-            
-        except Exception as e:
-            logger.error(f"Failed to upload audio to MinIO: {e}")
-            raise
+    async def _upload_audio(self, audio_data: bytes, codec: Optional[str] = None) -> str:
+        """按内容哈希保存音频（相同音频只上传一次），立即返回对象URL"""
+        return await audio_object_service.store(audio_data, "audio", codec)
     
     async def _save_voiceprint(self, employee_id: int, feature: VoiceprintFeature, audio_url: str) -> str:
-        """保存声纹到数据库"""
-        async with get_db() as db:
+        """保存声纹到数据库，员工声纹计数在同一事务中原子更新（超出上限时抛出异常）"""
+        voiceprint_id = str(uuid.uuid4())
+        async with AsyncSessionLocal() as db:
+            if not await voiceprint_counter_service.increment(db, employee_id):
+                await db.rollback()
+                raise SampleLimitExceededError(voiceprint_counter_service.max_samples)
+            
             voiceprint_model = VoiceprintModel(
+                voiceprint_id=voiceprint_id,
                 employee_id=employee_id,
                 audio_sample_url=audio_url,
                 feature_data=feature.embedding,
@@ -446,42 +458,24 @@ class VoiceprintService:
             
             db.add(voiceprint_model)
             await db.commit()
-            await db.refresh(voiceprint_model)
-            
-            return voiceprint_model.voiceprint_id
-    
-    async def _get_active_voiceprints(self) -> List[VoiceprintModel]:
-        """获取所有活跃的声纹"""
-        async with get_db() as db:
-            from sqlalchemy import select
-            stmt = select(VoiceprintModel).where(VoiceprintModel.is_active == True)
-            result = await db.execute(stmt)
-            return result.scalars().all()
+        
+        await voiceprint_gallery_service.upsert(voiceprint_id, employee_id, feature.embedding)
+        return voiceprint_id
     
-    async def _log_recognition(self, result: VoiceprintMatch, audio_data: bytes):
-        """记录识别日志"""
-        try:
-            async with get_db() as db:
-                from app.models.recognition_log import RecognitionLogModel
-                
-                log_model = RecognitionLogModel(
-                    employee_id=result.employee_id,
-                    audio_url=result.audio_url,
-                    audio_duration=0,  # 需要计算
-                    matched_voiceprint_id=result.voiceprint_id,
-                    confidence_score=result.confidence,
-                    threshold_used=result.threshold,
-                    is_success=result.success,
-                    processing_time=result.processing_time,
-                    model_version=settings.VOICEPRINT_MODEL,
-                    top_candidates=result.all_matches
-                )
-                
-                db.add(log_model)
-                await db.commit()
-                
-        except Exception as e:
-            logger.error(f"Failed to log recognition: {e}")
+    def _log_recognition(self, result: VoiceprintMatch, audio_duration: float):
+        """记录识别日志（写入批量日志队列）"""
+        log_writer.submit(RecognitionLogModel, {
+            "employee_id": result.employee_id,
+            "voiceprint_id": result.voiceprint_id,
+            "audio_url": result.audio_url,
+            "audio_duration": audio_duration,
+            "confidence_score": result.confidence,
+            "threshold_used": result.threshold,
+            "is_success": result.success,
+            "top_candidates": result.all_matches,
+            "model_version": settings.VOICEPRINT_MODEL,
+            "processing_time": result.processing_time
+        })
 
 
 # 创建全局服务实例
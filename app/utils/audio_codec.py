@@ -0,0 +1,140 @@
+"""
+音频归档编码
+注册样本使用无损FLAC，识别/情绪片段使用Opus（Ogg容器），显著降低对象存储占用和上传流量。
+读取时按文件头自动识别格式并解码回WAV，调用方无需关心对象的实际编码。
+decode_pcm 供推理流水线在内存中直接解码上传的音频，不再经过临时文件。
+"""
+
+import io
+import os
+import tempfile
+from dataclasses import dataclass
+from math import gcd
+from typing import Dict, Tuple
+
+import numpy as np
+import soundfile as sf
+from loguru import logger
+
+from app.core.metrics import metrics
+
+CODEC_WAV = "wav"
+CODEC_FLAC = "flac"
+CODEC_OPUS = "opus"
+
+# 编码 -> (扩展名, Content-Type)
+CODEC_FORMATS = {
+    CODEC_WAV: ("wav", "audio/wav"),
+    CODEC_FLAC: ("flac", "audio/flac"),
+    CODEC_OPUS: ("opus", "audio/ogg"),
+}
+
+# 允许出现在对象键中的上传音频扩展名
+UPLOAD_EXTENSIONS = (".wav", ".mp3", ".m4a", ".aac", ".amr", ".flac", ".ogg", ".opus", ".webm")
+
+# Opus仅支持以下采样率
+OPUS_SAMPLE_RATES = (8000, 12000, 16000, 24000, 48000)
+
+
+def upload_extension(filename: str) -> str:
+    """客户端文件名的扩展名，不在白名单内时使用.wav"""
+    extension = os.path.splitext(filename or "")[1].lower()
+    return extension if extension in UPLOAD_EXTENSIONS else ".wav"
+
+
+@dataclass
+class ArchivedAudio:
+    """归档编码结果"""
+    data: bytes
+    codec: str
+    content_type: str
+    metadata: Dict[str, str]
+
+
+def codec_extension(codec: str) -> str:
+    """编码对应的对象扩展名"""
+    return CODEC_FORMATS.get(codec, CODEC_FORMATS[CODEC_WAV])[0]
+
+
+def _resample_for_opus(audio: np.ndarray, sr: int):
+    if sr in OPUS_SAMPLE_RATES:
+        return audio, sr
+    from scipy import signal
+    target = 48000 if sr > 24000 else next(rate for rate in OPUS_SAMPLE_RATES if rate >= sr)
+    factor = gcd(sr, target)
+    return signal.resample_poly(audio, target // factor, sr // factor, axis=0), target
+
+
+def encode_archive(audio_data: bytes, codec: str) -> ArchivedAudio:
+    """将上传的音频编码为归档格式；无法解码或编码失败时原样保存"""
+    original = ArchivedAudio(
+        data=audio_data,
+        codec=CODEC_WAV,
+        content_type=CODEC_FORMATS[CODEC_WAV][1],
+        metadata={"codec": CODEC_WAV, "original-size": str(len(audio_data))}
+    )
+    if codec not in (CODEC_FLAC, CODEC_OPUS):
+        return original
+
+    try:
+        audio, sr = sf.read(io.BytesIO(audio_data), dtype="float32", always_2d=False)
+        duration = len(audio) / sr if sr else 0.0
+
+        buffer = io.BytesIO()
+        if codec == CODEC_FLAC:
+            sf.write(buffer, audio, sr, format="FLAC", subtype="PCM_16")
+        else:
+            audio, sr = _resample_for_opus(audio, sr)
+            sf.write(buffer, audio, sr, format="OGG", subtype="OPUS")
+
+        return ArchivedAudio(
+            data=buffer.getvalue(),
+            codec=codec,
+            content_type=CODEC_FORMATS[codec][1],
+            metadata={
+                "codec": codec,
+                "duration": f"{duration:.3f}",
+                "sample-rate": str(sr),
+                "original-size": str(len(audio_data)),
+            }
+        )
+    except Exception as e:
+        logger.warning(f"Archive encoding to {codec} failed, storing original audio: {e}")
+        return original
+
+
+def decode_archive(data: bytes) -> bytes:
+    """将归档对象解码为16位PCM WAV；本身就是WAV时原样返回"""
+    if data[:4] == b"RIFF":
+        return data
+    audio, sr = sf.read(io.BytesIO(data), dtype="float32", always_2d=False)
+    buffer = io.BytesIO()
+    sf.write(buffer, audio, sr, format="WAV", subtype="PCM_16")
+    return buffer.getvalue()
+
+
+def decode_pcm(audio_data: bytes, target_sr: int) -> Tuple[np.ndarray, int]:
+    """在内存中解码为单声道float32并重采样到target_sr。
+    soundfile无法识别的格式（mp3/aac等）回退到librosa临时文件解码"""
+    try:
+        audio, sr = sf.read(io.BytesIO(audio_data), dtype="float32", always_2d=False)
+        if audio.ndim > 1:
+            audio = audio.mean(axis=1, dtype=np.float32)
+        if sr != target_sr:
+            from scipy import signal
+            factor = gcd(sr, target_sr)
+            audio = signal.resample_poly(audio, target_sr // factor, sr // factor).astype(np.float32)
+            sr = target_sr
+    except Exception:
+        import librosa
+        with tempfile.NamedTemporaryFile(delete=False) as temp_file:
+            temp_file.write(audio_data)
+            temp_file_path = temp_file.name
+        try:
+            audio, sr = librosa.load(temp_file_path, sr=target_sr, mono=True)
+        finally:
+            os.unlink(temp_file_path)
+
+    # 单次请求同时存在的两份数据：原始字节 + 解码后的样本
+    metrics.observe("ingest.peak_bytes", len(audio_data) + audio.nbytes)
+    return audio, sr
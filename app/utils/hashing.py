@@ -0,0 +1,15 @@
+"""
+音频内容哈希
+相同字节内容 + 相同模型版本得到相同的摘要，用作推理结果缓存和请求合并的键
+"""
+
+import hashlib
+
+
+def audio_digest(audio_data: bytes, model_name: str = "") -> str:
+    """计算音频内容摘要（SHA-256），model_name 参与计算以便模型升级后自动失效"""
+    hasher = hashlib.sha256()
+    hasher.update(model_name.encode("utf-8"))
+    hasher.update(b"\x00")
+    hasher.update(audio_data)
+    return hasher.hexdigest()
@@ -0,0 +1,51 @@
+"""
+SQL端直方图与近似分位数
+用 SUM(CASE WHEN col <= bound ...) 在一次聚合查询中得到各桶的累计计数，
+再在桶内线性插值估算分位数，数据不需要传回应用。
+"""
+
+from typing import List, Optional, Sequence
+
+from sqlalchemy import case, func
+
+# 处理时间（秒）的桶上界
+PROCESSING_TIME_BUCKETS = (0.05, 0.1, 0.2, 0.5, 1.0, 2.0, 5.0, 10.0, 30.0)
+
+
+def cumulative_bucket_columns(column, bounds: Sequence[float], prefix: str) -> List:
+    """生成各桶累计计数的聚合列：{prefix}_{i} = COUNT(column <= bounds[i])"""
+    return [
+        func.sum(case((column <= bound, 1), else_=0)).label(f"{prefix}_{index}")
+        for index, bound in enumerate(bounds)
+    ]
+
+
+def approx_percentile(
+    q: float,
+    bounds: Sequence[float],
+    cumulative: Sequence[int],
+    total: int,
+    minimum: Optional[float],
+    maximum: Optional[float]
+) -> float:
+    """由累计桶计数估算分位数 (q: 0-1)，结果限制在[min, max]之间"""
+    if not total:
+        return 0.0
+    minimum = float(minimum or 0.0)
+    maximum = float(maximum or 0.0)
+    target = q * total
+    lower_bound, lower_count = minimum, 0
+    for bound, count in zip(bounds, cumulative):
+        count = int(count or 0)
+        if count >= target:
+            upper_bound = min(max(bound, minimum), maximum)
+            if count == lower_count:
+                return upper_bound
+            fraction = (target - lower_count) / (count - lower_count)
+            return max(minimum, lower_bound + (upper_bound - lower_bound) * fraction)
+        lower_bound, lower_count = max(bound, minimum), count
+    # 落在最后一个桶之外
+    if total == lower_count:
+        return maximum
+    fraction = (target - lower_count) / (total - lower_count)
+    return lower_bound + (maximum - lower_bound) * fraction
@@ -0,0 +1,94 @@
+"""
+游标（keyset）分页
+列表按 (created_at, id) 倒序，下一页条件为 (created_at, id) < 上一页最后一行，
+配合 (过滤列, created_at) 复合索引，任意一页都只读取 limit+1 行，不再像 OFFSET 那样扫描并丢弃前面的行。
+总数用 COUNT 查询并短时缓存，翻页时不会每页重复计数。
+"""
+
+import base64
+import json
+from datetime import datetime
+from typing import Any, List, Optional, Sequence, Tuple
+
+from sqlalchemy import and_, func, or_, select
+
+from app.core.cache import ResultCache
+from app.core.config import settings
+
+
+class InvalidCursorError(ValueError):
+    """游标无法解析"""
+
+
+def encode_cursor(created_at: Optional[datetime], row_id: Any) -> str:
+    """把最后一行的排序键编码为不透明游标"""
+    payload = json.dumps([created_at.isoformat() if created_at else None, row_id], separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[Optional[datetime], Any]:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        created_at, row_id = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        return (datetime.fromisoformat(created_at) if created_at else None), row_id
+    except Exception as e:
+        raise InvalidCursorError(f"Invalid cursor: {cursor}") from e
+
+
+def clamp_limit(limit: int) -> int:
+    return max(1, min(limit, settings.PAGINATION_MAX_LIMIT))
+
+
+def keyset_page(stmt, created_column, id_column, cursor: Optional[str], limit: int):
+    """为查询加上游标条件、倒序排序和 limit+1（多取一行用于判断是否还有下一页）"""
+    if cursor:
+        created_at, row_id = decode_cursor(cursor)
+        if created_at is None:
+            stmt = stmt.where(created_column.is_(None), id_column < row_id)
+        else:
+            stmt = stmt.where(or_(
+                created_column < created_at,
+                and_(created_column == created_at, id_column < row_id),
+                created_column.is_(None)
+            ))
+    return stmt.order_by(created_column.desc(), id_column.desc()).limit(limit + 1)
+
+
+def split_page(rows: Sequence, limit: int, key) -> Tuple[List, Optional[str]]:
+    """截取本页并生成下一页游标；key(row) 返回 (created_at, id)"""
+    rows = list(rows)
+    if len(rows) <= limit:
+        return rows, None
+    rows = rows[:limit]
+    return rows, encode_cursor(*key(rows[-1]))
+
+
+def _build_count_cache() -> Optional[ResultCache]:
+    if settings.PAGINATION_COUNT_CACHE_TTL <= 0:
+        return None
+    return ResultCache(
+        name="page_count",
+        maxsize=settings.PAGINATION_COUNT_CACHE_MAX_ENTRIES,
+        ttl=settings.PAGINATION_COUNT_CACHE_TTL,
+        redis_url=settings.REDIS_URL
+    )
+
+
+count_cache = _build_count_cache()
+
+
+async def cached_count(db, cache_key: str, column, *conditions) -> int:
+    """COUNT(column) WHERE conditions，结果按cache_key短时缓存（允许短暂不精确）"""
+    if count_cache is not None:
+        cached = await count_cache.get(cache_key)
+        if cached is not None:
+            return cached["count"]
+
+    stmt = select(func.count(column))
+    if conditions:
+        stmt = stmt.where(*conditions)
+    count = (await db.execute(stmt)).scalar() or 0
+
+    if count_cache is not None:
+        await count_cache.set(cache_key, {"count": count})
+    return count
@@ -45,7 +45,8 @@ CREATE TABLE IF NOT EXISTS employees (
     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
     updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
     INDEX idx_employee_code (employee_code),
-    INDEX idx_email (email)
+    INDEX idx_email (email),
+    INDEX idx_employee_created (created_at)
 );
 
 -- 声纹表
@@ -71,7 +72,10 @@ CREATE TABLE IF NOT EXISTS voiceprints (
     FOREIGN KEY (employee_id) REFERENCES employees(employee_id) ON DELETE CASCADE,
     INDEX idx_employee_id (employee_id),
     INDEX idx_is_active (is_active),
-    INDEX idx_created_at (created_at)
+    INDEX idx_created_at (created_at),
+    INDEX idx_voiceprint_employee_created (employee_id, is_active, created_at),
+    INDEX idx_voiceprint_active_created (is_active, created_at),
+    INDEX idx_voiceprint_updated (updated_at)
 );
 
 -- 情绪检测记录表
@@ -101,7 +105,8 @@ CREATE TABLE IF NOT EXISTS emotion_detections (
     INDEX idx_employee_id (employee_id),
     INDEX idx_meeting_id (meeting_id),
     INDEX idx_dominant_emotion (dominant_emotion),
-    INDEX idx_created_at (created_at)
+    INDEX idx_created_at (created_at),
+    INDEX idx_detection_employee_created (employee_id, created_at, id)
 );
 
 -- 情绪反馈表
@@ -136,10 +141,31 @@ CREATE TABLE IF NOT EXISTS emotion_summaries (
     model_performance JSON,
     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
     updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+    UNIQUE KEY uk_summary_type_date (summary_type, summary_date),
     INDEX idx_summary_date (summary_date),
     INDEX idx_summary_type (summary_type)
 );
 
+-- 增量汇总高水位表
+CREATE TABLE IF NOT EXISTS rollup_watermarks (
+    name VARCHAR(50) PRIMARY KEY,
+    last_id INT NOT NULL DEFAULT 0,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP
+);
+
+-- 每日有检测记录的员工（随汇总水位维护，用于周期去重员工数）
+CREATE TABLE IF NOT EXISTS emotion_daily_employees (
+    summary_date VARCHAR(10) NOT NULL,
+    employee_id INT NOT NULL,
+    PRIMARY KEY (summary_date, employee_id)
+);
+
+-- 已有检测记录的回填
+INSERT IGNORE INTO emotion_daily_employees (summary_date, employee_id)
+SELECT DISTINCT DATE_FORMAT(created_at, '%Y-%m-%d'), employee_id
+FROM emotion_detections
+WHERE employee_id IS NOT NULL;
+
 -- 情绪预警表
 CREATE TABLE IF NOT EXISTS emotion_alerts (
     id INT AUTO_INCREMENT PRIMARY KEY,
@@ -241,6 +267,59 @@ CREATE TABLE IF NOT EXISTS meetings (
     INDEX idx_scheduled_start (scheduled_start)
 );
 
+-- 会议录音表
+CREATE TABLE IF NOT EXISTS meeting_recordings (
+    recording_id VARCHAR(64) PRIMARY KEY,
+    meeting_id INT NOT NULL,
+    object_key TEXT NOT NULL,
+    filename VARCHAR(255),
+    content_type VARCHAR(100),
+    file_size BIGINT NOT NULL,
+    upload_id VARCHAR(255),
+    part_size BIGINT,
+    status VARCHAR(20) NOT NULL DEFAULT 'uploading',
+    job_id VARCHAR(64),
+    duration FLOAT,
+    error_message TEXT,
+    created_by INT NOT NULL,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+    uploaded_at TIMESTAMP NULL,
+    FOREIGN KEY (meeting_id) REFERENCES meetings(meeting_id) ON DELETE CASCADE,
+    INDEX idx_meeting_id (meeting_id),
+    INDEX idx_status (status)
+);
+
+-- 会议发言记录表
+CREATE TABLE IF NOT EXISTS speech_records (
+    id INT AUTO_INCREMENT PRIMARY KEY,
+    meeting_id INT NOT NULL,
+    employee_id INT,
+    audio_url TEXT,
+    confidence_score FLOAT,
+    start_time TIMESTAMP NULL,
+    end_time TIMESTAMP NULL,
+    duration FLOAT,
+    is_identified BOOLEAN DEFAULT TRUE,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    FOREIGN KEY (meeting_id) REFERENCES meetings(meeting_id) ON DELETE CASCADE,
+    FOREIGN KEY (employee_id) REFERENCES employees(employee_id) ON DELETE SET NULL,
+    INDEX idx_meeting_id (meeting_id),
+    INDEX idx_employee_id (employee_id)
+);
+
+-- 音频对象引用计数表（内容寻址存储）
+CREATE TABLE IF NOT EXISTS audio_objects (
+    object_key VARCHAR(255) PRIMARY KEY,
+    content_hash VARCHAR(64) NOT NULL,
+    codec VARCHAR(10) NOT NULL,
+    original_size BIGINT NOT NULL,
+    ref_count INT NOT NULL DEFAULT 1,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+    INDEX idx_content_hash (content_hash)
+);
+
 -- 识别日志表
 CREATE TABLE IF NOT EXISTS recognition_logs (
     log_id INT AUTO_INCREMENT PRIMARY KEY,
@@ -266,6 +345,46 @@ CREATE TABLE IF NOT EXISTS recognition_logs (
     INDEX idx_created_at (created_at)
 );
 
+-- 批量推理任务表
+CREATE TABLE IF NOT EXISTS inference_jobs (
+    job_id VARCHAR(64) PRIMARY KEY,
+    job_type VARCHAR(20) NOT NULL,
+    status VARCHAR(20) NOT NULL DEFAULT 'pending',
+    employee_id INT,
+    meeting_id INT,
+    created_by INT NOT NULL,
+    total_items INT NOT NULL DEFAULT 0,
+    completed_items INT NOT NULL DEFAULT 0,
+    failed_items INT NOT NULL DEFAULT 0,
+    error_message TEXT,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+    started_at TIMESTAMP NULL,
+    finished_at TIMESTAMP NULL,
+    FOREIGN KEY (employee_id) REFERENCES employees(employee_id) ON DELETE SET NULL,
+    INDEX idx_status (status),
+    INDEX idx_created_by (created_by)
+);
+
+-- 批量推理任务条目表（持久化工作队列）
+CREATE TABLE IF NOT EXISTS inference_job_items (
+    id INT AUTO_INCREMENT PRIMARY KEY,
+    job_id VARCHAR(64) NOT NULL,
+    item_index INT NOT NULL,
+    object_key TEXT NOT NULL,
+    filename VARCHAR(255),
+    status VARCHAR(20) NOT NULL DEFAULT 'pending',
+    attempts INT NOT NULL DEFAULT 0,
+    claimed_at TIMESTAMP NULL,
+    result JSON,
+    error_message TEXT,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+    FOREIGN KEY (job_id) REFERENCES inference_jobs(job_id) ON DELETE CASCADE,
+    INDEX idx_job_items_status (status, id),
+    INDEX idx_job_items_job (job_id, item_index)
+);
+
 -- 创建外键约束
 ALTER TABLE employees ADD CONSTRAINT fk_organized_meetings 
     FOREIGN KEY (employee_id) REFERENCES employees(employee_id);
@@ -0,0 +1,154 @@
+#!/usr/bin/env python3
+"""
+测试推理结果缓存的本地LRU和批量读写（app.core.cache）
+"""
+
+import pytest
+
+from app.core import cache as cache_module
+from app.core.cache import LRUCache, ResultCache
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    fake = FakeClock()
+    monkeypatch.setattr(cache_module.time, "monotonic", fake)
+    return fake
+
+
+def test_get_missing_returns_default():
+    cache = LRUCache(maxsize=2)
+    assert cache.get("missing") is None
+    assert cache.get("missing", "default") == "default"
+
+
+def test_evicts_least_recently_used():
+    cache = LRUCache(maxsize=2)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    # 读取a使其成为最近使用，插入c时淘汰b
+    assert cache.get("a") == 1
+    cache.set("c", 3)
+    assert len(cache) == 2
+    assert cache.get("b") is None
+    assert cache.get("a") == 1
+    assert cache.get("c") == 3
+
+
+def test_overwrite_refreshes_recency():
+    cache = LRUCache(maxsize=2)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.set("a", 10)
+    cache.set("c", 3)
+    assert cache.get("a") == 10
+    assert cache.get("b") is None
+
+
+def test_entries_expire_after_ttl(clock):
+    cache = LRUCache(maxsize=4, ttl=10)
+    cache.set("a", 1)
+    clock.now += 9.9
+    assert cache.get("a") == 1
+    clock.now += 0.1
+    assert cache.get("a") is None
+    # 过期条目在读取时被移除
+    assert len(cache) == 0
+
+
+def test_per_entry_ttl_overrides_default(clock):
+    cache = LRUCache(maxsize=4, ttl=10)
+    cache.set("short", 1, ttl=1)
+    cache.set("default", 2)
+    clock.now += 5
+    assert cache.get("short") is None
+    assert cache.get("default") == 2
+
+
+def test_no_ttl_never_expires(clock):
+    cache = LRUCache(maxsize=1)
+    cache.set("a", 1)
+    clock.now += 10 ** 9
+    assert cache.get("a") == 1
+
+
+def test_delete_and_clear():
+    cache = LRUCache(maxsize=4)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.delete("a")
+    cache.delete("missing")
+    assert cache.get("a") is None
+    cache.clear()
+    assert len(cache) == 0
+
+
+@pytest.mark.asyncio
+async def test_result_cache_without_redis_uses_local_lru():
+    cache = ResultCache(name="test", maxsize=2, ttl=60)
+    assert await cache.get("k") is None
+    await cache.set("k", {"value": 1})
+    assert await cache.get("k") == {"value": 1}
+    cache.delete_local("k")
+    assert await cache.get("k") is None
+
+
+class FakeRedis:
+    """记录往返次数的Redis替身"""
+
+    def __init__(self):
+        self.data = {}
+        self.round_trips = 0
+
+    async def mget(self, keys):
+        self.round_trips += 1
+        return [self.data.get(key) for key in keys]
+
+    def pipeline(self, transaction=True):
+        return FakePipeline(self)
+
+
+class FakePipeline:
+    def __init__(self, redis: FakeRedis):
+        self.redis = redis
+        self.commands = []
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        return False
+
+    def set(self, key, value, ex=None):
+        self.commands.append((key, value))
+
+    async def execute(self):
+        self.redis.round_trips += 1
+        self.redis.data.update(self.commands)
+
+
+@pytest.mark.asyncio
+async def test_result_cache_get_many_uses_one_mget():
+    cache = ResultCache(name="test", maxsize=8, ttl=60)
+    cache._redis = FakeRedis()
+    await cache.set_many({"1": {"name": "a"}, "2": {"name": "b"}})
+    assert cache._redis.round_trips == 1
+
+    cache.delete_local("1")
+    cache.delete_local("2")
+    cache._local.set("3", {"name": "c"})
+    found = await cache.get_many(["1", "2", "3", "4"])
+    assert found == {"1": {"name": "a"}, "2": {"name": "b"}, "3": {"name": "c"}}
+    # 本地命中的键不再访问Redis，其余键合并为一次MGET
+    assert cache._redis.round_trips == 2
+    # Redis命中的条目回填本地缓存
+    assert await cache.get_many(["1", "2"]) == {"1": {"name": "a"}, "2": {"name": "b"}}
+    assert cache._redis.round_trips == 2
@@ -0,0 +1,175 @@
+#!/usr/bin/env python3
+"""
+测试推理准入控制的排队顺序和槽位移交（app.core.concurrency.AdmissionController）
+"""
+
+import asyncio
+
+import pytest
+
+from app.core.concurrency import PRIORITY_BULK, PRIORITY_INTERACTIVE, AdmissionController
+from app.core.exceptions import RateLimitError, ServiceBusyError
+
+
+def _controller(max_concurrency=1, max_queue=4, queue_timeout=5.0, bulk_min_share=0.0) -> AdmissionController:
+    return AdmissionController(
+        name="test_admission",
+        max_concurrency=max_concurrency,
+        max_queue={PRIORITY_INTERACTIVE: max_queue, PRIORITY_BULK: max_queue},
+        queue_timeout={PRIORITY_INTERACTIVE: queue_timeout, PRIORITY_BULK: queue_timeout},
+        retry_after=1,
+        bulk_min_share=bulk_min_share
+    )
+
+
+async def _enqueue(controller: AdmissionController, priority: str, order: list, label: str) -> asyncio.Task:
+    """排队获取槽位，获得后记录顺序（不释放，由测试逐个释放）"""
+    async def waiter():
+        await controller.acquire(priority)
+        order.append(label)
+
+    task = asyncio.create_task(waiter())
+    # 让等待者进入队列，保证入队顺序确定
+    await asyncio.sleep(0)
+    return task
+
+
+async def _admitted(order: list, count: int):
+    """等待第count个等待者拿到移交的槽位"""
+    for _ in range(100):
+        if len(order) >= count:
+            return
+        await asyncio.sleep(0)
+    raise AssertionError(f"expected {count} admitted waiters, got {order}")
+
+
+@pytest.mark.asyncio
+async def test_admits_immediately_up_to_max_concurrency():
+    controller = _controller(max_concurrency=2)
+    await controller.acquire(PRIORITY_INTERACTIVE)
+    await controller.acquire(PRIORITY_BULK)
+    assert controller.in_flight == 2
+    assert controller.queue_depth == 0
+
+
+@pytest.mark.asyncio
+async def test_release_hands_slot_to_waiters_in_fifo_order():
+    controller = _controller()
+    await controller.acquire(PRIORITY_INTERACTIVE)
+    order = []
+    tasks = [await _enqueue(controller, PRIORITY_INTERACTIVE, order, label) for label in "abc"]
+    assert controller.queue_depth == 3
+
+    for count, expected in enumerate("abc", start=1):
+        controller.release(PRIORITY_INTERACTIVE)
+        await _admitted(order, count)
+        # 槽位直接移交，并发数始终不超过上限
+        assert controller.in_flight == 1
+        assert order[-1] == expected
+    await asyncio.gather(*tasks)
+
+    controller.release(PRIORITY_INTERACTIVE)
+    assert controller.in_flight == 0
+
+
+@pytest.mark.asyncio
+async def test_interactive_waiters_go_before_bulk():
+    controller = _controller()
+    await controller.acquire(PRIORITY_BULK)
+    order = []
+    tasks = [
+        await _enqueue(controller, PRIORITY_BULK, order, "bulk"),
+        await _enqueue(controller, PRIORITY_INTERACTIVE, order, "interactive"),
+    ]
+
+    controller.release(PRIORITY_BULK)
+    await _admitted(order, 1)
+    assert order == ["interactive"]
+    controller.release(PRIORITY_INTERACTIVE)
+    await _admitted(order, 2)
+    assert order == ["interactive", "bulk"]
+    await asyncio.gather(*tasks)
+
+
+@pytest.mark.asyncio
+async def test_new_request_does_not_jump_the_queue():
+    controller = _controller()
+    await controller.acquire(PRIORITY_INTERACTIVE)
+    order = []
+    task = await _enqueue(controller, PRIORITY_BULK, order, "queued")
+    # 有bulk在等待时新的bulk请求不能直接占用空闲槽位
+    assert not controller._can_admit_now(PRIORITY_BULK)
+    controller.release(PRIORITY_INTERACTIVE)
+    await task
+    assert order == ["queued"]
+
+
+@pytest.mark.asyncio
+async def test_bulk_min_share_prevents_starvation():
+    controller = _controller(max_concurrency=4, bulk_min_share=0.25)
+    assert controller.bulk_min_slots == 1
+    for _ in range(4):
+        await controller.acquire(PRIORITY_INTERACTIVE)
+    order = []
+    tasks = [
+        await _enqueue(controller, PRIORITY_INTERACTIVE, order, "interactive"),
+        await _enqueue(controller, PRIORITY_BULK, order, "bulk"),
+    ]
+
+    # 没有bulk在运行时，释放的槽位先保证bulk的最低份额
+    controller.release(PRIORITY_INTERACTIVE)
+    await _admitted(order, 1)
+    assert order == ["bulk"]
+    controller.release(PRIORITY_INTERACTIVE)
+    await _admitted(order, 2)
+    assert order == ["bulk", "interactive"]
+    await asyncio.gather(*tasks)
+
+
+@pytest.mark.asyncio
+async def test_full_queue_rejects_with_rate_limit():
+    controller = _controller(max_queue=1)
+    await controller.acquire(PRIORITY_INTERACTIVE)
+    task = await _enqueue(controller, PRIORITY_INTERACTIVE, [], "queued")
+    with pytest.raises(RateLimitError) as exc_info:
+        await controller.acquire(PRIORITY_INTERACTIVE)
+    assert exc_info.value.headers["Retry-After"] == "1"
+    task.cancel()
+    await asyncio.gather(task, return_exceptions=True)
+
+
+@pytest.mark.asyncio
+async def test_queue_timeout_raises_service_busy_and_leaves_queue():
+    controller = _controller(queue_timeout=0.01)
+    await controller.acquire(PRIORITY_INTERACTIVE)
+    with pytest.raises(ServiceBusyError):
+        await controller.acquire(PRIORITY_INTERACTIVE)
+    assert controller.queue_depth == 0
+    controller.release(PRIORITY_INTERACTIVE)
+    assert controller.in_flight == 0
+
+
+@pytest.mark.asyncio
+async def test_cancelled_waiter_does_not_leak_slot():
+    controller = _controller()
+    await controller.acquire(PRIORITY_INTERACTIVE)
+    order = []
+    cancelled = await _enqueue(controller, PRIORITY_INTERACTIVE, order, "cancelled")
+    waiting = await _enqueue(controller, PRIORITY_INTERACTIVE, order, "waiting")
+    cancelled.cancel()
+    await asyncio.gather(cancelled, return_exceptions=True)
+
+    controller.release(PRIORITY_INTERACTIVE)
+    await waiting
+    assert order == ["waiting"]
+    assert controller.in_flight == 1
+
+
+@pytest.mark.asyncio
+async def test_slot_context_releases_on_error():
+    controller = _controller()
+    with pytest.raises(RuntimeError):
+        async with controller.slot(PRIORITY_BULK):
+            assert controller.in_flight == 1
+            raise RuntimeError("inference failed")
+    assert controller.in_flight == 0
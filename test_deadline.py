@@ -0,0 +1,57 @@
+#!/usr/bin/env python3
+"""
+测试请求截止时间的客户端时限解析和计时起点（app.core.deadline）
+"""
+
+import time
+
+import pytest
+
+from app.core.config import settings
+from app.core.deadline import Deadline, clamp_timeout
+from app.core.exceptions import RequestTimeoutError
+
+
+def test_missing_or_invalid_header_uses_server_timeout():
+    for value in (None, "", "abc", "nan", "inf"):
+        assert clamp_timeout(value, 30.0) == 30.0
+
+
+def test_client_can_only_shorten_the_deadline():
+    assert clamp_timeout("5", 30.0) == 5.0
+    assert clamp_timeout("120", 30.0) == 30.0
+
+
+def test_zero_and_negative_are_raised_to_minimum():
+    minimum = settings.REQUEST_DEADLINE_MIN_SECONDS
+    assert clamp_timeout("0", 30.0) == minimum
+    assert clamp_timeout("-10", 30.0) == minimum
+
+
+def test_minimum_never_exceeds_server_timeout():
+    assert clamp_timeout("0", settings.REQUEST_DEADLINE_MIN_SECONDS / 2) == settings.REQUEST_DEADLINE_MIN_SECONDS / 2
+
+
+def test_zero_timeout_still_sets_a_deadline():
+    deadline = Deadline(timeout=0)
+    assert deadline.expires_at is not None
+    assert deadline.expired
+
+
+def test_no_timeout_means_no_deadline():
+    deadline = Deadline()
+    assert deadline.remaining() is None
+    assert not deadline.expired
+
+
+def test_deadline_counts_from_arrival_time():
+    # 读取上传体已经用掉的时间计入时限
+    deadline = Deadline(timeout=10, started_at=time.monotonic() - 8)
+    assert deadline.remaining() == pytest.approx(2, abs=0.5)
+
+
+@pytest.mark.asyncio
+async def test_checkpoint_raises_after_expiry():
+    deadline = Deadline(timeout=1, started_at=time.monotonic() - 2)
+    with pytest.raises(RequestTimeoutError):
+        await deadline.checkpoint("inference")
@@ -0,0 +1,50 @@
+#!/usr/bin/env python3
+"""
+测试由累计桶计数估算分位数（app.utils.histogram.approx_percentile）
+"""
+
+import pytest
+
+from app.utils.histogram import approx_percentile
+
+BOUNDS = (1.0, 2.0, 5.0)
+
+
+def test_empty_histogram_returns_zero():
+    assert approx_percentile(0.5, BOUNDS, [0, 0, 0], 0, None, None) == 0.0
+
+
+def test_interpolates_inside_bucket():
+    # 10个值均匀分布在 (1, 2] 之间，中位数约为1.5
+    value = approx_percentile(0.5, BOUNDS, [0, 10, 10], 10, 1.0, 2.0)
+    assert value == pytest.approx(1.5)
+
+
+def test_first_bucket_starts_at_minimum():
+    # 第一个桶从最小值开始插值，而不是从0开始
+    value = approx_percentile(0.5, BOUNDS, [4, 4, 4], 4, 0.6, 1.0)
+    assert value == pytest.approx(0.8)
+
+
+def test_result_clamped_to_observed_range():
+    # 桶上界大于实际最大值时，结果不超过最大值
+    assert approx_percentile(1.0, BOUNDS, [0, 0, 3], 3, 2.5, 3.0) == pytest.approx(3.0)
+    assert approx_percentile(0.0, BOUNDS, [0, 0, 3], 3, 2.5, 3.0) >= 2.5
+
+
+def test_values_beyond_last_bucket_interpolate_to_maximum():
+    # 一半的值超出最后一个桶上界，p99落在 (5, 9] 之间
+    value = approx_percentile(0.99, BOUNDS, [0, 0, 5], 10, 0.5, 9.0)
+    assert 5.0 < value <= 9.0
+    assert approx_percentile(1.0, BOUNDS, [0, 0, 5], 10, 0.5, 9.0) == pytest.approx(9.0)
+
+
+def test_percentiles_are_monotonic():
+    cumulative = [3, 7, 9]
+    values = [approx_percentile(q / 10, BOUNDS, cumulative, 10, 0.2, 8.0) for q in range(11)]
+    assert values == sorted(values)
+
+
+def test_null_bucket_counts_are_treated_as_zero():
+    # SUM(CASE ...) 在没有行时返回NULL
+    assert approx_percentile(0.5, BOUNDS, [None, 2, 2], 2, 1.5, 1.5) == pytest.approx(1.5)
@@ -0,0 +1,151 @@
+#!/usr/bin/env python3
+"""
+测试批量日志写入的落盘、隔离和重放（app.core.log_writer.LogWriter）
+数据库写入通过替换 _insert / _database_available 模拟
+"""
+
+import json
+import os
+
+import pytest
+
+from app.core.log_writer import LogWriter
+
+
+@pytest.fixture
+def writer(tmp_path) -> LogWriter:
+    return LogWriter(
+        batch_size=10,
+        flush_interval=1.0,
+        max_queue=100,
+        spool_dir=str(tmp_path / "spool"),
+        replay_interval=60.0,
+        replay_max_attempts=2
+    )
+
+
+def _files(writer: LogWriter, suffix: str):
+    if not os.path.isdir(writer.spool_dir):
+        return []
+    return sorted(name for name in os.listdir(writer.spool_dir) if name.endswith(suffix))
+
+
+def _read(writer: LogWriter, name: str):
+    with open(os.path.join(writer.spool_dir, name), encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def _rows(count: int, table: str = "recognition_logs"):
+    return [(table, {"employee_id": i, "confidence_score": 0.5}) for i in range(count)]
+
+
+def test_spill_writes_complete_jsonl_file(writer):
+    writer._spill(_rows(3))
+    files = _files(writer, ".jsonl")
+    assert len(files) == 1
+    assert not _files(writer, ".tmp")
+    assert [entry["row"]["employee_id"] for entry in _read(writer, files[0])] == [0, 1, 2]
+    assert writer._read_spool_file(os.path.join(writer.spool_dir, files[0])) == _rows(3)
+
+
+@pytest.mark.asyncio
+async def test_flush_spills_batch_when_database_fails(writer, monkeypatch):
+    async def broken_insert(batch):
+        raise ConnectionError("database is down")
+
+    monkeypatch.setattr(writer, "_insert", broken_insert)
+    await writer._flush(_rows(2))
+    assert len(_files(writer, ".jsonl")) == 1
+
+
+@pytest.mark.asyncio
+async def test_flush_quarantines_only_failed_rows(writer, monkeypatch):
+    async def partial_insert(batch):
+        table, row = batch[1]
+        return [(table, row, "duplicate key")]
+
+    monkeypatch.setattr(writer, "_insert", partial_insert)
+    await writer._flush(_rows(3))
+    assert not _files(writer, ".jsonl")
+    failed = _files(writer, ".failed")
+    assert len(failed) == 1
+    entries = _read(writer, failed[0])
+    assert [entry["row"]["employee_id"] for entry in entries] == [1]
+    assert entries[0]["error"] == "duplicate key"
+
+
+@pytest.mark.asyncio
+async def test_replay_writes_back_and_removes_files(writer, monkeypatch):
+    inserted = []
+
+    async def insert(batch):
+        inserted.extend(batch)
+        return []
+
+    monkeypatch.setattr(writer, "_insert", insert)
+    writer._spill(_rows(2))
+    writer._spill(_rows(3))
+    assert await writer.replay() == 5
+    assert len(inserted) == 5
+    assert not _files(writer, ".jsonl")
+
+
+@pytest.mark.asyncio
+async def test_replay_raises_and_keeps_files_while_database_is_down(writer, monkeypatch):
+    async def broken_insert(batch):
+        raise ConnectionError("database is down")
+
+    async def unavailable():
+        return False
+
+    monkeypatch.setattr(writer, "_insert", broken_insert)
+    monkeypatch.setattr(writer, "_database_available", unavailable)
+    writer._spill(_rows(2))
+    with pytest.raises(ConnectionError):
+        await writer.replay()
+    assert len(_files(writer, ".jsonl")) == 1
+    assert not _files(writer, ".failed")
+
+
+@pytest.mark.asyncio
+async def test_replay_quarantines_file_that_keeps_failing(writer, monkeypatch):
+    inserted = []
+
+    async def insert(batch):
+        if batch[0][0] == "bad_table":
+            raise ValueError("cannot insert")
+        inserted.extend(batch)
+        return []
+
+    async def available():
+        return True
+
+    monkeypatch.setattr(writer, "_insert", insert)
+    monkeypatch.setattr(writer, "_database_available", available)
+    writer._spill(_rows(1, table="bad_table"))
+    writer._spill(_rows(2))
+
+    # 失败的文件不阻塞后面的文件
+    assert await writer.replay() == 2
+    assert len(_files(writer, ".jsonl")) == 1
+    # 达到最大次数后隔离
+    assert await writer.replay() == 0
+    assert not _files(writer, ".jsonl")
+    assert len(_files(writer, ".failed")) == 1
+    assert len(inserted) == 2
+
+
+@pytest.mark.asyncio
+async def test_replay_quarantines_unreadable_file(writer, monkeypatch):
+    async def insert(batch):
+        return []
+
+    monkeypatch.setattr(writer, "_insert", insert)
+    os.makedirs(writer.spool_dir, exist_ok=True)
+    with open(os.path.join(writer.spool_dir, "0_corrupt.jsonl"), "w", encoding="utf-8") as f:
+        f.write("{not json\n")
+    writer._spill(_rows(1))
+
+    assert await writer.replay() == 1
+    assert _files(writer, ".failed") == ["0_corrupt.failed"]
+    assert not _files(writer, ".jsonl")
@@ -0,0 +1,56 @@
+#!/usr/bin/env python3
+"""
+测试游标分页的游标编解码和分页截取（app.utils.pagination）
+"""
+
+from datetime import datetime, timezone
+
+import pytest
+
+from app.utils.pagination import InvalidCursorError, decode_cursor, encode_cursor, split_page
+
+
+def test_cursor_round_trip():
+    created_at = datetime(2024, 5, 6, 7, 8, 9, 123456)
+    assert decode_cursor(encode_cursor(created_at, 42)) == (created_at, 42)
+
+
+def test_cursor_round_trip_with_timezone_and_string_id():
+    created_at = datetime(2024, 5, 6, 7, 8, 9, tzinfo=timezone.utc)
+    assert decode_cursor(encode_cursor(created_at, "vp-1")) == (created_at, "vp-1")
+
+
+def test_cursor_without_created_at():
+    assert decode_cursor(encode_cursor(None, 7)) == (None, 7)
+
+
+def test_cursor_is_url_safe_and_unpadded():
+    cursor = encode_cursor(datetime(2024, 1, 1), "a/b+c?")
+    assert "=" not in cursor
+    assert all(c.isalnum() or c in "-_" for c in cursor)
+
+
+@pytest.mark.parametrize("cursor", ["", "not-a-cursor", "e30", encode_cursor(None, 1)[:-3] + "!!!"])
+def test_invalid_cursor_raises(cursor):
+    with pytest.raises(InvalidCursorError):
+        decode_cursor(cursor)
+
+
+def test_invalid_cursor_is_value_error():
+    # 路由按 ValueError 子类处理为400
+    assert issubclass(InvalidCursorError, ValueError)
+
+
+def test_split_page_last_page_has_no_cursor():
+    rows = [(datetime(2024, 1, day), day) for day in (3, 2, 1)]
+    page, next_cursor = split_page(rows, 3, key=lambda row: row)
+    assert page == rows
+    assert next_cursor is None
+
+
+def test_split_page_trims_extra_row_and_points_at_last_row():
+    # 查询多取一行(limit+1)用于判断是否还有下一页
+    rows = [(datetime(2024, 1, day), day) for day in (4, 3, 2, 1)]
+    page, next_cursor = split_page(rows, 3, key=lambda row: row)
+    assert page == rows[:3]
+    assert decode_cursor(next_cursor) == rows[2]
@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+"""
+测试并发请求合并（app.core.singleflight.SingleFlight）
+"""
+
+import asyncio
+
+import pytest
+
+from app.core.exceptions import ClientDisconnectedError, RequestTimeoutError
+from app.core.singleflight import SingleFlight
+
+
+async def _started(flight: SingleFlight, key: str):
+    """等待leader登记进行中的调用"""
+    while key not in flight._calls:
+        await asyncio.sleep(0)
+
+
+@pytest.mark.asyncio
+async def test_concurrent_calls_share_one_execution():
+    flight = SingleFlight("test_share")
+    release = asyncio.Event()
+    calls = 0
+
+    async def compute():
+        nonlocal calls
+        calls += 1
+        await release.wait()
+        return {"value": 42}
+
+    leader = asyncio.create_task(flight.do("k", compute))
+    await _started(flight, "k")
+    followers = [asyncio.create_task(flight.do("k", compute)) for _ in range(3)]
+    await asyncio.sleep(0)
+    release.set()
+
+    results = await asyncio.gather(leader, *followers)
+    assert calls == 1
+    assert all(result is results[0] for result in results)
+    assert "k" not in flight._calls
+
+
+@pytest.mark.asyncio
+async def test_different_keys_run_independently():
+    flight = SingleFlight("test_keys")
+    calls = []
+
+    async def compute(key):
+        calls.append(key)
+        await asyncio.sleep(0)
+        return key
+
+    results = await asyncio.gather(flight.do("a", lambda: compute("a")), flight.do("b", lambda: compute("b")))
+    assert results == ["a", "b"]
+    assert sorted(calls) == ["a", "b"]
+
+
+@pytest.mark.asyncio
+async def test_leader_error_is_shared_with_followers():
+    flight = SingleFlight("test_error")
+    release = asyncio.Event()
+
+    async def fail():
+        await release.wait()
+        raise ValueError("bad audio")
+
+    leader = asyncio.create_task(flight.do("k", fail))
+    await _started(flight, "k")
+    follower = asyncio.create_task(flight.do("k", fail))
+    await asyncio.sleep(0)
+    release.set()
+
+    for task in (leader, follower):
+        with pytest.raises(ValueError):
+            await task
+
+
+@pytest.mark.asyncio
+async def test_follower_recomputes_when_leader_aborted():
+    flight = SingleFlight("test_abort")
+    release = asyncio.Event()
+    calls = 0
+
+    async def aborted_leader():
+        nonlocal calls
+        calls += 1
+        await release.wait()
+        raise ClientDisconnectedError("inference")
+
+    async def compute():
+        nonlocal calls
+        calls += 1
+        return "ok"
+
+    leader = asyncio.create_task(flight.do("k", aborted_leader))
+    await _started(flight, "k")
+    follower = asyncio.create_task(flight.do("k", compute))
+    await asyncio.sleep(0)
+    release.set()
+
+    with pytest.raises(ClientDisconnectedError):
+        await leader
+    # leader的中止与follower无关，follower重新成为leader并完成计算
+    assert await follower == "ok"
+    assert calls == 2
+
+
+@pytest.mark.asyncio
+async def test_follower_recomputes_when_leader_cancelled():
+    flight = SingleFlight("test_cancel")
+
+    async def slow():
+        await asyncio.sleep(3600)
+
+    leader = asyncio.create_task(flight.do("k", slow))
+    await _started(flight, "k")
+
+    async def compute():
+        return "ok"
+
+    follower = asyncio.create_task(flight.do("k", compute))
+    await asyncio.sleep(0)
+    leader.cancel()
+
+    assert await follower == "ok"
+
+
+@pytest.mark.asyncio
+async def test_follower_wait_timeout():
+    flight = SingleFlight("test_timeout")
+    release = asyncio.Event()
+
+    async def slow():
+        await release.wait()
+        return "late"
+
+    leader = asyncio.create_task(flight.do("k", slow))
+    await _started(flight, "k")
+    with pytest.raises(RequestTimeoutError):
+        await flight.do("k", slow, timeout=0.01)
+
+    # follower超时不影响leader
+    release.set()
+    assert await leader == "late"
@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+"""
+测试内存声纹库的变更应用、检索和快照（app.services.voiceprint_gallery_service）
+"""
+
+from datetime import datetime
+
+import numpy as np
+import pytest
+
+from app.services.voiceprint_gallery_service import GalleryState, VoiceprintGalleryService, _empty_state
+
+
+@pytest.fixture
+def gallery(tmp_path) -> VoiceprintGalleryService:
+    service = VoiceprintGalleryService(
+        snapshot_dir=str(tmp_path / "gallery"),
+        snapshot_interval=0,
+        snapshot_keep=2,
+        sync_interval=0,
+        sync_overlap=0
+    )
+    # 跳过数据库加载，从空库开始
+    service._state = _empty_state()
+    return service
+
+
+def test_apply_normalizes_and_replaces_rows(gallery):
+    state = gallery._apply(_empty_state(), [("vp1", 1, [3.0, 4.0]), ("vp2", 2, [0.0, 2.0])], [])
+    assert state.size == 2
+    assert state.dim == 2
+    assert state.matrix.dtype == np.float32
+    np.testing.assert_allclose(np.linalg.norm(state.matrix, axis=1), [1.0, 1.0], rtol=1e-6)
+
+    # 同一声纹ID再次写入时替换原行
+    state = gallery._apply(state, [("vp1", 1, [1.0, 0.0])], [])
+    assert state.voiceprint_ids == ["vp1", "vp2"]
+    np.testing.assert_allclose(state.matrix[0], [1.0, 0.0])
+
+
+def test_apply_does_not_mutate_previous_state(gallery):
+    before = gallery._apply(_empty_state(), [("vp1", 1, [1.0, 0.0])], [])
+    after = gallery._apply(before, [("vp2", 2, [0.0, 1.0])], ["vp1"])
+    assert before.voiceprint_ids == ["vp1"]
+    assert after.voiceprint_ids == ["vp2"]
+    assert after.employee_ids.tolist() == [2]
+
+
+def test_apply_skips_dimension_mismatch(gallery):
+    state = gallery._apply(_empty_state(), [("vp1", 1, [1.0, 0.0]), ("bad", 2, [1.0, 0.0, 0.0])], [])
+    assert state.voiceprint_ids == ["vp1"]
+
+
+def test_apply_keeps_newest_watermark(gallery):
+    early, late = datetime(2024, 1, 1), datetime(2024, 6, 1)
+    state = gallery._apply(_empty_state(late), [("vp1", 1, [1.0, 0.0])], [], watermark=early)
+    assert state.watermark == late
+    state = gallery._apply(state, [], ["vp1"])
+    assert state.size == 0
+    assert state.watermark == late
+
+
+@pytest.mark.asyncio
+async def test_search_returns_top_k_by_cosine_similarity(gallery):
+    await gallery.upsert("east", 1, [1.0, 0.0])
+    await gallery.upsert("north", 2, [0.0, 1.0])
+    await gallery.upsert("north_east", 3, [1.0, 1.0])
+
+    matches = await gallery.search([2.0, 0.2], top_k=2)
+    assert [m["voiceprint_id"] for m in matches] == ["east", "north_east"]
+    assert matches[0]["employee_id"] == 1
+    assert matches[0]["similarity"] == pytest.approx(2.0 / np.hypot(2.0, 0.2), rel=1e-6)
+    assert matches[0]["similarity"] >= matches[1]["similarity"]
+
+    # top_k超过声纹数量时返回全部
+    assert len(await gallery.search([1.0, 0.0], top_k=10)) == 3
+
+
+@pytest.mark.asyncio
+async def test_search_after_remove_and_on_empty_gallery(gallery):
+    assert await gallery.search([1.0, 0.0], top_k=3) == []
+    await gallery.upsert("vp1", 1, [1.0, 0.0])
+    await gallery.upsert("vp2", 2, [0.0, 1.0])
+    await gallery.remove("vp1")
+    matches = await gallery.search([1.0, 0.0], top_k=3)
+    assert [m["voiceprint_id"] for m in matches] == ["vp2"]
+
+
+@pytest.mark.asyncio
+async def test_search_rejects_dimension_mismatch(gallery):
+    await gallery.upsert("vp1", 1, [1.0, 0.0])
+    with pytest.raises(ValueError):
+        await gallery.search([1.0, 0.0, 0.0], top_k=1)
+
+
+def test_snapshot_round_trip_is_memory_mapped(gallery):
+    watermark = datetime(2024, 3, 4, 5, 6, 7)
+    state = gallery._apply(_empty_state(watermark), [("vp1", 1, [1.0, 0.0]), ("vp2", 2, [0.6, 0.8])], [])
+    assert gallery._write_snapshot(state)
+    # 内容未变化时不重复写入
+    assert not gallery._write_snapshot(state)
+
+    loaded = gallery._read_snapshot()
+    assert isinstance(loaded, GalleryState)
+    assert isinstance(loaded.matrix, np.memmap)
+    assert loaded.voiceprint_ids == ["vp1", "vp2"]
+    assert loaded.employee_ids.tolist() == [1, 2]
+    assert loaded.watermark == watermark
+    np.testing.assert_allclose(loaded.matrix, state.matrix)
+
+    # 在映射的快照上应用变更时复制为普通数组
+    updated = gallery._apply(loaded, [("vp3", 3, [0.0, 1.0])], [])
+    assert not isinstance(updated.matrix, np.memmap)
+    assert updated.size == 3
+
+
+def test_missing_snapshot_returns_none(gallery):
+    assert gallery._read_snapshot() is None